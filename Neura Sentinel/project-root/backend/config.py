@@ -3,4 +3,110 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-MONGODB_URI = os.getenv("MONGODB_URI")
+BACKEND_ROOT = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BACKEND_ROOT)
+
+# Pool options (maxPoolSize, minPoolSize, maxIdleTimeMS, ...) go in the URI query string
+MONGODB_URI = os.getenv("MONGODB_URI") or "mongodb://localhost:27017"
+DATABASE_NAME = os.getenv("DATABASE_NAME", "traffic_db")
+
+# Write-behind buffer for classified flows
+DB_WRITE_BATCH_SIZE = int(os.getenv("DB_WRITE_BATCH_SIZE", "500"))
+DB_WRITE_FLUSH_INTERVAL = float(os.getenv("DB_WRITE_FLUSH_INTERVAL", "1.0"))
+DB_WRITE_QUEUE_SIZE = int(os.getenv("DB_WRITE_QUEUE_SIZE", "20000"))
+
+# WebSocket fan-out: coalescing window, per-client frame queue, and what to do
+# with a client whose queue is full ('downsample' drops its oldest frame, 'drop' disconnects it)
+WS_COALESCE_MS = int(os.getenv("WS_COALESCE_MS", "250"))
+WS_CLIENT_QUEUE_SIZE = int(os.getenv("WS_CLIENT_QUEUE_SIZE", "16"))
+WS_SLOW_CLIENT_POLICY = os.getenv("WS_SLOW_CLIENT_POLICY", "downsample")
+
+# Sniffer -> API event bus: max flush batches waiting in the queue
+EVENT_BUS_QUEUE_SIZE = int(os.getenv("EVENT_BUS_QUEUE_SIZE", "256"))
+
+# Where sniffer flows are classified: 'api' (this process) or 'embedded' (the sniffer process)
+SNIFFER_INFERENCE = os.getenv("SNIFFER_INFERENCE", "api")
+
+# Flow-accounting shard processes behind the capture process (1 = capture and process in one)
+SNIFFER_WORKERS = int(os.getenv("SNIFFER_WORKERS", "1"))
+
+# Seconds /stop-sniffer waits for the sniffer to flush and spool undelivered batches before killing it
+SNIFFER_STOP_TIMEOUT = float(os.getenv("SNIFFER_STOP_TIMEOUT", "30.0"))
+
+# Training data: the raw CICIDS2017 CSVs and the prepared columnar dataset built from them
+DATASET_SOURCE_DIR = os.getenv("DATASET_SOURCE_DIR") or os.path.join(BACKEND_ROOT, "services", "Train_ML_Model", "MachineLearningCVE")
+PREPARED_DATASET_DIR = os.getenv("PREPARED_DATASET_DIR") or os.path.join(PROJECT_ROOT, "prepared_cicids2017")
+
+# Trained models: versioned under MODEL_DIR/versions, with MODEL_DIR/CURRENT naming the active one.
+# API workers poll CURRENT and hot-swap to a newly published version.
+MODEL_DIR = os.getenv("MODEL_DIR") or os.path.join(PROJECT_ROOT, "ml_models")
+MODEL_POLL_INTERVAL = float(os.getenv("MODEL_POLL_INTERVAL", "5.0"))
+
+# Label cache in front of the model, keyed on (model version, quantized feature row).
+# Size 0 disables it. 23 mantissa bits keys on the exact float32 values the forest sees;
+# fewer bits let near-identical flows (e.g. flood packets) share one prediction.
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "100000"))
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "300"))
+PREDICTION_CACHE_MANTISSA_BITS = int(os.getenv("PREDICTION_CACHE_MANTISSA_BITS", "23"))
+
+# Time-series rollups (per second/minute/hour/day) kept next to the raw flows: how often
+# pending increments are written, talkers kept per bucket per write, and how long
+# each resolution is kept (seconds)
+ROLLUP_FLUSH_INTERVAL = float(os.getenv("ROLLUP_FLUSH_INTERVAL", "1.0"))
+ROLLUP_TOP_TALKERS = int(os.getenv("ROLLUP_TOP_TALKERS", "20"))
+ROLLUP_RETENTION = {
+    "s": int(os.getenv("ROLLUP_RETENTION_SECONDLY", str(6 * 3600))),
+    "m": int(os.getenv("ROLLUP_RETENTION_MINUTELY", str(14 * 86400))),
+    "h": int(os.getenv("ROLLUP_RETENTION_HOURLY", str(400 * 86400))),
+    "d": int(os.getenv("ROLLUP_RETENTION_DAILY", str(5 * 365 * 86400))),
+}
+
+# Raw classified flows are stored compacted, one collection per UTC day
+# (classified_traffic_YYYYMMDD). Once a day is TRAFFIC_RETENTION seconds old it is folded
+# into the rollups and dropped; retention is checked every RETENTION_CHECK_INTERVAL seconds.
+TRAFFIC_RETENTION = int(os.getenv("TRAFFIC_RETENTION", str(7 * 86400)))
+RETENTION_CHECK_INTERVAL = float(os.getenv("RETENTION_CHECK_INTERVAL", "3600"))
+
+# Alert engine: detections of one incident key within ALERT_WINDOW seconds needed to
+# raise an alert, seconds without detections before it is resolved, and write interval
+ALERT_WINDOW = float(os.getenv("ALERT_WINDOW", "60"))
+ALERT_THRESHOLD = int(os.getenv("ALERT_THRESHOLD", "5"))
+ALERT_QUIET_PERIOD = float(os.getenv("ALERT_QUIET_PERIOD", "300"))
+ALERT_FLUSH_INTERVAL = float(os.getenv("ALERT_FLUSH_INTERVAL", "1.0"))
+
+# Hot-path debug logging (each flow, each classify request) keeps 1 message in LOG_SAMPLE_EVERY
+LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", "100"))
+
+# Sniffer overload control. A sniffer process is overloaded when its packets lag the
+# wall clock by OVERLOAD_MAX_LAG seconds, a hand-off takes OVERLOAD_MAX_BUSY of the
+# flush interval, the kernel drops packets, or shard queues pass OVERLOAD_QUEUE_HIGH full.
+# It then sheds load one stage at a time: a kernel prefilter (dropping non-IP traffic and
+# SNIFFER_PREFILTER_PORTS), 1-in-OVERLOAD_SAMPLE_EVERY sampling of data packets past a
+# flow's first OVERLOAD_SAMPLE_AFTER, then classifying at most OVERLOAD_MAX_FLOWS flows
+# per hand-off, suspicious and new ones first. Each stage is lifted after
+# OVERLOAD_CALM_SECONDS without pressure.
+OVERLOAD_MAX_LAG = float(os.getenv("OVERLOAD_MAX_LAG", "2.0"))
+OVERLOAD_MAX_BUSY = float(os.getenv("OVERLOAD_MAX_BUSY", "0.5"))
+OVERLOAD_QUEUE_HIGH = float(os.getenv("OVERLOAD_QUEUE_HIGH", "0.5"))
+OVERLOAD_CALM_SECONDS = float(os.getenv("OVERLOAD_CALM_SECONDS", "30"))
+OVERLOAD_SAMPLE_EVERY = int(os.getenv("OVERLOAD_SAMPLE_EVERY", "8"))
+OVERLOAD_SAMPLE_AFTER = int(os.getenv("OVERLOAD_SAMPLE_AFTER", "16"))
+OVERLOAD_MAX_FLOWS = int(os.getenv("OVERLOAD_MAX_FLOWS", "2000"))
+SNIFFER_PREFILTER_PORTS = [int(port) for port in os.getenv("SNIFFER_PREFILTER_PORTS", "8000,27017").split(",") if port.strip()]
+
+# Durable spool for flow batches the sink (the API, the event bus or MongoDB) can't take right
+# now: segments of SPOOL_SEGMENT_BYTES under SPOOL_DIR, at most SPOOL_MAX_BYTES per spool before
+# the oldest batches are dropped. Spooled batches are retried every SPOOL_RETRY_INTERVAL seconds,
+# SPOOL_REPLAY_BATCHES per delivery; SENDER_QUEUE_SIZE batches wait for the sender thread in memory.
+SPOOL_DIR = os.getenv("SPOOL_DIR") or os.path.join(PROJECT_ROOT, "spool")
+SPOOL_SEGMENT_BYTES = int(os.getenv("SPOOL_SEGMENT_BYTES", str(16 * 1024 * 1024)))
+SPOOL_MAX_BYTES = int(os.getenv("SPOOL_MAX_BYTES", str(512 * 1024 * 1024)))
+SPOOL_RETRY_INTERVAL = float(os.getenv("SPOOL_RETRY_INTERVAL", "2.0"))
+SPOOL_REPLAY_BATCHES = int(os.getenv("SPOOL_REPLAY_BATCHES", "20"))
+SENDER_QUEUE_SIZE = int(os.getenv("SENDER_QUEUE_SIZE", "64"))
+
+# Sniffer HTTP client (pooled keep-alive session): connect/read timeouts in seconds and
+# retries of failed connects and 502/503/504 responses
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "1.0"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "5.0"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
@@ -1,26 +1,53 @@
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING
 import logging
 
+from config import MONGODB_URI, DATABASE_NAME
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# MongoDB connection settings
-MONGO_URI = "mongodb://localhost:27017"
-DATABASE_NAME = "traffic_db"
-
 # Initialize MongoDB client
 client = None
 
 def get_database():
+    """Return the motor database handle; the client connects lazily and pools connections."""
     global client
+    if client is None:
+        client = AsyncIOMotorClient(MONGODB_URI)
+    return client[DATABASE_NAME]
+
+async def connect():
+    """Check the server is reachable and create the indexes the API relies on."""
+    db = get_database()
     try:
-        if client is None:
-            client = MongoClient(MONGO_URI)
-            logger.info("Connected to MongoDB")
-        # Test connection
-        client.admin.command('ping')
-        return client[DATABASE_NAME]
+        await db.command('ping')
+        logger.info("Connected to MongoDB")
     except Exception as e:
         logger.error(f"Failed to connect to MongoDB: {str(e)}")
         raise
+    await ensure_indexes(db)
+    return db
+
+# Every query endpoint sorts newest first with _id breaking ties; each filter field
+# gets an (equality, timestamp, _id) index so a filtered page is one index range scan.
+# Classified flows live in day partitions that get their indexes as they are created
+# (see database.storage).
+ALERT_INDEX_FIELDS = ("label", "severity", "src_ip", "dst_ip")
+
+async def ensure_indexes(db):
+    newest_first = [("timestamp", DESCENDING), ("_id", DESCENDING)]
+    await db.label_ids.create_index("name", unique=True)
+    await db.alerts.create_index(newest_first)
+    for field in ALERT_INDEX_FIELDS:
+        await db.alerts.create_index([(field, ASCENDING)] + newest_first)
+    await db.rollups.create_index([("resolution", ASCENDING), ("start", ASCENDING)])
+    # Each rollup bucket carries its own expiry, set by its resolution's retention
+    await db.rollups.create_index("expire_at", expireAfterSeconds=0)
+
+def close():
+    global client
+    if client is not None:
+        client.close()
+        client = None
@@ -1,13 +1,192 @@
+import time
+from collections import Counter
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
 from database.connection import get_database
+from database.rollups import COUNTERS, RESOLUTIONS, decode_ip
+from database.storage import encode_address, traffic_store
+
+# Page sizes for the query endpoints
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Fields the dashboard tables read; everything else (the full feature vector) stays in the database
+TRAFFIC_FIELDS = (
+    'timestamp', 'src_ip', 'dst_ip', 'label',
+    'Total Fwd Packets', 'Total Backward Packets',
+    'Total Length of Fwd Packets', 'Total Length of Bwd Packets',
+)
+# The same, as stored: those four counts are the first features after Flow Duration
+TRAFFIC_PROJECTION = {'t': 1, 's': 1, 'd': 1, 'l': 1, 'f': {'$slice': [0, 5]}}
+# Most points a /traffic/stats response returns before it switches to a coarser resolution
+MAX_STATS_POINTS = 720
+DEFAULT_STATS_WINDOW = 3600
+
+ALERT_FIELDS = (
+    'timestamp', 'first_seen', 'label', 'severity', 'status',
+    'src_ip', 'dst_ip', 'count', 'details',
+)
+
+
+def encode_cursor(doc):
+    """Keyset cursor for the page after `doc`: its timestamp plus _id, which breaks ties."""
+    return f"{doc['timestamp']!r}:{doc['_id']}"
+
+
+def decode_cursor(cursor):
+    try:
+        timestamp, _, oid = cursor.rpartition(':')
+        return float(timestamp), ObjectId(oid)
+    except (ValueError, InvalidId):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def build_query(start=None, end=None, cursor=None, time_field="timestamp", **equals):
+    """
+    Mongo filter for a time range, field matches and the position after `cursor`.
+    List values match any of their items. Matches come first so the
+    (field, timestamp, _id) compound indexes can serve them.
+    """
+    query = {}
+    for field, value in equals.items():
+        if value is None or value == []:
+            continue
+        query[field] = {"$in": value} if isinstance(value, list) else value
+
+    time_range = {}
+    if start is not None:
+        time_range["$gte"] = start
+    if end is not None:
+        time_range["$lt"] = end
+    if cursor:
+        timestamp, oid = decode_cursor(cursor)
+        # The plain bound keeps the index scan a single range; $or settles ties at that timestamp
+        time_range["$lte"] = timestamp
+        query["$or"] = [{time_field: {"$lt": timestamp}}, {"_id": {"$lt": oid}}]
+    if time_range:
+        query[time_field] = time_range
+    return query
+
+
+async def find_newest(collection, query, projection, count, time_field="timestamp"):
+    return await (get_database()[collection].find(query, projection)
+                  .sort([(time_field, -1), ("_id", -1)])
+                  .limit(count)
+                  .to_list(count))
+
+
+def to_page(docs, limit):
+    """Page of `limit` documents, from up to `limit` + 1 (the extra one tells whether another page exists)."""
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    items = []
+    for doc in docs[:limit]:
+        doc['id'] = str(doc.pop('_id'))
+        items.append(doc)
+    return {"items": items, "next_cursor": next_cursor}
+
+
+async def find_page(collection, query, fields, limit=DEFAULT_PAGE_SIZE):
+    """
+    Newest-first page of `collection`, projected to `fields`.
+    Returns:
+        dict: {'items': [...], 'next_cursor': str | None}
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    docs = await find_newest(collection, query, {field: 1 for field in fields}, limit + 1)
+    return to_page(docs, limit)
+
 
 async def insert_traffic(data):
-    db = get_database()
-    await db.traffic.insert_one(data)
+    await traffic_store.insert_many([data])
+
+
+async def query_traffic(start=None, end=None, label=None, src_ip=None, dst_ip=None,
+                        cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Newest-first page of classified flows, read from the day partitions the range covers."""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    label_ids = None
+    if label:
+        label_ids = await traffic_store.labels.known_ids(label if isinstance(label, list) else [label])
+        if not label_ids:
+            return {"items": [], "next_cursor": None}
+    query = build_query(start, end, cursor, time_field="t",
+                        l=label_ids, s=encode_address(src_ip), d=encode_address(dst_ip))
+
+    newest = end
+    if cursor:
+        newest = min(decode_cursor(cursor)[0], end if end is not None else float('inf'))
+    docs = []
+    for partition in await traffic_store.partitions(start, newest):
+        docs += await find_newest(partition, query, TRAFFIC_PROJECTION, limit + 1 - len(docs), time_field="t")
+        if len(docs) > limit:
+            break
+    records = await traffic_store.expand_many(docs)
+    return to_page([{'_id': record['_id'], **{field: record.get(field) for field in TRAFFIC_FIELDS}}
+                    for record in records], limit)
+
+
+async def query_alerts(start=None, end=None, label=None, severity=None, src_ip=None, dst_ip=None,
+                       cursor=None, limit=DEFAULT_PAGE_SIZE):
+    query = build_query(start, end, cursor, label=label, severity=severity, src_ip=src_ip, dst_ip=dst_ip)
+    return await find_page("alerts", query, ALERT_FIELDS, limit)
+
+
+def pick_resolution(span):
+    """Finest rollup resolution that covers `span` seconds in at most MAX_STATS_POINTS buckets."""
+    for resolution, width in RESOLUTIONS.items():
+        if span / width <= MAX_STATS_POINTS:
+            return resolution
+    return "d"
+
+
+async def query_stats(start=None, end=None, resolution=None, top=10):
+    """
+    Time series and totals for [start, end) from the rollup buckets.
+    Args:
+        start (float): Epoch seconds; defaults to an hour before `end`
+        end (float): Epoch seconds; defaults to now
+        resolution (str): 's', 'm', 'h' or 'd'; None picks one from the window
+        top (int): Number of top talkers to return
+    Returns:
+        dict: resolution, step, points (one per non-empty bucket), totals, top_talkers
+    """
+    end = time.time() if end is None else end
+    start = end - DEFAULT_STATS_WINDOW if start is None else start
+    if end <= start:
+        raise ValueError("end must be after start")
+    if resolution is None:
+        resolution = pick_resolution(end - start)
+    elif resolution not in RESOLUTIONS:
+        raise ValueError(f"Unknown resolution: {resolution}")
+    step = RESOLUTIONS[resolution]
+
+    cursor = get_database().rollups.find(
+        # Include the bucket `start` falls in
+        {"resolution": resolution, "start": {"$gte": int(start) - int(start) % step, "$lt": end}},
+        {"_id": 0, "resolution": 0, "expire_at": 0},
+    ).sort("start", 1)
 
-async def get_recent_traffic():
-    db = get_database()
-    return await db.traffic.find().sort("timestamp", -1).to_list(100)
+    points = []
+    totals = {name: 0 for name in COUNTERS}
+    labels = Counter()
+    talkers = Counter()
+    async for doc in cursor:
+        for ip, total in doc.pop("talkers", {}).items():
+            talkers[decode_ip(ip)] += total
+        doc.setdefault("labels", {})
+        for name in COUNTERS:
+            totals[name] += doc.get(name, 0)
+        labels.update(doc["labels"])
+        points.append(doc)
 
-async def get_alerts():
-    db = get_database()
-    return await db.alerts.find().sort("timestamp", -1).to_list(50)
+    return {
+        "resolution": resolution,
+        "step": step,
+        "start": start,
+        "end": end,
+        "points": points,
+        "totals": {**totals, "labels": dict(labels)},
+        "top_talkers": [{"ip": ip, "bytes": total} for ip, total in talkers.most_common(top)],
+    }
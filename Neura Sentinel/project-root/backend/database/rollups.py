@@ -0,0 +1,175 @@
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+
+from database.connection import get_database
+from database.writer import register_write_metrics
+from config import ROLLUP_FLUSH_INTERVAL, ROLLUP_TOP_TALKERS, ROLLUP_RETENTION
+
+logger = logging.getLogger(__name__)
+
+# Bucket width in seconds per resolution
+RESOLUTIONS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+COUNTERS = ("count", "fwd_packets", "bwd_packets", "fwd_bytes", "bwd_bytes")
+# Talker running totals kept per open bucket, as a multiple of the top N written
+TALKER_TRACKING_FACTOR = 20
+
+
+def encode_key(name):
+    """Label or IP as a document field name; Mongo reads dots as nesting."""
+    return str(name).replace('.', '_')
+
+
+def decode_ip(key):
+    return key.replace('_', '.')
+
+
+def new_bucket():
+    return {"count": 0, "fwd_packets": 0, "bwd_packets": 0, "fwd_bytes": 0, "bwd_bytes": 0,
+            "labels": Counter(), "talkers": Counter()}
+
+
+class RollupWriter:
+    """
+    Keeps per-second, per-minute, per-hour and per-day aggregates of classified flows
+    in the `rollups` collection. Flows are added to per-second buckets in
+    memory; every `flush_interval` seconds those are folded into all four
+    resolutions and written as $inc upserts, one per touched bucket.
+
+    Talkers (bytes per source IP) are ranked on the running totals of each
+    open bucket, not on one flush's worth: an IP is written, with its whole
+    total so far, once it ranks in the bucket's top `top_talkers`, and only its
+    increments after that. Stored totals are exact for those IPs as counted by
+    this process; talkers that never rank are left out. Running totals are
+    trimmed to the largest TALKER_TRACKING_FACTOR * `top_talkers`, so a flood of
+    one-off sources can't grow them without bound.
+    """
+
+    def __init__(self, collection_name="rollups", flush_interval=ROLLUP_FLUSH_INTERVAL,
+                 top_talkers=ROLLUP_TOP_TALKERS):
+        self.collection_name = collection_name
+        self.flush_interval = flush_interval
+        self.top_talkers = top_talkers
+        self.pending = {}  # second -> bucket
+        self.talkers = {}  # (resolution, start) -> (bytes per IP so far, IPs written to the bucket)
+        self.task = None
+        self.written = 0
+        self.failed = 0
+        register_write_metrics(self, collection_name)
+
+    def add_many(self, records):
+        """Count classified flow records (as built by services.results.build_record)."""
+        pending = self.pending
+        for record in records:
+            second = int(record['timestamp'])
+            bucket = pending.get(second)
+            if bucket is None:
+                bucket = pending[second] = new_bucket()
+            fwd_bytes = record.get('Total Length of Fwd Packets') or 0
+            bwd_bytes = record.get('Total Length of Bwd Packets') or 0
+            bucket["count"] += 1
+            bucket["fwd_packets"] += record.get('Total Fwd Packets') or 0
+            bucket["bwd_packets"] += record.get('Total Backward Packets') or 0
+            bucket["fwd_bytes"] += fwd_bytes
+            bucket["bwd_bytes"] += bwd_bytes
+            bucket["labels"][record['label']] += 1
+            if record.get('src_ip'):
+                bucket["talkers"][record['src_ip']] += fwd_bytes + bwd_bytes
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            # A stop() mid-write must not lose the buckets already taken from pending
+            await asyncio.shield(self.flush())
+
+    def build_updates(self, seconds):
+        """Fold per-second buckets into every resolution, as one upsert per bucket."""
+        buckets = {}
+        for second, bucket in seconds.items():
+            for resolution, width in RESOLUTIONS.items():
+                key = (resolution, second - second % width)
+                target = buckets.get(key)
+                if target is None:
+                    target = buckets[key] = new_bucket()
+                for name in COUNTERS:
+                    target[name] += bucket[name]
+                target["labels"].update(bucket["labels"])
+                target["talkers"].update(bucket["talkers"])
+
+        updates = []
+        for (resolution, start), bucket in buckets.items():
+            inc = {name: bucket[name] for name in COUNTERS}
+            for label, count in bucket["labels"].items():
+                inc[f"labels.{encode_key(label)}"] = count
+            for ip, total in self.talker_increments((resolution, start), bucket["talkers"]).items():
+                inc[f"talkers.{encode_key(ip)}"] = total
+            end = start + RESOLUTIONS[resolution]
+            expire_at = datetime.fromtimestamp(end + ROLLUP_RETENTION[resolution], tz=timezone.utc)
+            updates.append(UpdateOne(
+                {"_id": f"{resolution}:{start}"},
+                {"$inc": inc, "$setOnInsert": {"resolution": resolution, "start": start, "expire_at": expire_at}},
+                upsert=True,
+            ))
+
+        # Forget buckets that have closed; a late record for one starts it over
+        newest = max(seconds)
+        for key in [key for key in self.talkers
+                    if key not in buckets and key[1] + RESOLUTIONS[key[0]] <= newest]:
+            del self.talkers[key]
+        return updates
+
+    def talker_increments(self, key, delta):
+        """
+        Add one flush's bytes per IP to a bucket's running totals.
+        Returns:
+            dict: $inc amount per IP to write (whole total for newly ranked IPs, the delta for stored ones)
+        """
+        totals, stored = self.talkers.setdefault(key, (Counter(), set()))
+        totals.update(delta)
+        inc = {}
+        for ip, total in totals.most_common(self.top_talkers):
+            if ip not in stored:
+                stored.add(ip)
+                inc[ip] = total
+            elif ip in delta:
+                inc[ip] = delta[ip]
+        for ip in stored:
+            if ip in delta and ip not in inc:
+                inc[ip] = delta[ip]
+
+        capacity = self.top_talkers * TALKER_TRACKING_FACTOR
+        if len(totals) > capacity:
+            keep = dict(totals.most_common(capacity))
+            keep.update((ip, totals[ip]) for ip in stored)
+            totals.clear()
+            totals.update(keep)
+        return inc
+
+    async def flush(self):
+        if not self.pending:
+            return
+        seconds, self.pending = self.pending, {}
+        updates = self.build_updates(seconds)
+        try:
+            with self.write_seconds.time():
+                await get_database()[self.collection_name].bulk_write(updates, ordered=False)
+            self.written += len(updates)
+        except Exception as e:
+            self.failed += len(updates)
+            logger.error(f"Failed to write {len(updates)} rollup buckets: {e}")
+
+
+rollup_writer = RollupWriter()
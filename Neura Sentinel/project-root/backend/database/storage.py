@@ -0,0 +1,342 @@
+import asyncio
+import ipaddress
+import logging
+import os
+import re
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from config import TRAFFIC_RETENTION, RETENTION_CHECK_INTERVAL, ROLLUP_RETENTION, ROLLUP_TOP_TALKERS, SPOOL_DIR
+from database.connection import get_database
+from database.rollups import COUNTERS, RESOLUTIONS, encode_key
+from database.writer import BatchWriter
+from services.flow_features import FLOW_FEATURES
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# === Compact flow documents ===
+# A classified flow record (services.results.build_record) is stored as
+#   {_id, t: timestamp, s: src IP, d: dst IP, l: label id, f: [features], x: {other features}}
+# IPv4 addresses are stored as integers (IPv6 ones, which don't fit a BSON int64, as strings),
+# labels as ids from the `label_ids` collection, and features as one array in FEATURE_ORDER,
+# so no document repeats a feature name. Features outside FEATURE_ORDER keep their names in `x`.
+
+# Position of each feature in a stored flow's `f`; only ever append to it
+FEATURE_ORDER = tuple(FLOW_FEATURES)
+FEATURE_INDEX = {name: i for i, name in enumerate(FEATURE_ORDER)}
+RECORD_KEYS = {'timestamp': 't', 'src_ip': 's', 'dst_ip': 'd', 'label': 'l'}
+
+# Rollup counters and the features they sum
+COUNTER_FEATURES = {
+    "fwd_packets": 'Total Fwd Packets',
+    "bwd_packets": 'Total Backward Packets',
+    "fwd_bytes": 'Total Length of Fwd Packets',
+    "bwd_bytes": 'Total Length of Bwd Packets',
+}
+
+DAY = 86400
+PARTITION_PATTERN = re.compile(r'_(\d{8})$')
+
+
+def encode_address(ip):
+    if not ip:
+        return None
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return ip
+    return int(address) if address.version == 4 else ip
+
+
+def decode_address(value):
+    if value is None or isinstance(value, str):
+        return value
+    return str(ipaddress.IPv4Address(value))
+
+
+def compact_number(value):
+    """Whole-number floats as ints: BSON stores small ints in 4 bytes instead of 8."""
+    if isinstance(value, float) and value.is_integer() and abs(value) < 2 ** 31:
+        return int(value)
+    return value
+
+
+class LabelIds:
+    """
+    Numeric ids for labels, kept in the `label_ids` collection ({_id: id, name})
+    and cached here. A new label gets the next free id; the unique index on
+    `name` settles two API workers adding the same label at once.
+    """
+
+    def __init__(self, collection_name="label_ids"):
+        self.collection_name = collection_name
+        self.ids = {}
+        self.names = {}
+
+    async def load(self):
+        async for doc in get_database()[self.collection_name].find():
+            self.ids[doc['name']] = doc['_id']
+            self.names[doc['_id']] = doc['name']
+
+    async def id_for(self, name):
+        label_id = self.ids.get(name)
+        if label_id is None:
+            label_id = await self._add(name)
+        return label_id
+
+    async def _add(self, name):
+        collection = get_database()[self.collection_name]
+        while True:
+            doc = await collection.find_one({'name': name})
+            if doc is None:
+                last = await collection.find_one(sort=[('_id', DESCENDING)])
+                doc = {'_id': last['_id'] + 1 if last else 1, 'name': name}
+                try:
+                    await collection.insert_one(doc)
+                except DuplicateKeyError:
+                    continue
+            self.ids[name] = doc['_id']
+            self.names[doc['_id']] = name
+            return doc['_id']
+
+    async def known_ids(self, names):
+        """Ids of the labels in `names` that have one; labels never stored match no flow."""
+        if any(name not in self.ids for name in names):
+            await self.load()
+        return [self.ids[name] for name in names if name in self.ids]
+
+    async def names_for(self, ids):
+        if any(label_id not in self.names for label_id in ids):
+            await self.load()
+        return self.names
+
+
+class TrafficStore:
+    """
+    Storage policy for classified flows: compact documents in one collection
+    per UTC day, so retention drops whole collections (and their indexes)
+    instead of deleting documents, and disk use follows the retention window.
+
+    Once a day partition is `retention` seconds past its end, its flows are
+    folded into the minute, hour and day rollups that outlive it and the
+    partition is dropped. The fold takes the larger of the stored and the
+    recomputed value of every counter, so it only fills in what the live
+    RollupWriter missed (e.g. writes that failed) and never double counts.
+    """
+
+    def __init__(self, prefix="classified_traffic", retention=TRAFFIC_RETENTION,
+                 check_interval=RETENTION_CHECK_INTERVAL, top_talkers=ROLLUP_TOP_TALKERS):
+        self.prefix = prefix
+        self.retention = retention
+        self.check_interval = check_interval
+        self.top_talkers = top_talkers
+        self.labels = LabelIds()
+        self.indexed = set()  # partitions whose indexes exist
+        self.task = None
+        self.dropped = 0
+
+    # === Partitions ===
+
+    def partition_for(self, timestamp):
+        return f"{self.prefix}_{datetime.fromtimestamp(timestamp, tz=timezone.utc):%Y%m%d}"
+
+    @staticmethod
+    def partition_start(name):
+        day = PARTITION_PATTERN.search(name).group(1)
+        return int(datetime.strptime(day, '%Y%m%d').replace(tzinfo=timezone.utc).timestamp())
+
+    async def partitions(self, start=None, end=None):
+        """Day partitions holding flows in [start, end), newest first."""
+        names = await get_database().list_collection_names(
+            filter={'name': {'$regex': f'^{self.prefix}_\\d{{8}}$'}})
+        names = [name for name in names
+                 if (start is None or self.partition_start(name) + DAY > start)
+                 and (end is None or self.partition_start(name) <= end)]
+        return sorted(names, reverse=True)
+
+    async def ensure_indexes(self, name):
+        """Every query sorts newest first with _id breaking ties; each filter gets an (equality, t, _id) index."""
+        if name in self.indexed:
+            return
+        collection = get_database()[name]
+        newest_first = [('t', DESCENDING), ('_id', DESCENDING)]
+        await collection.create_index(newest_first)
+        for field in ('l', 's', 'd'):
+            await collection.create_index([(field, ASCENDING)] + newest_first)
+        self.indexed.add(name)
+
+    # === Documents ===
+
+    async def compact(self, record):
+        doc = {'_id': record['_id'], 't': record['timestamp']}
+        for field in ('src_ip', 'dst_ip'):
+            address = encode_address(record.get(field))
+            if address is not None:
+                doc[RECORD_KEYS[field]] = address
+        doc['l'] = await self.labels.id_for(record['label'])
+
+        features = [None] * len(FEATURE_ORDER)
+        extra = {}
+        for name, value in record.items():
+            if name in RECORD_KEYS or name == '_id':
+                continue
+            index = FEATURE_INDEX.get(name)
+            if index is None:
+                extra[name] = compact_number(value)
+            else:
+                features[index] = compact_number(value)
+        while features and features[-1] is None:
+            features.pop()
+        doc['f'] = features
+        if extra:
+            doc['x'] = extra
+        return doc
+
+    async def expand_many(self, docs):
+        """Stored flows back as records with full field names (and their _id)."""
+        names = await self.labels.names_for({doc['l'] for doc in docs if 'l' in doc})
+        records = []
+        for doc in docs:
+            record = {'_id': doc['_id']}
+            for name, value in zip(FEATURE_ORDER, doc.get('f', ())):
+                if value is not None:
+                    record[name] = value
+            record.update(doc.get('x', {}))
+            record['src_ip'] = decode_address(doc.get('s'))
+            record['dst_ip'] = decode_address(doc.get('d'))
+            record['label'] = names.get(doc.get('l'))
+            record['timestamp'] = doc['t']
+            records.append(record)
+        return records
+
+    async def insert_many(self, records):
+        """
+        Store classified flow records in their day partitions. Records get their
+        _id here, so a batch retried after a failure can't be stored twice.
+        """
+        partitions = {}
+        for record in records:
+            record.setdefault('_id', ObjectId())
+            partitions.setdefault(self.partition_for(record['timestamp']), []).append(await self.compact(record))
+
+        # Write every partition before reporting document errors, like one unordered insert_many
+        write_errors = []
+        inserted = 0
+        for name, docs in partitions.items():
+            await self.ensure_indexes(name)
+            try:
+                await get_database()[name].insert_many(docs, ordered=False)
+                inserted += len(docs)
+            except BulkWriteError as e:
+                write_errors.extend(e.details.get('writeErrors', []))
+                inserted += e.details.get('nInserted', 0)
+        if write_errors:
+            raise BulkWriteError({'writeErrors': write_errors, 'nInserted': inserted})
+
+    # === Retention ===
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.shield(self.enforce_retention())
+            except Exception as e:
+                logger.error(f"Traffic retention failed: {e}")
+            await asyncio.sleep(self.check_interval)
+
+    async def enforce_retention(self, now=None):
+        """Downsample, then drop, every day partition older than the retention window."""
+        now = time.time() if now is None else now
+        for name in await self.partitions(end=now - self.retention - DAY):
+            buckets = await self.downsample(name, self.partition_start(name), now)
+            await get_database()[name].drop()
+            self.indexed.discard(name)
+            self.dropped += 1
+            logger.info(f"Dropped {name} after folding it into {buckets} rollup buckets")
+
+    async def downsample(self, name, start, now):
+        """
+        Fold one day partition into the rollup resolutions that outlive it.
+        Returns:
+            int: Rollup buckets written
+        """
+        resolutions = [resolution for resolution, width in RESOLUTIONS.items()
+                       if width >= 60 and start + DAY + ROLLUP_RETENTION[resolution] > now]
+        if not resolutions:
+            return 0
+        width = min(RESOLUTIONS[resolution] for resolution in resolutions)
+        bucket = {'$subtract': [{'$floor': '$t'}, {'$mod': [{'$floor': '$t'}, width]}]}
+        feature = {counter: {'$ifNull': [{'$arrayElemAt': ['$f', FEATURE_INDEX[name]]}, 0]}
+                   for counter, name in COUNTER_FEATURES.items()}
+        collection = get_database()[name]
+
+        buckets = {}  # (resolution, start) -> bucket
+
+        def target(resolution, second):
+            key = (resolution, second - second % RESOLUTIONS[resolution])
+            if key not in buckets:
+                buckets[key] = {**{counter: 0 for counter in COUNTERS}, 'labels': Counter(), 'talkers': Counter()}
+            return buckets[key]
+
+        # Counters and labels per finest bucket and label, folded into every resolution here
+        label_rows = await collection.aggregate([
+            {'$group': {'_id': {'b': bucket, 'l': '$l'}, 'count': {'$sum': 1},
+                        **{counter: {'$sum': expr} for counter, expr in feature.items()}}},
+        ], allowDiskUse=True).to_list(None)
+        names = await self.labels.names_for({row['_id']['l'] for row in label_rows})
+        for row in label_rows:
+            for resolution in resolutions:
+                totals = target(resolution, int(row['_id']['b']))
+                for counter in COUNTERS:
+                    totals[counter] += row[counter]
+                totals['labels'][names.get(row['_id']['l'], str(row['_id']['l']))] += row['count']
+
+        # Bytes per source IP per finest bucket
+        rows = collection.aggregate([
+            {'$match': {'s': {'$ne': None}}},
+            {'$group': {'_id': {'b': bucket, 's': '$s'},
+                        'bytes': {'$sum': {'$add': [feature['fwd_bytes'], feature['bwd_bytes']]}}}},
+        ], allowDiskUse=True)
+        async for row in rows:
+            ip = decode_address(row['_id']['s'])
+            for resolution in resolutions:
+                target(resolution, int(row['_id']['b']))['talkers'][ip] += row['bytes']
+
+        updates = []
+        for (resolution, bucket_start), totals in buckets.items():
+            fields = {counter: totals[counter] for counter in COUNTERS}
+            for label, count in totals['labels'].items():
+                fields[f"labels.{encode_key(label)}"] = count
+            for ip, total in totals['talkers'].most_common(self.top_talkers):
+                fields[f"talkers.{encode_key(ip)}"] = total
+            end = bucket_start + RESOLUTIONS[resolution]
+            expire_at = datetime.fromtimestamp(end + ROLLUP_RETENTION[resolution], tz=timezone.utc)
+            updates.append(UpdateOne(
+                {"_id": f"{resolution}:{bucket_start}"},
+                {"$max": fields, "$setOnInsert": {"resolution": resolution, "start": bucket_start, "expire_at": expire_at}},
+                upsert=True,
+            ))
+        if updates:
+            await get_database().rollups.bulk_write(updates, ordered=False)
+        return len(updates)
+
+
+traffic_store = TrafficStore()
+traffic_writer = BatchWriter("classified_traffic", spool_dir=os.path.join(SPOOL_DIR, "api", "classified_traffic"),
+                             write=traffic_store.insert_many)
+metrics.counter_from('neura_traffic_partitions_dropped_total', 'Day partitions of classified flows dropped by retention',
+                     lambda: traffic_store.dropped)
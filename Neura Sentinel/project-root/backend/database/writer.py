@@ -0,0 +1,173 @@
+import asyncio
+import logging
+
+from pymongo.errors import BulkWriteError
+
+from database.connection import get_database
+from config import DB_WRITE_BATCH_SIZE, DB_WRITE_FLUSH_INTERVAL, DB_WRITE_QUEUE_SIZE, SPOOL_REPLAY_BATCHES
+from utils.metrics import metrics
+from utils.spool import open_spool
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+DUPLICATE_KEY = 11000
+
+
+class BatchWriter:
+    """
+    Write-behind buffer for one collection. Documents are queued and written
+    with insert_many once `batch_size` are waiting or `flush_interval` seconds
+    have passed, or with `write(docs)` when the collection has its own storage
+    policy. The queue is bounded: put() waits when the database falls behind.
+
+    With a `spool_dir`, batches that fail to write are spooled to disk instead
+    of lost, and written back in bulk, `replay_batches` at a time, once writes
+    succeed again (or every flush interval while the writer is idle).
+    """
+
+    def __init__(self, collection_name, batch_size=DB_WRITE_BATCH_SIZE,
+                 flush_interval=DB_WRITE_FLUSH_INTERVAL, max_queue=DB_WRITE_QUEUE_SIZE,
+                 spool_dir=None, replay_batches=SPOOL_REPLAY_BATCHES, write=None):
+        self.collection_name = collection_name
+        self.write = write or self.insert_many
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.full = asyncio.Event()
+        self.task = None
+        self.written = 0
+        self.failed = 0
+        self.spool_dir = spool_dir
+        self.replay_batches = replay_batches
+        self.spool = None
+        register_write_metrics(self, collection_name)
+        metrics.gauge('neura_db_write_queue_depth', 'Documents waiting in a write-behind queue',
+                      self.queue.qsize, collection=collection_name)
+        if spool_dir is not None:
+            metrics.gauge('neura_db_spool_pending_batches', 'Failed write batches spooled to disk for replay',
+                          lambda: self.spool.pending if self.spool is not None else None, collection=collection_name)
+            metrics.counter_from('neura_db_spool_lost_batches_total', 'Spooled write batches dropped because the spool was full',
+                                 lambda: self.spool.dropped if self.spool is not None else 0, collection=collection_name)
+
+    async def put(self, doc):
+        await self.queue.put(doc)
+        if self.queue.qsize() >= self.batch_size:
+            self.full.set()
+
+    async def put_many(self, docs):
+        for doc in docs:
+            await self.put(doc)
+
+    def start(self):
+        if self.task is None:
+            if self.spool_dir is not None and self.spool is None:
+                self.spool = open_spool(self.spool_dir)
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Write whatever is still queued, then end the flush loop."""
+        if self.task is not None:
+            await self.queue.put(_STOP)
+            self.full.set()
+            await self.task
+            self.task = None
+        while not self.queue.empty():
+            batch = []
+            self._take(self.batch_size, batch)
+            await self._write(batch)
+        if self.spool is not None:
+            self.spool.close()
+            self.spool = None
+
+    def _take(self, limit, batch):
+        """Move queued documents into `batch`; returns True if the stop marker was reached."""
+        queue = self.queue
+        while len(batch) < limit and not queue.empty():
+            doc = queue.get_nowait()
+            if doc is _STOP:
+                return True
+            batch.append(doc)
+        return False
+
+    async def _run(self):
+        while True:
+            if self.spool is not None and self.spool.pending:
+                # Don't wait for new documents to retry the spool
+                try:
+                    doc = await asyncio.wait_for(self.queue.get(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    await self.replay()
+                    continue
+            else:
+                doc = await self.queue.get()
+            if doc is _STOP:
+                return
+            batch = [doc]
+            if self.queue.qsize() < self.batch_size - 1:
+                try:
+                    await asyncio.wait_for(self.full.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self.full.clear()
+            stopping = self._take(self.batch_size, batch)
+            await self._write(batch)
+            if stopping:
+                return
+
+    async def _write(self, batch):
+        if not batch:
+            return
+        try:
+            with self.write_seconds.time():
+                await self.write(batch)
+            self.written += len(batch)
+        except Exception as e:
+            logger.error(f"Failed to write {len(batch)} documents to {self.collection_name}: {e}")
+            # The failed write gave the documents their _ids, so a replay can't store them twice
+            if self.spool is None or not await asyncio.to_thread(self.spool.append, batch):
+                self.failed += len(batch)
+            return
+        if self.spool is not None and self.spool.pending:
+            await self.replay()
+
+    async def insert_many(self, docs):
+        await get_database()[self.collection_name].insert_many(docs, ordered=False)
+
+    async def replay(self):
+        """Write the oldest spooled batches in one write; returns False if it failed."""
+        records = await asyncio.to_thread(self.spool.read, self.replay_batches)
+        if not records:
+            return True
+        docs = [doc for batch, _ in records for doc in batch]
+        inserted = len(docs)
+        try:
+            with self.write_seconds.time():
+                await self.write(docs)
+        except BulkWriteError as e:
+            # The database is up. Documents an earlier failed write stored after all come
+            # back as duplicate keys; any other document error would only repeat, so move on
+            inserted = e.details.get('nInserted', 0)
+            errors = [error for error in e.details.get('writeErrors', []) if error['code'] != DUPLICATE_KEY]
+            if errors:
+                self.failed += len(errors)
+                logger.error(f"Spool replay to {self.collection_name}: {len(errors)} documents rejected")
+        except Exception as e:
+            logger.warning(f"Spool replay to {self.collection_name} failed: {e}")
+            return False
+        await asyncio.to_thread(self.spool.commit, records[-1][1])
+        self.written += inserted
+        if not self.spool.pending:
+            logger.info(f"Spool for {self.collection_name} replayed")
+        return True
+
+
+def register_write_metrics(writer, collection_name):
+    """Write latency histogram plus written/failed totals for a writer with `written` and `failed` counts."""
+    writer.write_seconds = metrics.histogram(
+        'neura_db_write_seconds', 'Time per bulk write', collection=collection_name)
+    metrics.counter_from('neura_db_written_total', 'Documents written',
+                         lambda: writer.written, collection=collection_name)
+    metrics.counter_from('neura_db_write_failures_total', 'Documents whose write failed',
+                         lambda: writer.failed, collection=collection_name)
+
@@ -1,11 +1,19 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 import asyncio
 import logging
 
-from routers import traffic, alerts, user, sniffer
-from database.connection import get_database
-from utils.websocket_manager import connected_clients
+from routers import traffic, alerts, user, sniffer, model
+from database.connection import connect, close
+from database.rollups import rollup_writer
+from database.storage import traffic_store, traffic_writer
+from utils.websocket_manager import alert_broadcaster, broadcaster
+from utils.event_bus import event_bus
+from utils.metrics import metrics
+from services.alerts import alert_engine
+from services.model_registry import registry
+from services.results import handle_sniffer_event
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +28,7 @@ app.include_router(sniffer.router, prefix="/sniffer", tags=["Sniffer"])
 app.include_router(traffic.router, prefix="/traffic", tags=["Traffic"])
 app.include_router(alerts.router, prefix="/alerts", tags=["Alerts"])
 app.include_router(user.router, prefix="/user", tags=["User"])
+app.include_router(model.router, prefix="/model", tags=["Model"])
 
 # === CORS ===
 app.add_middleware(
@@ -33,18 +42,58 @@ app.add_middleware(
 # === MongoDB connection on startup ===
 @app.on_event("startup")
 async def startup_event():
-    get_database()
+    await connect()
+    traffic_writer.start()
+    traffic_store.start()
+    rollup_writer.start()
+    broadcaster.start()
+    alert_broadcaster.start()
+    alert_engine.start()
+    # The model loads in the background; /ready reports when classification can start
+    registry.start()
+    app.state.event_consumer = asyncio.create_task(event_bus.consume(handle_sniffer_event))
 
-# === WebSocket endpoint at /ws/traffic ===
-@app.websocket("/ws/traffic")
-async def websocket_traffic(websocket: WebSocket):
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.event_consumer.cancel()
+    await registry.stop()
+    await alert_engine.stop()
+    await alert_broadcaster.stop()
+    await broadcaster.stop()
+    await traffic_writer.stop()
+    await traffic_store.stop()
+    await rollup_writer.stop()
+    close()
+
+# === Readiness ===
+@app.get("/ready")
+async def ready():
+    status = registry.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+# === Metrics, in the Prometheus text format (sniffer counters arrive over shared memory) ===
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# === WebSocket endpoints at /ws/traffic and /ws/alerts ===
+async def serve_websocket(websocket: WebSocket, source):
     await websocket.accept()
-    connected_clients.append(websocket)
+    channel = await source.register(websocket)
     try:
         while True:
-            await asyncio.sleep(10)  # Keep-alive ping
+            # Frames are sent by the broadcaster; this only notices the disconnect
+            await websocket.receive_text()
     except WebSocketDisconnect:
         logger.info(f"WebSocket disconnected: {websocket.client}")
     finally:
-        if websocket in connected_clients:
-            connected_clients.remove(websocket)
+        source.unregister(channel)
+
+@app.websocket("/ws/traffic")
+async def websocket_traffic(websocket: WebSocket):
+    await serve_websocket(websocket, broadcaster)
+
+@app.websocket("/ws/alerts")
+async def websocket_alerts(websocket: WebSocket):
+    # Opened and updated incidents, one coalesced frame per alert flush
+    await serve_websocket(websocket, alert_broadcaster)
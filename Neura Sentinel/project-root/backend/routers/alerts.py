@@ -1,9 +1,28 @@
-from fastapi import APIRouter
-from database.crud import get_alerts
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Optional
+from database.crud import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, query_alerts
+from services.alerts import alert_engine
 
 router = APIRouter()
 
 @router.get("/")
-async def fetch_alerts():
-    return await get_alerts()
+async def fetch_alerts(
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    label: Optional[List[str]] = Query(None),
+    severity: Optional[List[str]] = Query(None),
+    src_ip: Optional[str] = None,
+    dst_ip: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    """Alerts, newest first; paginated and filtered like /traffic/."""
+    try:
+        return await query_alerts(start, end, label, severity, src_ip, dst_ip, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
+@router.get("/active")
+async def fetch_active_alerts():
+    """Incidents that are still open, straight from the alert engine."""
+    return {"items": alert_engine.active(), "stats": alert_engine.stats()}
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, HTTPException
+from typing import Optional
+import asyncio
+import logging
+
+from services.model_registry import list_versions, registry, set_current
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.get("/status")
+async def model_status():
+    return registry.status()
+
+@router.get("/versions")
+async def model_versions():
+    return {"versions": list_versions(), "active": registry.status()["active_version"]}
+
+@router.post("/reload")
+async def reload_model(version: Optional[str] = None):
+    """Activate `version` (default: keep the active one) and load it now instead of at the next poll."""
+    try:
+        if version is not None:
+            set_current(version)
+        await asyncio.to_thread(registry.load, version)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Model reload failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return registry.status()
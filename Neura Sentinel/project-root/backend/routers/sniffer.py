@@ -6,6 +6,11 @@ import time
 import os
 import logging
 
+from config import SNIFFER_INFERENCE, SNIFFER_WORKERS, SNIFFER_STOP_TIMEOUT
+from services.overload import LEVELS, signal_names
+from utils.event_bus import event_bus
+from utils.metrics import SharedMetrics, metrics
+
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
@@ -13,17 +18,27 @@ logger = logging.getLogger(__name__)
 sniffer_process: Optional[Process] = None
 ping_process: Optional[subprocess.Popen] = None
 run_flag = Value('b', True)
+sniffer_options = {}
+INFERENCE_MODES = ("api", "embedded")
+# Capture keeps one core; flow shards get at most the rest
+MAX_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+# One metrics row for the capture process and one per shard, read by GET /metrics
+sniffer_metrics = SharedMetrics(MAX_WORKERS + 1)
+metrics.collector(sniffer_metrics.render)
 
 # === Sniffer entrypoint ===
-def run_sniffer():
-    from services.sniffer import capture_packets, set_running_flag
-    set_running_flag(run_flag)
-    capture_packets(interface='Wi-Fi', batch_interval=10)
+def run_sniffer(flag, bus, shared_metrics, inference="api", workers=1):
+    from services.sniffer import capture_packets, set_running_flag, set_event_bus, set_metrics
+    set_running_flag(flag)
+    # Flow batches (or, with embedded inference, labelled results) go to this API process over the event bus
+    set_event_bus(bus)
+    set_metrics(shared_metrics)
+    capture_packets(interface='Wi-Fi', inference=inference, workers=workers)
 
 # === Start Sniffer ===
 @router.post("/start-sniffer")
-def start_sniffer():
-    global sniffer_process, ping_process, run_flag
+def start_sniffer(inference: str = SNIFFER_INFERENCE, workers: int = SNIFFER_WORKERS):
+    global sniffer_process, ping_process
 
     if sniffer_process and sniffer_process.is_alive():
         return {
@@ -31,11 +46,25 @@ def start_sniffer():
             "message": "Sniffer is already running."
         }
 
+    if inference not in INFERENCE_MODES:
+        return {
+            "status": "error",
+            "message": f"Unknown inference mode '{inference}', expected one of {', '.join(INFERENCE_MODES)}."
+        }
+
+    if not 1 <= workers <= MAX_WORKERS:
+        return {
+            "status": "error",
+            "message": f"workers must be between 1 and {MAX_WORKERS}."
+        }
+
     try:
         run_flag.value = True
-        sniffer_process = Process(target=run_sniffer)
+        sniffer_metrics.reset()
+        sniffer_process = Process(target=run_sniffer, args=(run_flag, event_bus, sniffer_metrics, inference, workers))
         sniffer_process.start()
-        logger.info("Sniffer process started.")
+        sniffer_options.update(inference=inference, workers=workers)
+        logger.info(f"Sniffer process started ({inference} inference, {workers} workers).")
 
         # Optional ping to generate network traffic
         if os.name == "nt":  # Windows
@@ -61,14 +90,19 @@ def start_sniffer():
 # === Stop Sniffer ===
 @router.post("/stop-sniffer")
 def stop_sniffer():
-    global sniffer_process, ping_process, run_flag
+    global sniffer_process, ping_process
     stopped = False
 
     try:
         if sniffer_process and sniffer_process.is_alive():
+            # Let the capture loop see the flag and run its cleanup, which spools
+            # undelivered batches; SIGTERM would skip it, so it is only the fallback
             run_flag.value = False
-            sniffer_process.terminate()
-            sniffer_process.join()
+            sniffer_process.join(SNIFFER_STOP_TIMEOUT)
+            if sniffer_process.is_alive():
+                logger.warning(f"Sniffer did not stop within {SNIFFER_STOP_TIMEOUT}s, terminating it.")
+                sniffer_process.terminate()
+                sniffer_process.join()
             sniffer_process = None
             logger.info("Sniffer process stopped.")
             stopped = True
@@ -93,7 +127,26 @@ def stop_sniffer():
 
 # === Restart Sniffer ===
 @router.post("/restart-sniffer")
-def restart_sniffer():
+def restart_sniffer(inference: str = SNIFFER_INFERENCE, workers: int = SNIFFER_WORKERS):
     stop_sniffer()
     time.sleep(1)
-    return start_sniffer()
+    return start_sniffer(inference, workers)
+
+# === Sniffer status ===
+@router.get("/status")
+def sniffer_status():
+    running = bool(sniffer_process and sniffer_process.is_alive())
+    return {
+        "running": running,
+        "inference": sniffer_options.get("inference") if running else None,
+        "workers": sniffer_options.get("workers") if running else None,
+        "max_workers": MAX_WORKERS,
+        "bus_dropped": event_bus.dropped.value,
+        # Load shedding per sniffer process: the stage it is in and why
+        "overload": [{
+            "process": process["process"],
+            "level": LEVELS[int(process["overload_level"])],
+            "signals": signal_names(process["overload_signals"]),
+            "since": process["overload_since"] or None,
+        } for process in sniffer_metrics.processes()] if running else []
+    }
@@ -1,85 +1,146 @@
-from fastapi import APIRouter, HTTPException, WebSocket
-from pydantic import BaseModel
-from database.crud import get_recent_traffic
-from database.connection import get_database
-from services.Train_ML_Model.train_model import classify
-from utils.websocket_manager import connected_clients
+from fastapi import APIRouter, HTTPException, Query, WebSocket
+from pydantic import BaseModel, ConfigDict
+from typing import List, Optional
+from database.crud import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, query_stats, query_traffic
+from services.model_registry import MissingFeatures, ModelNotReady, registry
+from services.results import build_record, publish_results
+from utils.logger import LogSampler
 import asyncio
 import logging
 import time
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
+request_log = LogSampler(logger)
 
 class Features(BaseModel):
+    # Extra CICIDS features (e.g. 'Flow IAT Mean') are accepted under their dataset names
+    model_config = ConfigDict(extra="allow")
+
     Flow_Duration: float
     Total_Fwd_Packets: int
     Total_Backward_Packets: int
     Total_Length_of_Fwd_Packets: int
     Total_Length_of_Bwd_Packets: int
+    src_ip: Optional[str] = None
+    dst_ip: Optional[str] = None
+    timestamp: Optional[float] = None
+
+def to_feature_dict(features: Features):
+    return {
+        'Flow Duration': features.Flow_Duration,
+        'Total Fwd Packets': features.Total_Fwd_Packets,
+        'Total Backward Packets': features.Total_Backward_Packets,
+        'Total Length of Fwd Packets': features.Total_Length_of_Fwd_Packets,
+        'Total Length of Bwd Packets': features.Total_Length_of_Bwd_Packets,
+        **(features.model_extra or {})
+    }
 
 @router.post("/classify")
 async def classify_traffic(features: Features):
     try:
-        feature_dict = {
-            'Flow Duration': features.Flow_Duration,
-            'Total Fwd Packets': features.Total_Fwd_Packets,
-            'Total Backward Packets': features.Total_Backward_Packets,
-            'Total Length of Fwd Packets': features.Total_Length_of_Fwd_Packets,
-            'Total Length of Bwd Packets': features.Total_Length_of_Bwd_Packets
-        }
-
-        logger.info(f"Received features: {feature_dict}")
+        feature_dict = to_feature_dict(features)
 
         # Run classification
         loop = asyncio.get_event_loop()
-        label = await loop.run_in_executor(None, classify, feature_dict)
-
-        logger.info(f"Predicted label: {label}")
-
-        # Save to DB
-        db = get_database()
-        collection = db["classified_traffic"]
-        result = {**feature_dict, "label": label, "timestamp": time.time()}
-        collection.insert_one(result)
-
-        # Prepare payload for WebSocket clients
-        payload = {
-            "fwd": feature_dict['Total Fwd Packets'],
-            "bwd": feature_dict['Total Backward Packets'],
-            "label": label,
-            "timestamp": result["timestamp"]
-        }
-
-        # Safe broadcast to clients
-        for client in connected_clients[:]:
-            try:
-                await client.send_json(payload)
-            except Exception as e:
-                logger.warning(f"Failed to send to client: {e}")
-                connected_clients.remove(client)
+        label = await loop.run_in_executor(None, registry.classify, feature_dict)
+
+        if request_log.due():
+            logger.debug(f"Classified {feature_dict} as {label}")
+
+        # Queue for storage and the next coalesced WebSocket frame
+        record = build_record(feature_dict, label, features.src_ip, features.dst_ip, features.timestamp)
+        await publish_results([record])
 
         return {"label": label}
 
+    except ModelNotReady as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except MissingFeatures as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         logger.error(f"Classification error: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
+@router.post("/classify/batch")
+async def classify_traffic_batch(batch: List[Features]):
+    if not batch:
+        return {"labels": []}
+
+    try:
+        feature_dicts = [to_feature_dict(features) for features in batch]
+
+        # One predict() for the whole batch
+        loop = asyncio.get_event_loop()
+        labels = await loop.run_in_executor(None, registry.classify_batch, feature_dicts)
+
+        if request_log.due():
+            logger.debug(f"Classified batch of {len(labels)} flows")
+
+        # Queue the whole batch for a bulk insert and one coalesced frame
+        now = time.time()
+        records = [
+            build_record(feature_dict, label, features.src_ip, features.dst_ip, features.timestamp or now)
+            for features, feature_dict, label in zip(batch, feature_dicts, labels)
+        ]
+        await publish_results(records)
+
+        return {"labels": labels}
+
+    except ModelNotReady as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except MissingFeatures as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error(f"Batch classification error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
 @router.get("/")
-async def fetch_traffic():
-    return await get_recent_traffic()
+async def fetch_traffic(
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    label: Optional[List[str]] = Query(None),
+    src_ip: Optional[str] = None,
+    dst_ip: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    """
+    Classified flows, newest first. `start`/`end` are epoch seconds; pass the
+    returned `next_cursor` back as `cursor` for the next page.
+    """
+    try:
+        return await query_traffic(start, end, label, src_ip, dst_ip, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/stats")
+async def fetch_traffic_stats(
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    resolution: Optional[str] = Query(None, pattern="^[smhd]$"),
+    top: int = Query(10, ge=0, le=100),
+):
+    """
+    Pre-aggregated flow counts, bytes, packets and labels per second, minute,
+    hour or day, plus top talkers by bytes. Defaults to the last hour; the resolution
+    defaults to the finest that keeps the series short.
+    """
+    try:
+        return await query_stats(start, end, resolution, top)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 # Optional: Legacy websocket loop, can be removed if you're broadcasting from /classify
 @router.websocket("/ws/traffic")
 async def websocket_traffic(websocket: WebSocket):
     await websocket.accept()
-    db = get_database()
-    collection = db["classified_traffic"]
 
     try:
         while True:
-            latest = collection.find().sort("timestamp", -1).limit(1)
-            for doc in latest:
+            page = await query_traffic(limit=1)
+            doc = page["items"][0] if page["items"] else None
+            if doc:
                 await websocket.send_json({
                     "fwd": doc.get("Total Fwd Packets", 0),
                     "bwd": doc.get("Total Backward Packets", 0),
@@ -1,18 +1,24 @@
+import numpy as np
 import pandas as pd
 
-# Path to the combined dataset (absolute path)
-DATASET_PATH = r"C:\Users\Vansh Verma\Desktop\NEURA\project-root\combined_cicids2017.csv"
+from prepare_dataset import open_segments, PREPARED_DATASET_DIR
 
-# Load the combined dataset
-df = pd.read_csv(DATASET_PATH)
-
-# Strip whitespace from column names
-df.columns = df.columns.str.strip()
+# Memory-map the prepared dataset segments (see prepare_dataset.py)
+manifest, segments = open_segments()
 
 # Display basic information
-print("Dataset Info:")
-df.info()
-print("\nFirst 5 Rows:")
-print(df.head())
+print(f"Dataset: {PREPARED_DATASET_DIR}")
+print(f"Columns: {len(manifest['columns'])}")
+for file_name, entry in sorted(manifest['segments'].items()):
+    print(f"  {file_name}: {entry['rows']} rows ({entry['read']} read, "
+          f"{entry['incomplete']} incomplete, {entry['duplicates']} duplicates)")
+
+if segments:
+    print("\nFirst 5 Rows:")
+    print(pd.DataFrame(segments[0][1][:, :5].T, columns=manifest['columns']))
+
 print("\nLabel Distribution:")
-print(df['Label'].value_counts())
\ No newline at end of file
+counts = np.zeros(len(manifest['labels']), dtype=np.int64)
+for _, _, label_ids, _ in segments:
+    counts += np.bincount(label_ids, minlength=len(counts))
+print(pd.Series(counts, index=manifest['labels']).sort_values(ascending=False))
@@ -0,0 +1,274 @@
+import os
+import sys
+import json
+import time
+import pickle
+import argparse
+import warnings
+import numpy as np
+import sklearn
+from sklearn.utils.fixes import parse_version
+
+BACKEND_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if BACKEND_ROOT not in sys.path:
+    sys.path.append(BACKEND_ROOT)
+
+# sklearn < 1.4 stores weighted class counts in tree_.value and normalizes them in
+# predict_proba; later releases store the fractions and return them as-is
+NORMALIZE_LEAF_VALUES = parse_version(sklearn.__version__) < parse_version('1.4')
+
+
+def flatten_tree(tree, max_depth=None):
+    """
+    Flat node arrays for one fitted sklearn tree, optionally cut at `max_depth`.
+    Leaves (and nodes at the cut) point to themselves, so traversal can run a
+    fixed number of steps without checking for leaves.
+    Returns:
+        dict: feature, threshold, left, right, missing_left, value, depth
+    """
+    t = tree.tree_
+    left = t.children_left
+    right = t.children_right
+    depth = t.compute_node_depths() - 1  # root at depth 0
+
+    keep = np.ones(t.node_count, dtype=bool) if max_depth is None else depth <= max_depth
+    is_leaf = left == -1
+    if max_depth is not None:
+        is_leaf |= depth == max_depth
+    # Node ids are preorder, so renumbering the kept nodes in order keeps the root at 0
+    new_id = np.cumsum(keep) - 1
+    own = new_id[keep]
+    leaf = is_leaf[keep]
+
+    # Class fractions per node, exactly as DecisionTreeClassifier.predict_proba returns them
+    value = t.value[:, 0, :][keep].astype(np.float64)
+    if NORMALIZE_LEAF_VALUES:
+        normalizer = value.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        value = value / normalizer
+
+    missing_left = getattr(t, 'missing_go_to_left', np.zeros(t.node_count, dtype=np.uint8))
+    return {
+        'feature': np.where(leaf, 0, t.feature[keep]).astype(np.int32),
+        'threshold': np.where(leaf, 0.0, t.threshold[keep]),
+        'left': np.where(leaf, own, new_id[np.maximum(left[keep], 0)]).astype(np.int32),
+        'right': np.where(leaf, own, new_id[np.maximum(right[keep], 0)]).astype(np.int32),
+        'missing_left': np.asarray(missing_left)[keep].astype(bool),
+        'value': value,
+        'depth': int(depth[keep].max()),
+    }
+
+
+class FlatForest:
+    """
+    A fitted RandomForestClassifier as flat NumPy node arrays, evaluated by
+    stepping every (tree, row) pair down one level per iteration.
+
+    Mirrors sklearn's arithmetic (float32 inputs, per-tree leaf class
+    fractions summed in tree order, then divided by the tree count), so the
+    probabilities and predictions are bit-identical to the source model.
+    A depth-limited export trades that for smaller, faster trees.
+    """
+
+    # Node arrays saved and loaded as-is
+    ARRAYS = ('feature', 'threshold', 'left', 'right', 'missing_left', 'value', 'roots', 'classes')
+
+    def __init__(self, feature, threshold, left, right, missing_left, value, roots, classes,
+                 depth, labels=None, features=None, max_depth=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.missing_left = missing_left
+        self.value = value
+        self.roots = roots
+        self.classes = classes
+        self.depth = int(depth)
+        self.labels = labels
+        self.features = features
+        self.max_depth = max_depth
+        # Child lookup as one gather: children[2 * node + went_right]
+        self._children = np.column_stack([left, right]).ravel()
+        self._is_leaf = left == np.arange(len(left))
+
+    @classmethod
+    def from_sklearn(cls, forest, max_depth=None, labels=None, features=None):
+        """
+        Args:
+            forest (RandomForestClassifier): Fitted single-output forest
+            max_depth (int): Cut every tree at this depth; None exports them whole
+            labels (array): Label names indexed by forest class (LabelEncoder.classes_)
+            features (list[str]): Feature order the forest was trained on
+        """
+        parts = [flatten_tree(tree, max_depth) for tree in forest.estimators_]
+        sizes = [len(part['feature']) for part in parts]
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int32)
+        return cls(
+            feature=np.concatenate([part['feature'] for part in parts]),
+            threshold=np.concatenate([part['threshold'] for part in parts]),
+            left=np.concatenate([part['left'] + offset for part, offset in zip(parts, offsets)]),
+            right=np.concatenate([part['right'] + offset for part, offset in zip(parts, offsets)]),
+            missing_left=np.concatenate([part['missing_left'] for part in parts]),
+            value=np.concatenate([part['value'] for part in parts]),
+            roots=offsets,
+            classes=np.asarray(forest.classes_),
+            depth=max(part['depth'] for part in parts),
+            labels=None if labels is None else np.asarray(labels).astype(str),
+            features=None if features is None else list(features),
+            max_depth=max_depth,
+        )
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    def apply(self, X):
+        """Leaf node id reached in every tree: shape (n_trees, n_rows)."""
+        # sklearn validates inputs to float32, then compares them against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        values = X.astype(np.float64).ravel()
+        check_nan = bool(np.isnan(values).any())
+
+        # One entry per (tree, row) pair still walking, flattened tree-major
+        nodes = np.repeat(self.roots, n_rows)
+        base = np.tile(np.arange(n_rows) * n_features, self.n_trees)
+        pending = np.arange(len(nodes))
+        leaves = np.empty(len(nodes), dtype=np.int32)
+        feature, threshold, children, is_leaf = self.feature, self.threshold, self._children, self._is_leaf
+
+        for step in range(self.depth):
+            x = values[base + feature[nodes]]
+            go_right = x > threshold[nodes]
+            if check_nan:
+                # NaN compares false both ways; sklearn sends it where the split learned to
+                missing = np.isnan(x)
+                go_right[missing] = ~self.missing_left[nodes[missing]]
+            nodes = children[2 * nodes + go_right]
+
+            # Retire pairs that reached a leaf so later levels only touch the deep ones
+            if step % 4 == 3:
+                done = is_leaf[nodes]
+                if done.any():
+                    leaves[pending[done]] = nodes[done]
+                    walking = ~done
+                    nodes, base, pending = nodes[walking], base[walking], pending[walking]
+                    if not len(nodes):
+                        break
+        leaves[pending] = nodes
+        return leaves.reshape(self.n_trees, n_rows)
+
+    def predict_proba(self, X):
+        leaf_values = self.value[self.apply(X)]  # (n_trees, n_rows, n_classes)
+        # Reducing the outer axis adds tree by tree, in order, as sklearn's forest does
+        proba = np.add.reduce(leaf_values, axis=0)
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X):
+        """Forest class per row (the encoded label, as sklearn's predict returns)."""
+        return self.classes.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+    def predict_labels(self, X):
+        """Label names per row; needs `labels`."""
+        return self.labels[self.predict(X)]
+
+    # === Serialization ===
+
+    def save(self, path):
+        """Write every array as its own .npy under directory `path`, so loads can memory-map them."""
+        os.makedirs(path, exist_ok=True)
+        arrays = {name: getattr(self, name) for name in self.ARRAYS}
+        if self.labels is not None:
+            arrays['labels'] = self.labels
+        if self.features is not None:
+            arrays['features'] = np.asarray(self.features)
+        for name, array in arrays.items():
+            np.save(os.path.join(path, name + '.npy'), array, allow_pickle=False)
+        with open(os.path.join(path, 'forest.json'), 'w') as f:
+            json.dump({'depth': self.depth, 'max_depth': self.max_depth, 'n_trees': self.n_trees}, f)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """Open a saved forest; with mmap_mode the node arrays are paged in on first use."""
+        with open(os.path.join(path, 'forest.json')) as f:
+            meta = json.load(f)
+
+        def array(name):
+            return np.load(os.path.join(path, name + '.npy'), mmap_mode=mmap_mode, allow_pickle=False)
+
+        optional = {name: array(name) for name in ('labels', 'features')
+                    if os.path.exists(os.path.join(path, name + '.npy'))}
+        return cls(
+            depth=meta['depth'],
+            max_depth=meta['max_depth'],
+            labels=optional.get('labels'),
+            features=optional['features'].tolist() if 'features' in optional else None,
+            **{name: array(name) for name in cls.ARRAYS},
+        )
+
+
+def export_model(model_path, out_path=None, max_depth=None):
+    """
+    Export a pickled classifier (as saved by train_model) to a FlatForest directory.
+    Returns:
+        (FlatForest, str): The exported engine and where it was written
+    """
+    with open(model_path, 'rb') as f:
+        saved = pickle.load(f)
+    flat = FlatForest.from_sklearn(saved['model'], max_depth, saved['label_encoder'].classes_,
+                                   saved.get('features'))
+    if out_path is None:
+        suffix = '.flat' if max_depth is None else f'.d{max_depth}.flat'
+        out_path = os.path.splitext(model_path)[0] + suffix
+    flat.save(out_path)
+    return flat, out_path
+
+
+if __name__ == "__main__":
+    from services.model_registry import current_model_path
+
+    parser = argparse.ArgumentParser(description="Export the classifier to flat node arrays")
+    parser.add_argument("--model", default=None, help="pickled classifier to export (default: the active version)")
+    parser.add_argument("--out", default=None, help="output directory (default: next to the model)")
+    parser.add_argument("--max-depth", type=int, default=None, help="cut trees at this depth")
+    parser.add_argument("--check-rows", type=int, default=10000,
+                        help="random rows to compare against sklearn (0 to skip)")
+    args = parser.parse_args()
+
+    args.model = args.model or current_model_path()
+    flat, out_path = export_model(args.model, args.out, args.max_depth)
+    print(f"Exported {flat.n_trees} trees, {flat.n_nodes} nodes, depth {flat.depth} to {out_path}")
+
+    if args.check_rows:
+        with open(args.model, 'rb') as f:
+            forest = pickle.load(f)['model']
+        forest.n_jobs = 1
+        rng = np.random.default_rng(0)
+        # Draw around the thresholds the trees actually split on
+        X = rng.choice(flat.threshold, size=(args.check_rows, forest.n_features_in_)).astype(np.float32)
+        X += rng.normal(scale=1.0, size=X.shape).astype(np.float32)
+
+        def single_row_us(predict, repeat=20):
+            predict(X[:1])
+            start = time.perf_counter()
+            for i in range(repeat):
+                predict(X[i:i + 1])
+            return (time.perf_counter() - start) / repeat * 1e6
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)
+            expected = forest.predict_proba(X)
+            sklearn_us = single_row_us(forest.predict)
+        got = flat.predict_proba(X)
+        flat_us = single_row_us(flat.predict)
+
+        if args.max_depth is None:
+            print(f"Bit-identical probabilities: {np.array_equal(got, expected)}")
+        agreement = (np.argmax(got, axis=1) == np.argmax(expected, axis=1)).mean()
+        print(f"Prediction agreement with sklearn: {agreement:.4%}")
+        print(f"Single-row predict: sklearn {sklearn_us:.0f} us, flat {flat_us:.0f} us")
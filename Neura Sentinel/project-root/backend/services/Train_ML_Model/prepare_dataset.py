@@ -0,0 +1,302 @@
+import os
+import sys
+import json
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+
+BACKEND_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if BACKEND_ROOT not in sys.path:
+    sys.path.append(BACKEND_ROOT)
+
+from config import DATASET_SOURCE_DIR, PREPARED_DATASET_DIR
+from services.flow_features import BASIC_FEATURES, FLOW_FEATURES
+
+# === Output layout ===
+# One segment per source CSV, so only changed day-files are re-ingested:
+#   segments/<name>.f32   column-major float32 matrix, one row per FLOW_FEATURES entry
+#   segments/<name>.u8    one label id per flow, indexing the manifest's "labels"
+#   segments/<name>.h64   one 64-bit content hash per flow, for cross-file dedup
+# manifest.json records columns, label names, and each source's size, mtime,
+# sha256 and row counts.
+MANIFEST_FILE = 'manifest.json'
+SEGMENT_DIR = 'segments'
+MANIFEST_VERSION = 1
+
+CHUNK_ROWS = 100000
+# Rows missing any of these are dropped, as the old clean_csv.py did
+REQUIRED_COLUMNS = [FLOW_FEATURES.index(name) for name in BASIC_FEATURES]
+
+
+def read_columns(path):
+    """Map stripped CICIDS column names to the raw (space-padded) header names."""
+    header = pd.read_csv(path, nrows=0, encoding='latin1')
+    return {name.strip(): name for name in header.columns}
+
+
+def iter_chunks(path, chunk_rows=CHUNK_ROWS):
+    """
+    Read one source CSV in chunks, parsing only the feature and label columns.
+    Yields DataFrames with stripped column names in FLOW_FEATURES order plus 'Label'.
+    """
+    raw = read_columns(path)
+    missing = [name for name in FLOW_FEATURES + ['Label'] if name not in raw]
+    if missing:
+        raise ValueError(f"Missing required columns: {missing}")
+
+    # float32 is what the forest trains and predicts on, so nothing is lost
+    dtypes = {raw[name]: np.float32 for name in FLOW_FEATURES}
+    dtypes[raw['Label']] = str
+    rename = {raw_name: name for name, raw_name in raw.items()}
+    reader = pd.read_csv(path, usecols=list(dtypes), dtype=dtypes, encoding='latin1',
+                         chunksize=chunk_rows)
+    for chunk in reader:
+        chunk = chunk.rename(columns=rename)
+        yield chunk[FLOW_FEATURES + ['Label']]
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class HashDeduper:
+    """
+    Drops rows already seen, across chunks, by a 64-bit hash of their values.
+    Keeps only a sorted uint64 array: 8 bytes per unique row.
+    """
+
+    def __init__(self):
+        self.seen = np.empty(0, dtype=np.uint64)
+
+    def keep_mask(self, hashes):
+        keep = np.zeros(len(hashes), dtype=bool)
+        keep[np.unique(hashes, return_index=True)[1]] = True
+
+        seen = self.seen
+        if len(seen):
+            pos = np.searchsorted(seen, hashes).clip(max=len(seen) - 1)
+            keep &= seen[pos] != hashes
+
+        self.seen = np.union1d(seen, hashes[keep])
+        return keep
+
+
+# === Ingest ===
+
+def segment_paths(output_dir, file_name):
+    base = os.path.join(output_dir, SEGMENT_DIR, os.path.splitext(file_name)[0])
+    return base + '.f32', base + '.u8', base + '.h64'
+
+
+def ingest_file(path, output_dir, labels, chunk_rows=CHUNK_ROWS):
+    """
+    Stream one source CSV into its segment files.
+    Args:
+        labels (dict): Label name -> id, shared by all segments; new labels are added
+    Returns:
+        dict: Row counts for the manifest
+    """
+    features_path, labels_path, hashes_path = segment_paths(output_dir, os.path.basename(path))
+    rows_path = features_path + '.rows'
+    deduper = HashDeduper()
+    stats = {'read': 0, 'incomplete': 0, 'duplicates': 0, 'rows': 0}
+
+    # Rows are appended row-major while streaming, then rewritten column-major
+    with open(rows_path, 'wb') as rows_out, open(labels_path + '.tmp', 'wb') as labels_out, \
+            open(hashes_path + '.tmp', 'wb') as hashes_out:
+        for chunk in iter_chunks(path, chunk_rows):
+            stats['read'] += len(chunk)
+
+            # Rate features are infinite for zero-duration flows; keep them as NaN
+            values = chunk[FLOW_FEATURES].to_numpy(dtype=np.float32)
+            values[np.isinf(values)] = np.nan
+            complete = ~np.isnan(values[:, REQUIRED_COLUMNS]).any(axis=1)
+            complete &= chunk['Label'].notna().to_numpy()
+            stats['incomplete'] += int((~complete).sum())
+
+            chunk = chunk[complete]
+            values = values[complete]
+            hashes = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+            keep = deduper.keep_mask(hashes)
+            stats['duplicates'] += int((~keep).sum())
+
+            label_ids = [labels.setdefault(label.strip(), len(labels)) for label in chunk['Label'][keep]]
+            np.ascontiguousarray(values[keep]).tofile(rows_out)
+            np.asarray(label_ids, dtype=np.uint8).tofile(labels_out)
+            hashes[keep].tofile(hashes_out)
+            stats['rows'] += int(keep.sum())
+
+    n_rows = stats['rows']
+    with open(features_path + '.tmp', 'wb') as features_out:
+        if n_rows:
+            by_row = np.memmap(rows_path, dtype=np.float32, mode='r', shape=(n_rows, len(FLOW_FEATURES)))
+            for column in range(len(FLOW_FEATURES)):
+                np.ascontiguousarray(by_row[:, column]).tofile(features_out)
+            del by_row
+    os.remove(rows_path)
+
+    for final in (features_path, labels_path, hashes_path):
+        os.replace(final + '.tmp', final)
+    return stats
+
+
+def load_manifest(output_dir=PREPARED_DATASET_DIR):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, output_dir):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def prepare_dataset(source_dir=DATASET_SOURCE_DIR, output_dir=PREPARED_DATASET_DIR, chunk_rows=CHUNK_ROWS, force=False):
+    """
+    Bring the prepared dataset up to date with the CICIDS2017 CSVs in `source_dir`.
+    Only sources whose size and mtime (then sha256) changed are re-ingested.
+    Args:
+        source_dir (str): Folder holding the MachineLearningCVE CSVs
+        output_dir (str): Folder for the prepared dataset
+        chunk_rows (int): Rows parsed at a time; bounds peak memory
+        force (bool): Re-ingest every source
+    Returns:
+        dict: The updated manifest
+    """
+    os.makedirs(os.path.join(output_dir, SEGMENT_DIR), exist_ok=True)
+    manifest = load_manifest(output_dir)
+    if (force or manifest is None or manifest.get('version') != MANIFEST_VERSION
+            or manifest.get('columns') != FLOW_FEATURES):
+        manifest = {'version': MANIFEST_VERSION, 'columns': FLOW_FEATURES, 'labels': [], 'segments': {}}
+
+    labels = {name: i for i, name in enumerate(manifest['labels'])}
+    segments = manifest['segments']
+    sources = sorted(name for name in os.listdir(source_dir) if name.endswith('.csv'))
+
+    for file_name in list(segments):
+        if file_name not in sources:
+            print(f"Dropping {file_name} (source removed)")
+            for path in segment_paths(output_dir, file_name):
+                if os.path.exists(path):
+                    os.remove(path)
+            del segments[file_name]
+
+    for file_name in sources:
+        path = os.path.join(source_dir, file_name)
+        stat = os.stat(path)
+        entry = segments.get(file_name)
+        if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+            continue
+
+        sha256 = file_sha256(path)
+        if entry and entry['sha256'] == sha256:
+            # Touched but unchanged
+            entry['mtime'] = stat.st_mtime
+            save_manifest(manifest, output_dir)
+            continue
+
+        print(f"Reading {file_name}...")
+        try:
+            stats = ingest_file(path, output_dir, labels, chunk_rows)
+        except Exception as e:
+            print(f"Error reading {file_name}: {e}")
+            continue
+        segments[file_name] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'sha256': sha256, **stats}
+        manifest['labels'] = list(labels)
+        # Saved per file, so an interrupted run keeps the segments it finished
+        save_manifest(manifest, output_dir)
+        print(f"  {stats['read']} read, {stats['incomplete']} incomplete, "
+              f"{stats['duplicates']} duplicates, {stats['rows']} kept")
+
+    save_manifest(manifest, output_dir)
+    print(f"Prepared dataset up to date in {output_dir} "
+          f"({sum(entry['rows'] for entry in segments.values())} rows in {len(segments)} segments)")
+    return manifest
+
+
+# === Load ===
+
+def dataset_exists(output_dir=PREPARED_DATASET_DIR):
+    manifest = load_manifest(output_dir)
+    return bool(manifest and manifest['segments'])
+
+
+def open_segments(output_dir=PREPARED_DATASET_DIR, sources=None):
+    """
+    Memory-map every segment (or just those of `sources`) without reading it.
+    Returns:
+        (dict, list): The manifest and, per segment in source order,
+        (name, features (columns x rows), label ids, row hashes)
+    """
+    manifest = load_manifest(output_dir)
+    n_columns = len(manifest['columns'])
+    segments = []
+    for file_name in sorted(manifest['segments']):
+        if sources is not None and file_name not in sources:
+            continue
+        n_rows = manifest['segments'][file_name]['rows']
+        if not n_rows:
+            continue
+        features_path, labels_path, hashes_path = segment_paths(output_dir, file_name)
+        segments.append((
+            file_name,
+            np.memmap(features_path, dtype=np.float32, mode='r', shape=(n_columns, n_rows)),
+            np.memmap(labels_path, dtype=np.uint8, mode='r', shape=(n_rows,)),
+            np.memmap(hashes_path, dtype=np.uint64, mode='r', shape=(n_rows,)),
+        ))
+    return manifest, segments
+
+
+def load_prepared(feature_order, output_dir=PREPARED_DATASET_DIR, sources=None):
+    """
+    Assemble a training matrix from the segments (all, or those of the source
+    files in `sources`), reading only the requested columns. Drops flows duplicated in an earlier segment and flows with a
+    missing (NaN) value in `feature_order`.
+    Returns:
+        (np.ndarray, np.ndarray, list[str]): float32 features (n x len(feature_order)),
+        label ids, and label names indexed by id
+    """
+    manifest, segments = open_segments(output_dir, sources)
+    columns = [manifest['columns'].index(name) for name in feature_order]
+
+    # First pass: which rows survive, so the output is allocated once
+    deduper = HashDeduper()
+    masks = []
+    for _, features, _, hashes in segments:
+        keep = deduper.keep_mask(np.asarray(hashes))
+        for column in columns:
+            keep &= ~np.isnan(features[column])
+        masks.append(keep)
+
+    n_rows = int(sum(mask.sum() for mask in masks))
+    # Fortran order: each feature is contiguous, as the tree splitter scans them
+    X = np.empty((n_rows, len(columns)), dtype=np.float32, order='F')
+    y = np.empty(n_rows, dtype=np.uint8)
+    offset = 0
+    for (_, features, label_ids, _), keep in zip(segments, masks):
+        n = int(keep.sum())
+        for i, column in enumerate(columns):
+            X[offset:offset + n, i] = features[column][keep]
+        y[offset:offset + n] = label_ids[keep]
+        offset += n
+    return X, y, manifest['labels']
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prepare the CICIDS2017 CSVs for training")
+    parser.add_argument("--source", default=DATASET_SOURCE_DIR, help="folder with the MachineLearningCVE CSVs")
+    parser.add_argument("--output", default=PREPARED_DATASET_DIR, help="folder for the prepared dataset")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--force", action="store_true", help="re-ingest every source file")
+    args = parser.parse_args()
+    manifest = prepare_dataset(args.source, args.output, args.chunk_rows, args.force)
+    print(f"Labels: {manifest['labels']}")
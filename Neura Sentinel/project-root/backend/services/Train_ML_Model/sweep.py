@@ -0,0 +1,189 @@
+import os
+import sys
+import time
+import argparse
+import itertools
+from datetime import datetime
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from sklearn.metrics import recall_score
+from sklearn.model_selection import train_test_split
+
+BACKEND_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if BACKEND_ROOT not in sys.path:
+    sys.path.append(BACKEND_ROOT)
+
+from config import MODEL_DIR
+from services.flow_features import resolve_feature_set
+from services.model_registry import FLAT_MAX_BATCH, load_saved, publish_model
+from services.Train_ML_Model.flat_forest import FlatForest
+from services.Train_ML_Model.train_model import build_forest, load_training_data, save_model
+
+REPORT_PATH = os.path.join(os.path.dirname(__file__), 'performance_report.txt')
+SWEEP_DIR = os.path.join(MODEL_DIR, 'sweep')
+
+DEFAULT_GRID = {
+    'features': ['basic', 'full'],
+    'n_estimators': [50, 100, 200],
+    'max_depth': [None, 20, 12],
+}
+# Each worker loads and splits its own copy of the dataset, so RAM grows with workers;
+# past a few, fits get the cores through n_jobs instead
+MAX_DEFAULT_WORKERS = 4
+LATENCY_ROWS = 200    # single-row predictions timed per candidate
+BATCH_ROWS = FLAT_MAX_BATCH  # rows in the timed batch: the largest the API serves through FlatForest
+
+
+@lru_cache(maxsize=2)
+def split_data(feature_order):
+    """Train/test split for one feature set, cached per worker process."""
+    X, y, le = load_training_data(list(feature_order))
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    return X_train, X_test, y_train, y_test, le
+
+
+def measure_latency(model, X_test):
+    """
+    Time predictions the way the API serves them: float64 arrays through the
+    model's FlatForest export, which answers every batch up to FLAT_MAX_BATCH rows.
+    Returns:
+        (float, float): Median microseconds for a one-row call, and microseconds
+        per row within a BATCH_ROWS batch
+    """
+    flat = FlatForest.from_sklearn(model)
+    rows = X_test.to_numpy(dtype=np.float64)
+    single = []
+    for i in range(min(LATENCY_ROWS, len(rows))):
+        start = time.perf_counter()
+        flat.predict(rows[i:i + 1])
+        single.append(time.perf_counter() - start)
+
+    batch = rows[:BATCH_ROWS]
+    best = float('inf')
+    for _ in range(3):
+        start = time.perf_counter()
+        flat.predict(batch)
+        best = min(best, time.perf_counter() - start)
+    return float(np.median(single)) * 1e6, best / max(1, len(batch)) * 1e6
+
+
+def run_candidate(candidate):
+    """Fit and evaluate one sweep candidate; runs in a worker process."""
+    feature_set, n_estimators, max_depth, n_jobs = candidate
+    feature_order = resolve_feature_set(feature_set)
+    X_train, X_test, y_train, y_test, le = split_data(tuple(feature_order))
+    name = f"{feature_set}-{n_estimators}t-d{max_depth or 'full'}"
+
+    model = build_forest(n_estimators, max_depth, n_jobs)
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_s = time.perf_counter() - start
+
+    # Evaluate as served: one thread per prediction call
+    model.n_jobs = 1
+    y_pred = model.predict(X_test)
+    recall = recall_score(y_test, y_pred, labels=np.arange(len(le.classes_)), average=None, zero_division=0)
+    row_us, batch_us = measure_latency(model, X_test)
+
+    path = os.path.join(SWEEP_DIR, name + '.pkl')
+    save_model(model, le, feature_order, path)
+    return {
+        'name': name,
+        'features': feature_set,
+        'n_estimators': n_estimators,
+        'max_depth': max_depth,
+        'accuracy': float((y_pred == y_test).mean()),
+        'macro_recall': float(recall.mean()),
+        'recall': dict(zip(le.classes_.tolist(), recall.round(4).tolist())),
+        'fit_s': round(fit_s, 2),
+        'row_us': round(row_us, 1),
+        'batch_us_per_row': round(batch_us, 2),
+        'size_mb': round(os.path.getsize(path) / 1e6, 2),
+        'path': path,
+    }
+
+
+def select_model(results, latency_budget_us=None):
+    """Best macro recall (then accuracy) among candidates within the per-row batch latency budget."""
+    eligible = [r for r in results if latency_budget_us is None or r['batch_us_per_row'] <= latency_budget_us]
+    if not eligible:
+        return None
+    return max(eligible, key=lambda r: (r['macro_recall'], r['accuracy']))
+
+
+def append_report(results, selected, latency_budget_us, path=REPORT_PATH):
+    """Append the sweep results to performance_report.txt."""
+    lines = [
+        "",
+        f"=== Training sweep {datetime.now():%Y-%m-%d %H:%M} ===",
+        f"{'candidate':<24} {'accuracy':>8} {'macro rec':>9} {'fit s':>8} "
+        f"{'row us':>8} {'batch us/row':>12} {'size MB':>8}",
+    ]
+    for r in sorted(results, key=lambda r: -r['macro_recall']):
+        lines.append(f"{r['name']:<24} {r['accuracy']:>8.4f} {r['macro_recall']:>9.4f} {r['fit_s']:>8.2f} "
+                     f"{r['row_us']:>8.1f} {r['batch_us_per_row']:>12.2f} {r['size_mb']:>8.2f}")
+    lines.append("")
+    lines.append("Per-class recall:")
+    for r in results:
+        lines.append(f"  {r['name']}: " + ", ".join(f"{label} {value:.2f}" for label, value in r['recall'].items()))
+    budget = f"{latency_budget_us} us/row" if latency_budget_us is not None else "none"
+    lines.append("")
+    lines.append(f"Latency budget: {budget}; selected: {selected['name'] if selected else 'none within budget'}")
+
+    with open(path, 'a') as f:
+        f.write("\n".join(lines) + "\n")
+    print("\n".join(lines))
+
+
+def run_sweep(grid=None, workers=None, latency_budget_us=None, save_best=False):
+    """
+    Fit every combination in `grid` across a process pool and report on them.
+    Args:
+        grid (dict): Lists of 'features', 'n_estimators' and 'max_depth' values
+        workers (int): Concurrent fits (default: up to MAX_DEFAULT_WORKERS); each gets an
+            equal share of the cores for n_jobs and holds its own copy of the dataset
+        latency_budget_us (float): Max batch prediction cost per row for the selected model
+        save_best (bool): Publish the selected model as the active version
+    Returns:
+        (list[dict], dict | None): Results per candidate and the selected one
+    """
+    grid = {**DEFAULT_GRID, **(grid or {})}
+    combos = list(itertools.product(grid['features'], grid['n_estimators'], grid['max_depth']))
+    cores = os.cpu_count() or 1
+    workers = max(1, min(workers or min(cores, MAX_DEFAULT_WORKERS), len(combos)))
+    n_jobs = max(1, cores // workers)
+    os.makedirs(SWEEP_DIR, exist_ok=True)
+
+    print(f"Sweeping {len(combos)} candidates on {workers} workers x {n_jobs} cores")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(run_candidate, [combo + (n_jobs,) for combo in combos]))
+
+    selected = select_model(results, latency_budget_us)
+    append_report(results, selected, latency_budget_us)
+    if save_best and selected:
+        saved = load_saved(selected['path'])
+        version = publish_model(saved['model'], saved['label_encoder'], saved['features'])
+        print(f"Published {selected['name']} as model version {version}")
+    return results, selected
+
+
+def _depth(value):
+    return None if value in ('none', 'None', 'full') else int(value)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hyperparameter sweep for the traffic classifier")
+    parser.add_argument("--features", nargs="+", default=DEFAULT_GRID['features'],
+                        help="feature sets to try ('basic', 'full' or comma-separated columns)")
+    parser.add_argument("--trees", nargs="+", type=int, default=DEFAULT_GRID['n_estimators'])
+    parser.add_argument("--max-depth", nargs="+", type=_depth, default=DEFAULT_GRID['max_depth'],
+                        help="depths to try; 'none' grows trees fully")
+    parser.add_argument("--workers", type=int, default=None,
+                        help=f"concurrent fits, each with its own copy of the dataset (default: up to {MAX_DEFAULT_WORKERS})")
+    parser.add_argument("--latency-budget-us", type=float, default=None,
+                        help="max batch prediction cost per row for the selected model")
+    parser.add_argument("--save-best", action="store_true", help="publish the selected model as the active version")
+    args = parser.parse_args()
+    run_sweep({'features': args.features, 'n_estimators': args.trees, 'max_depth': args.max_depth},
+              args.workers, args.latency_budget_us, args.save_best)
@@ -1,101 +1,149 @@
+import numpy as np
 import pandas as pd
 import pickle
 import os
+import sys
+import argparse
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import LabelEncoder
 from sklearn.model_selection import train_test_split
 
-# Paths to model and dataset (relative to project-root)
-MODEL_DIR = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'ml_models')
-MODEL_PATH = os.path.join(MODEL_DIR, 'classifier.pkl')
+BACKEND_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if BACKEND_ROOT not in sys.path:
+    sys.path.append(BACKEND_ROOT)
+
+from config import MODEL_DIR
+from services.flow_features import BASIC_FEATURES, resolve_feature_set
+from services.model_registry import load_saved, publish_model
+from services.Train_ML_Model.prepare_dataset import dataset_exists, load_prepared
+
+# Legacy combined CSV (relative to project-root), used when there is no prepared dataset
 DATASET_PATH = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'cleaned_cicids2017.csv')
 
 # Ensure the ml_models directory exists
 os.makedirs(MODEL_DIR, exist_ok=True)
 
-def train_model():
-    """Train the Random Forest model and save it using pickle."""
-    # Load the dataset
+# Feature columns used by models saved without a feature list, in training order
+FEATURE_ORDER = BASIC_FEATURES
+
+# Feature set to train on: 'basic', 'full', or a comma-separated list of column names
+MODEL_FEATURES = os.getenv("MODEL_FEATURES", "basic")
+
+def load_training_data(feature_order):
+    """
+    Load the training features and encoded labels, preferring the prepared
+    dataset (see prepare_dataset.py) over the legacy cleaned CSV.
+    Returns:
+        (pd.DataFrame, np.ndarray, LabelEncoder): Features in `feature_order`,
+        encoded labels and the fitted encoder
+    """
+    le = LabelEncoder()
+    if dataset_exists():
+        X, label_ids, label_names = load_prepared(feature_order)
+        # Encode the few label names, then map ids through them
+        le.fit(label_names)
+        y_encoded = le.transform(label_names)[label_ids]
+        return pd.DataFrame(X, columns=feature_order, copy=False), y_encoded, le
+
+    print(f"No prepared dataset found, reading {DATASET_PATH}")
     data = pd.read_csv(DATASET_PATH)
 
     # Clean column names (just in case)
     data.columns = data.columns.str.strip()
 
-    # Select features and target
-    features = [
-        'Flow Duration',
-        'Total Fwd Packets',
-        'Total Backward Packets',
-        'Total Length of Fwd Packets',
-        'Total Length of Bwd Packets'
-    ]
-    X = data[features]
-    y = data['Label']
-
-    # Encode the target labels
-    le = LabelEncoder()
-    y_encoded = le.fit_transform(y)
+    # Rate features (Flow Bytes/s, ...) are infinite for zero-duration flows
+    data = data[feature_order + ['Label']].replace([np.inf, -np.inf], np.nan).dropna()
+    return data[feature_order], le.fit_transform(data['Label']), le
+
+def build_forest(n_estimators=100, max_depth=None, n_jobs=-1):
+    """Random Forest with the project's settings; n_jobs=-1 fits on every core."""
+    return RandomForestClassifier(n_estimators=n_estimators, max_depth=max_depth,
+                                  n_jobs=n_jobs, random_state=42)
+
+def save_model(model, le, feature_order, path):
+    """Save the model, label encoder and feature order together using pickle (outside the served versions)."""
+    # Serving predicts small batches, where thread fan-out costs more than it saves
+    model.n_jobs = 1
+    model_data = {'model': model, 'label_encoder': le, 'features': list(feature_order)}
+    with open(path, 'wb') as f:
+        pickle.dump(model_data, f)
+    print(f"Model and label encoder saved to {path}")
+
+def train_model(features=None, n_estimators=100, max_depth=None):
+    """
+    Train the Random Forest model and publish it as a new, active model version.
+    Args:
+        features (str | list[str]): Feature set name or columns; defaults to MODEL_FEATURES
+        n_estimators (int): Number of trees
+        max_depth (int): Maximum tree depth; None grows trees fully
+    """
+    feature_order = resolve_feature_set(features or MODEL_FEATURES)
+    X, y_encoded, le = load_training_data(feature_order)
 
     # Split the data
     X_train, X_test, y_train, y_test = train_test_split(X, y_encoded, test_size=0.2, random_state=42)
 
     # Train the model
-    model = RandomForestClassifier(n_estimators=100, random_state=42)
+    model = build_forest(n_estimators, max_depth)
     model.fit(X_train, y_train)
 
     # Evaluate the model
     accuracy = model.score(X_test, y_test)
     print(f"Model accuracy: {accuracy:.4f}")
 
-    # Save the model and label encoder together using pickle
-    model_data = {'model': model, 'label_encoder': le}
-    with open(MODEL_PATH, 'wb') as f:
-        pickle.dump(model_data, f)
-    print(f"Model and label encoder saved to {MODEL_PATH}")
-
+    publish_model(model, le, feature_order)
     return model, le
 
-# Load the model and label encoder
-model_data = None
-model = None
-label_encoder = None
-if os.path.exists(MODEL_PATH):
-    with open(MODEL_PATH, 'rb') as f:
-        model_data = pickle.load(f)
-    model = model_data['model']
-    label_encoder = model_data['label_encoder']
-else:
-    print("Model file not found. Training new model...")
-    model, label_encoder = train_model()
-
-def classify(features):
+def add_trees(extra_estimators, sources=None):
     """
-    Classify a feature set using the trained model.
+    Grow the active model version by `extra_estimators` trees (warm_start), fitted on
+    the prepared dataset or only the day-files in `sources`. Existing trees are kept.
     Args:
-        features (dict): Features extracted from a packet (e.g., {'Flow Duration': ..., ...})
+        extra_estimators (int): Number of trees to add
+        sources (list[str]): Source CSV names to fit the new trees on; None = all
     Returns:
-        str: Predicted label (e.g., 'BENIGN', 'DoS Hulk')
+        RandomForestClassifier: The grown model, published as a new version
     """
-    if model is None or label_encoder is None:
-        raise ValueError("Model or label encoder not loaded. Run train_model() first.")
-    
-    # Define the feature order
-    feature_order = [
-        'Flow Duration',
-        'Total Fwd Packets',
-        'Total Backward Packets',
-        'Total Length of Fwd Packets',
-        'Total Length of Bwd Packets'
-    ]
-
-    # Ensure the input is a DataFrame with correct column names
-    df = pd.DataFrame([[features[col] for col in feature_order]], columns=feature_order)
-
-    # Predict and decode the label
-    prediction = model.predict(df)[0]
-    label = label_encoder.inverse_transform([prediction])[0]
-    return label
+    if not dataset_exists():
+        raise ValueError("Incremental training needs the prepared dataset; run prepare_dataset.py first.")
+    saved = load_saved()
+    forest = saved['model']
+    le = saved['label_encoder']
+    order = saved.get('features', FEATURE_ORDER)
+
+    X, label_ids, label_names = load_prepared(order, sources=sources)
+    present_ids = np.unique(label_ids)
+    present = [label_names[i] for i in present_ids]
+    unknown = [name for name in present if name not in le.classes_]
+    if unknown:
+        raise ValueError(f"New labels {unknown} are unknown to the model; retrain with train_model()")
+    codes = np.zeros(len(label_names), dtype=np.int64)
+    codes[present_ids] = le.transform(present)
+    y_encoded = codes[label_ids]
+    # Every tree must see the same classes, or their votes would not line up
+    if not np.array_equal(np.unique(y_encoded), forest.classes_):
+        raise ValueError("New data must contain every class the model knows; retrain with train_model()")
+
+    forest.set_params(warm_start=True, n_estimators=forest.n_estimators + extra_estimators, n_jobs=-1)
+    forest.fit(pd.DataFrame(X, columns=order, copy=False), y_encoded)
+    forest.warm_start = False
+    print(f"Model grown to {forest.n_estimators} trees on {len(y_encoded)} rows")
+
+    publish_model(forest, le, order)
+    return forest
 
 if __name__ == "__main__":
-    # Test the module by training the model
-    train_model()
+    parser = argparse.ArgumentParser(description="Train the traffic classifier")
+    parser.add_argument("--features", default=MODEL_FEATURES,
+                        help="'basic', 'full', or comma-separated CICIDS column names")
+    parser.add_argument("--trees", type=int, default=100, help="number of trees")
+    parser.add_argument("--max-depth", type=int, default=None)
+    parser.add_argument("--add-trees", type=int, default=None,
+                        help="grow the active model by N trees instead of retraining")
+    parser.add_argument("--sources", nargs="*", default=None,
+                        help="with --add-trees: fit new trees only on these source CSVs")
+    args = parser.parse_args()
+    if args.add_trees:
+        add_trees(args.add_trees, args.sources)
+    else:
+        train_model(args.features, args.trees, args.max_depth)
@@ -0,0 +1,226 @@
+import asyncio
+import logging
+import time
+from bisect import bisect_left
+from collections import deque
+
+from bson import ObjectId
+from pymongo import ReplaceOne
+
+from config import ALERT_WINDOW, ALERT_THRESHOLD, ALERT_QUIET_PERIOD, ALERT_FLUSH_INTERVAL
+from database.connection import get_database
+from database.writer import register_write_metrics
+from utils.metrics import metrics
+from utils.websocket_manager import alert_broadcaster
+
+logger = logging.getLogger(__name__)
+
+BENIGN_LABEL = 'BENIGN'
+
+
+def incident_key(label, src_ip, dst_ip):
+    """
+    Which detections belong to one incident. Floods are grouped per victim,
+    since their sources are many (often spoofed); scans per scanner, since
+    their targets are many; everything else per source/destination pair.
+    """
+    name = label.lower()
+    if 'ddos' in name or name.startswith('dos'):
+        return (label, None, dst_ip)
+    if 'portscan' in name:
+        return (label, src_ip, None)
+    return (label, src_ip, dst_ip)
+
+
+def severity_for(label):
+    name = label.lower()
+    if 'dos' in name or 'heartbleed' in name or 'infiltration' in name:
+        return 'critical'
+    if 'bot' in name or 'patator' in name or 'web attack' in name:
+        return 'high'
+    return 'medium'
+
+
+class DetectionWindow:
+    """
+    Detections of one incident key per second, over the `window` seconds up to
+    the latest one. Timestamps can arrive out of order (batch callers supply
+    their own), so each second is inserted in place.
+    """
+
+    def __init__(self):
+        self.seconds = deque()  # [second, count, earliest timestamp], oldest first
+        self.total = 0
+        self.latest = 0.0
+
+    @property
+    def first_seen(self):
+        return self.seconds[0][2]
+
+    def add(self, timestamp, window):
+        second = int(timestamp)
+        seconds = self.seconds
+        if seconds and seconds[-1][0] == second:
+            entry = seconds[-1]
+        elif not seconds or seconds[-1][0] < second:
+            entry = [second, 0, timestamp]
+            seconds.append(entry)
+        else:
+            i = bisect_left(seconds, second, key=lambda entry: entry[0])
+            if seconds[i][0] != second:
+                seconds.insert(i, [second, 0, timestamp])
+            entry = seconds[i]
+        entry[1] += 1
+        entry[2] = min(entry[2], timestamp)
+        self.total += 1
+        self.latest = max(self.latest, timestamp)
+        self.trim(int(self.latest) - window)
+
+    def trim(self, oldest):
+        seconds = self.seconds
+        while seconds and seconds[0][0] <= oldest:
+            self.total -= seconds.popleft()[1]
+
+
+class AlertEngine:
+    """
+    Turns non-BENIGN classifications into deduplicated alerts.
+
+    Detections are counted per incident key over a sliding window. Once a key
+    reaches `threshold` detections in `window` seconds an incident opens; later
+    detections only raise its count and last-seen time, until `quiet_period`
+    seconds pass without one and it is resolved. Changed incidents are written
+    to `alerts` and pushed to /ws/alerts clients once per `flush_interval`, so
+    an attack costs one write and one message per incident per interval.
+    """
+
+    def __init__(self, window=ALERT_WINDOW, threshold=ALERT_THRESHOLD, quiet_period=ALERT_QUIET_PERIOD,
+                 flush_interval=ALERT_FLUSH_INTERVAL, collection_name="alerts"):
+        self.window = window
+        self.threshold = threshold
+        self.quiet_period = quiet_period
+        self.flush_interval = flush_interval
+        self.collection_name = collection_name
+        self.windows = {}  # incident key -> DetectionWindow
+        self.open = {}     # incident key -> alert document
+        self.dirty = {}    # alert _id -> alert document to write
+        self.task = None
+        self.raised = 0
+        self.written = 0
+        self.failed = 0
+        register_write_metrics(self, collection_name)
+
+    def observe(self, records):
+        """Count classified flow records (as built by services.results.build_record)."""
+        for record in records:
+            label = record['label']
+            if label == BENIGN_LABEL:
+                continue
+            key = incident_key(label, record.get('src_ip'), record.get('dst_ip'))
+            timestamp = record['timestamp']
+
+            alert = self.open.get(key)
+            if alert is not None:
+                alert['count'] += 1
+                alert['first_seen'] = min(alert['first_seen'], timestamp)
+                alert['timestamp'] = max(alert['timestamp'], timestamp)
+                self.dirty[alert['_id']] = alert
+                continue
+
+            window = self.windows.get(key)
+            if window is None:
+                window = self.windows[key] = DetectionWindow()
+            window.add(timestamp, self.window)
+            if window.total >= self.threshold:
+                self.open[key] = alert = self.new_alert(key, window)
+                self.dirty[alert['_id']] = alert
+                del self.windows[key]
+                self.raised += 1
+
+    def new_alert(self, key, window):
+        label, src_ip, dst_ip = key
+        return {
+            '_id': ObjectId(),
+            'label': label,
+            'severity': severity_for(label),
+            'status': 'detected',
+            'src_ip': src_ip,
+            'dst_ip': dst_ip,
+            'count': window.total,
+            'first_seen': window.first_seen,
+            'timestamp': window.latest,
+        }
+
+    def expire(self, now):
+        """Resolve quiet incidents and forget windows that fell below the threshold."""
+        for key, alert in list(self.open.items()):
+            if now - alert['timestamp'] >= self.quiet_period:
+                alert['status'] = 'resolved'
+                self.dirty[alert['_id']] = alert
+                del self.open[key]
+        for key, window in list(self.windows.items()):
+            window.trim(now - self.window)
+            if not window.total:
+                del self.windows[key]
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await asyncio.shield(self.flush())
+
+    async def flush(self, now=None):
+        self.expire(time.time() if now is None else now)
+        if not self.dirty:
+            return
+        # Snapshots: the write runs in a thread while observe() keeps updating the originals
+        alerts = [{**alert, 'details': describe(alert)} for alert in self.dirty.values()]
+        self.dirty = {}
+        alert_broadcaster.publish_many([to_payload(alert) for alert in alerts])
+        try:
+            with self.write_seconds.time():
+                await get_database()[self.collection_name].bulk_write(
+                    [ReplaceOne({'_id': alert['_id']}, alert, upsert=True) for alert in alerts], ordered=False)
+            self.written += len(alerts)
+        except Exception as e:
+            self.failed += len(alerts)
+            logger.error(f"Failed to write {len(alerts)} alerts: {e}")
+
+    def active(self):
+        return [to_payload({**alert, 'details': describe(alert)}) for alert in self.open.values()]
+
+    def stats(self):
+        return {
+            "open": len(self.open),
+            "tracking": len(self.windows),
+            "raised": self.raised,
+            "written": self.written,
+            "failed": self.failed,
+        }
+
+
+def describe(alert):
+    source = alert['src_ip'] or 'multiple sources'
+    target = alert['dst_ip'] or 'multiple hosts'
+    return f"{alert['count']} {alert['label']} flows from {source} to {target}"
+
+
+def to_payload(alert):
+    """An alert as the API and dashboards see it (string id, like /alerts/ items)."""
+    payload = {k: v for k, v in alert.items() if k != '_id'}
+    payload['id'] = str(alert['_id'])
+    return payload
+
+
+alert_engine = AlertEngine()
+metrics.gauge('neura_alerts_open', 'Incidents currently open', lambda: len(alert_engine.open))
+metrics.counter_from('neura_alerts_raised_total', 'Incidents opened', lambda: alert_engine.raised)
@@ -0,0 +1,440 @@
+import ctypes
+import mmap
+import socket
+import struct
+import sys
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# === Link / protocol constants ===
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+
+ETH_P_ALL = 0x0003
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_IPV6 = 0x86DD
+ETHERTYPE_VLAN = (0x8100, 0x88A8)
+
+PROTO_ICMP = 1
+PROTO_TCP = 6
+PROTO_UDP = 17
+PROTO_ICMPV6 = 58
+IPV6_EXT_HEADERS = (0, 43, 44, 60)
+
+PACKET_OUTGOING = 4
+SNAPLEN = 65535
+RCVBUF_BYTES = 8 * 1024 * 1024
+HEARTBEAT_INTERVAL = 0.5  # seconds an idle live capture waits before yielding a heartbeat
+PARSE_SAMPLE_EVERY = 64   # with metrics on, time the header parse of 1 packet in this many
+
+# getsockopt(SOL_PACKET, PACKET_STATISTICS): struct tpacket_stats, reset on every read
+SOL_PACKET = 263
+PACKET_STATISTICS = 6
+_tpacket_stats = struct.Struct('II')
+SO_ATTACH_FILTER = 26
+SO_DETACH_FILTER = 27
+
+_u16 = struct.Struct('!H').unpack_from
+_ports = struct.Struct('!HH').unpack_from
+_inet_ntoa = socket.inet_ntoa
+_inet_ntop = socket.inet_ntop
+_AF_INET6 = socket.AF_INET6
+
+
+def parse_frame(frame, length, linktype=LINKTYPE_ETHERNET, wire_len=None):
+    """
+    Parse just the IP and transport headers of a raw frame.
+    Args:
+        frame (bytes | bytearray | memoryview): Buffer holding the frame
+        length (int): Number of valid bytes in `frame`
+        linktype (int): pcap link-layer type of the frame
+        wire_len (int): Original frame length, if the capture was truncated
+    Returns:
+        dict | None: Same shape as packet_to_dict(), or None for non-IP frames
+    """
+    if linktype == LINKTYPE_ETHERNET:
+        if length < 14:
+            return None
+        ethertype = _u16(frame, 12)[0]
+        off = 14
+        while ethertype in ETHERTYPE_VLAN and length >= off + 4:
+            ethertype = _u16(frame, off + 2)[0]
+            off += 4
+    elif linktype == LINKTYPE_LINUX_SLL:
+        if length < 16:
+            return None
+        ethertype = _u16(frame, 14)[0]
+        off = 16
+    elif linktype == LINKTYPE_RAW:
+        if length < 1:
+            return None
+        ethertype = ETHERTYPE_IPV4 if frame[0] >> 4 == 4 else ETHERTYPE_IPV6
+        off = 0
+    else:
+        return None
+
+    if ethertype == ETHERTYPE_IPV4:
+        if length < off + 20:
+            return None
+        ihl = (frame[off] & 0x0F) * 4
+        proto = frame[off + 9]
+        src_ip = _inet_ntoa(frame[off + 12:off + 16])
+        dst_ip = _inet_ntoa(frame[off + 16:off + 20])
+        # Non-first fragments carry no transport header
+        fragmented = _u16(frame, off + 6)[0] & 0x1FFF
+        off += ihl
+    elif ethertype == ETHERTYPE_IPV6:
+        if length < off + 40:
+            return None
+        proto = frame[off + 6]
+        src_ip = _inet_ntop(_AF_INET6, bytes(frame[off + 8:off + 24]))
+        dst_ip = _inet_ntop(_AF_INET6, bytes(frame[off + 24:off + 40]))
+        fragmented = 0
+        off += 40
+        while proto in IPV6_EXT_HEADERS and length >= off + 8:
+            if proto == 44:
+                fragmented = _u16(frame, off + 2)[0] & 0xFFF8
+                ext_len = 8
+            else:
+                ext_len = (frame[off + 1] + 1) * 8
+            proto = frame[off]
+            off += ext_len
+    else:
+        return None
+
+    tcp_flags = 0
+    if proto == PROTO_TCP or proto == PROTO_UDP:
+        if fragmented or length < off + 4:
+            src_port = dst_port = 0
+        else:
+            src_port, dst_port = _ports(frame, off)
+        if proto == PROTO_TCP:
+            protocol = 'TCP'
+            if not fragmented and length >= off + 14:
+                tcp_flags = frame[off + 13]
+        else:
+            protocol = 'UDP'
+    elif proto == PROTO_ICMP or proto == PROTO_ICMPV6:
+        src_port = dst_port = 0
+        protocol = 'ICMP'
+    else:
+        return None
+
+    return {
+        'src_ip': src_ip,
+        'dst_ip': dst_ip,
+        'src_port': src_port,
+        'dst_port': dst_port,
+        'protocol': protocol,
+        'packet_size': wire_len or length,
+        'tcp_flags': tcp_flags
+    }
+
+
+def packet_to_dict(packet):
+    """Convert a pyshark packet into the sniffer's packet dict."""
+    try:
+        if hasattr(packet, 'ip'):
+            src_ip = packet.ip.src
+            dst_ip = packet.ip.dst
+        elif hasattr(packet, 'ipv6'):
+            src_ip = packet.ipv6.src
+            dst_ip = packet.ipv6.dst
+        else:
+            return None
+
+        tcp_flags = 0
+        if packet.transport_layer:
+            proto = packet.transport_layer
+            src_port = packet[proto.lower()].srcport
+            dst_port = packet[proto.lower()].dstport
+            if proto == 'TCP':
+                tcp_flags = int(packet.tcp.flags, 16)
+        elif hasattr(packet, 'icmp'):
+            proto = 'ICMP'
+            src_port = dst_port = 0
+        else:
+            return None
+
+        return {
+            'src_ip': src_ip,
+            'dst_ip': dst_ip,
+            'src_port': int(src_port),
+            'dst_port': int(dst_port),
+            'protocol': proto,
+            'packet_size': int(packet.length),
+            'tcp_flags': tcp_flags
+        }
+    except Exception:
+        return None
+
+
+# === Kernel prefilter ===
+# Classic BPF opcodes used by build_prefilter()
+BPF_LDH_ABS = 0x28   # A = u16 at [k]
+BPF_LDB_ABS = 0x30   # A = u8 at [k]
+BPF_LDH_IND = 0x48   # A = u16 at [X + k]
+BPF_LDX_MSH = 0xb1   # X = 4 * ([k] & 0xf), the IPv4 header length
+BPF_JA = 0x05
+BPF_JEQ = 0x15
+BPF_JSET = 0x45
+BPF_RET = 0x06
+
+
+def build_prefilter(exclude_ports=()):
+    """
+    Classic BPF program for Ethernet frames that keeps, in the kernel, only
+    what parse_frame() could use: IPv4/IPv6 TCP, UDP and ICMP, minus TCP/UDP
+    traffic on `exclude_ports` (e.g. the sensor's own API and database
+    connections). VLAN-tagged frames and IPv6 extension headers pass through
+    for parse_frame() to handle.
+    Returns:
+        list[tuple]: (code, jt, jf, k) instructions
+    Raises:
+        ValueError: `exclude_ports` is too long for the program's 8-bit jump offsets
+    """
+    program = []  # (code, jt label, jf label, k); labels resolve to jump offsets below
+    labels = {}
+
+    def emit(code, k=0, jt=None, jf=None):
+        program.append((code, jt, jf, k))
+
+    def label(name):
+        labels[name] = len(program)
+
+    def drop_ports(offset, indexed):
+        emit(BPF_LDH_IND if indexed else BPF_LDH_ABS, offset)
+        for port in exclude_ports:
+            emit(BPF_JEQ, port, jt='drop')
+
+    emit(BPF_LDH_ABS, 12)
+    emit(BPF_JEQ, ETHERTYPE_IPV4, jt='ipv4')
+    emit(BPF_JEQ, ETHERTYPE_IPV6, jt='ipv6')
+    for ethertype in ETHERTYPE_VLAN:
+        emit(BPF_JEQ, ethertype, jt='accept')
+    emit(BPF_JA, jt='drop')
+
+    label('ipv4')
+    emit(BPF_LDB_ABS, 23)
+    emit(BPF_JEQ, PROTO_TCP, jt='ipv4_ports')
+    emit(BPF_JEQ, PROTO_UDP, jt='ipv4_ports')
+    emit(BPF_JEQ, PROTO_ICMP, jt='accept', jf='drop')
+    label('ipv4_ports')
+    emit(BPF_LDH_ABS, 20)
+    emit(BPF_JSET, 0x1FFF, jt='accept')  # non-first fragment: no ports to check
+    emit(BPF_LDX_MSH, 14)
+    drop_ports(14, True)
+    drop_ports(16, True)
+    emit(BPF_JA, jt='accept')
+
+    label('ipv6')
+    emit(BPF_LDB_ABS, 20)
+    emit(BPF_JEQ, PROTO_TCP, jt='ipv6_ports')
+    emit(BPF_JEQ, PROTO_UDP, jt='ipv6_ports')
+    emit(BPF_JEQ, PROTO_ICMPV6, jt='accept')
+    for header in IPV6_EXT_HEADERS:
+        emit(BPF_JEQ, header, jt='accept')
+    emit(BPF_JA, jt='drop')
+    label('ipv6_ports')
+    drop_ports(54, False)
+    drop_ports(56, False)
+    emit(BPF_JA, jt='accept')
+
+    label('accept')
+    emit(BPF_RET, SNAPLEN)
+    label('drop')
+    emit(BPF_RET, 0)
+
+    instructions = []
+    for pc, (code, jt, jf, k) in enumerate(program):
+        next_pc = pc + 1
+        if code == BPF_JA:
+            k = labels[jt] - next_pc if jt else 0
+            instructions.append((code, 0, 0, k))
+            continue
+        jt = labels[jt] - next_pc if jt else 0
+        jf = labels[jf] - next_pc if jf else 0
+        if jt > 255 or jf > 255:
+            raise ValueError(f"Prefilter can't exclude {len(exclude_ports)} ports: "
+                             f"conditional jumps reach at most 255 instructions")
+        instructions.append((code, jt, jf, k))
+    return instructions
+
+
+def attach_filter(sock, instructions):
+    """SO_ATTACH_FILTER: the kernel copies the program, so the buffer only lives for the call."""
+    insn = struct.Struct('HBBI')
+    buf = ctypes.create_string_buffer(b''.join(insn.pack(*i) for i in instructions))
+    fprog = struct.pack('HP', len(instructions), ctypes.addressof(buf))
+    sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
+
+
+# === Capture backends ===
+# Every backend iterates as (timestamp, packet_dict) pairs and has close().
+# Live backends may yield (timestamp, None) heartbeats while no packets arrive.
+
+class PysharkCapture:
+    """
+    tshark-backed capture; works everywhere pyshark does, but slowly. Yields no
+    heartbeats. Timestamps are tshark's capture times, so when parsing falls
+    behind the lag shows against the wall clock.
+    """
+
+    def __init__(self, interface):
+        import pyshark
+        self.capture = pyshark.LiveCapture(interface=interface)
+
+    def __iter__(self):
+        for pkt in self.capture.sniff_continuously():
+            pkt_dict = packet_to_dict(pkt)
+            if pkt_dict:
+                yield float(pkt.sniff_timestamp), pkt_dict
+
+    def close(self):
+        self.capture.close()
+
+
+class RawSocketCapture:
+    """
+    Linux AF_PACKET capture that parses headers straight from the socket buffer.
+    With `metrics` (a PipelineMetrics), a sample of header parses is timed.
+    """
+
+    def __init__(self, interface, metrics=None):
+        self.sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RCVBUF_BYTES)
+        self.sock.settimeout(HEARTBEAT_INTERVAL)
+        self.sock.bind((interface, 0))
+        self.buffer = bytearray(SNAPLEN)
+        self.metrics = metrics
+        self.prefiltered = False
+
+    def kernel_drops(self):
+        """Packets the kernel dropped for a full receive buffer since the last call."""
+        try:
+            stats = self.sock.getsockopt(SOL_PACKET, PACKET_STATISTICS, _tpacket_stats.size)
+        except OSError:
+            return 0
+        return _tpacket_stats.unpack(stats)[1]
+
+    def set_prefilter(self, enabled, exclude_ports=()):
+        """Attach or detach the build_prefilter() program; shedding starts in the kernel."""
+        if enabled:
+            attach_filter(self.sock, build_prefilter(exclude_ports))
+        elif self.prefiltered:
+            self.sock.setsockopt(socket.SOL_SOCKET, SO_DETACH_FILTER, 0)
+        self.prefiltered = enabled
+
+    def __iter__(self):
+        recvfrom_into = self.sock.recvfrom_into
+        buf = self.buffer
+        view = memoryview(buf)
+        clock = time.time
+        parse_seconds = self.metrics.parse_seconds if self.metrics is not None else None
+        perf_counter = time.perf_counter
+        until_sample = PARSE_SAMPLE_EVERY
+        while True:
+            try:
+                n, addr = recvfrom_into(view)
+            except socket.timeout:
+                # Keep the flow clock moving on a quiet link
+                yield clock(), None
+                continue
+            # The loopback device hands every frame over twice
+            if addr[2] == PACKET_OUTGOING and addr[0] == 'lo':
+                continue
+            if parse_seconds is not None:
+                until_sample -= 1
+            if until_sample:
+                pkt_dict = parse_frame(buf, n)
+            else:
+                until_sample = PARSE_SAMPLE_EVERY
+                start = perf_counter()
+                pkt_dict = parse_frame(buf, n)
+                parse_seconds.observe(perf_counter() - start)
+            if pkt_dict:
+                yield clock(), pkt_dict
+
+    def close(self):
+        self.sock.close()
+
+
+class PcapFileCapture:
+    """Reader for classic libpcap files, yielding packets with their recorded timestamps."""
+
+    MAGIC = {
+        b'\xd4\xc3\xb2\xa1': ('<', 1e-6),
+        b'\xa1\xb2\xc3\xd4': ('>', 1e-6),
+        b'\x4d\x3c\xb2\xa1': ('<', 1e-9),
+        b'\xa1\xb2\x3c\x4d': ('>', 1e-9),
+    }
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.map) < 24 or self.map[:4] not in self.MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a libpcap file (pcapng is not supported)")
+        endian, self.ts_scale = self.MAGIC[self.map[:4]]
+        self.linktype = struct.unpack_from(endian + 'I', self.map, 20)[0]
+        self.record = struct.Struct(endian + 'IIII')
+
+    def __iter__(self):
+        data = self.map
+        view = memoryview(data)
+        unpack_record = self.record.unpack_from
+        ts_scale = self.ts_scale
+        linktype = self.linktype
+        off = 24
+        end = len(data)
+        frame = None
+        try:
+            while off + 16 <= end:
+                ts_sec, ts_frac, incl_len, orig_len = unpack_record(data, off)
+                off += 16
+                frame = view[off:off + incl_len]
+                off += incl_len
+                pkt_dict = parse_frame(frame, len(frame), linktype, orig_len)
+                if pkt_dict:
+                    yield ts_sec + ts_frac * ts_scale, pkt_dict
+        finally:
+            # Drop buffer exports so the mmap can be closed
+            if frame is not None:
+                frame.release()
+            view.release()
+
+    def close(self):
+        if getattr(self, 'map', None) is not None and not self.map.closed:
+            self.map.close()
+        self.file.close()
+
+
+def open_capture(backend='auto', interface=None, path=None, metrics=None):
+    """
+    Open a capture backend.
+    Args:
+        backend (str): 'auto', 'raw', 'pyshark' or 'pcap'
+        interface (str): Interface name for live capture
+        path (str): pcap file for the 'pcap' backend
+        metrics (PipelineMetrics): Where the raw socket backend reports parse times
+    Returns:
+        A capture object iterating (timestamp, packet_dict) pairs
+    """
+    if backend == 'pcap':
+        return PcapFileCapture(path)
+    if backend == 'raw':
+        return RawSocketCapture(interface, metrics)
+    if backend == 'pyshark':
+        return PysharkCapture(interface)
+    if backend != 'auto':
+        raise ValueError(f"Unknown capture backend: {backend}")
+
+    if sys.platform.startswith('linux') and hasattr(socket, 'AF_PACKET'):
+        try:
+            return RawSocketCapture(interface, metrics)
+        except (PermissionError, OSError) as e:
+            logger.warning(f"Raw socket capture unavailable ({e}), falling back to pyshark")
+    return PysharkCapture(interface)
@@ -0,0 +1,164 @@
+# CICIDS2017 flow features the sniffer computes, named as in the MachineLearningCVE
+# CSVs (with the leading spaces stripped). Lengths are frame bytes; times are microseconds.
+
+# The original five features the classifier was first trained on
+BASIC_FEATURES = [
+    'Flow Duration',
+    'Total Fwd Packets',
+    'Total Backward Packets',
+    'Total Length of Fwd Packets',
+    'Total Length of Bwd Packets'
+]
+
+FLOW_FEATURES = BASIC_FEATURES + [
+    'Fwd Packet Length Max',
+    'Fwd Packet Length Min',
+    'Fwd Packet Length Mean',
+    'Fwd Packet Length Std',
+    'Bwd Packet Length Max',
+    'Bwd Packet Length Min',
+    'Bwd Packet Length Mean',
+    'Bwd Packet Length Std',
+    'Flow Bytes/s',
+    'Flow Packets/s',
+    'Flow IAT Mean',
+    'Flow IAT Std',
+    'Flow IAT Max',
+    'Flow IAT Min',
+    'Fwd IAT Total',
+    'Fwd IAT Mean',
+    'Fwd IAT Std',
+    'Fwd IAT Max',
+    'Fwd IAT Min',
+    'Bwd IAT Total',
+    'Bwd IAT Mean',
+    'Bwd IAT Std',
+    'Bwd IAT Max',
+    'Bwd IAT Min',
+    'Fwd PSH Flags',
+    'Bwd PSH Flags',
+    'Fwd URG Flags',
+    'Bwd URG Flags',
+    'Fwd Packets/s',
+    'Bwd Packets/s',
+    'Min Packet Length',
+    'Max Packet Length',
+    'Packet Length Mean',
+    'Packet Length Std',
+    'Packet Length Variance',
+    'FIN Flag Count',
+    'SYN Flag Count',
+    'RST Flag Count',
+    'PSH Flag Count',
+    'ACK Flag Count',
+    'URG Flag Count',
+    'CWE Flag Count',
+    'ECE Flag Count',
+    'Down/Up Ratio',
+    'Average Packet Size',
+    'Avg Fwd Segment Size',
+    'Avg Bwd Segment Size'
+]
+
+FEATURE_SETS = {
+    'basic': BASIC_FEATURES,
+    'full': FLOW_FEATURES,
+}
+
+
+def resolve_feature_set(features):
+    """
+    Turn a feature-set name ('basic', 'full') or a list of names into a column list,
+    checking that the sniffer actually produces every column.
+    """
+    if isinstance(features, str):
+        if features in FEATURE_SETS:
+            return list(FEATURE_SETS[features])
+        features = [name.strip() for name in features.split(',') if name.strip()]
+    unknown = [name for name in features if name not in FLOW_FEATURES]
+    if unknown:
+        raise ValueError(f"Features not produced by the sniffer: {unknown}")
+    return list(features)
+
+
+def compute_features(flow):
+    """Build the FLOW_FEATURES dict for a FlowRecord in O(1)."""
+    fwd = flow.fwd_len
+    bwd = flow.bwd_len
+    flow_iat = flow.flow_iat
+    fwd_iat = flow.fwd_iat
+    bwd_iat = flow.bwd_iat
+    flags = flow.flag_counts
+
+    duration = (flow.last_seen - flow.start_time) * 1e6 if flow.start_time is not None else 0.0
+    seconds = duration / 1e6
+
+    # Combine the two directions' accumulators (parallel Welford)
+    n = fwd.n + bwd.n
+    total = fwd.total + bwd.total
+    if fwd.n and bwd.n:
+        delta = bwd.mean - fwd.mean
+        m2 = fwd.m2 + bwd.m2 + delta * delta * fwd.n * bwd.n / n
+        pkt_min = min(fwd.min, bwd.min)
+        pkt_max = max(fwd.max, bwd.max)
+    else:
+        side = fwd if fwd.n else bwd
+        m2 = side.m2
+        pkt_min = side.min
+        pkt_max = side.max
+    pkt_var = m2 / (n - 1) if n > 1 else 0.0
+
+    return {
+        'Flow Duration': duration,
+        'Total Fwd Packets': fwd.n,
+        'Total Backward Packets': bwd.n,
+        'Total Length of Fwd Packets': int(fwd.total),
+        'Total Length of Bwd Packets': int(bwd.total),
+        'Fwd Packet Length Max': fwd.max,
+        'Fwd Packet Length Min': fwd.min,
+        'Fwd Packet Length Mean': fwd.mean,
+        'Fwd Packet Length Std': fwd.std(),
+        'Bwd Packet Length Max': bwd.max,
+        'Bwd Packet Length Min': bwd.min,
+        'Bwd Packet Length Mean': bwd.mean,
+        'Bwd Packet Length Std': bwd.std(),
+        'Flow Bytes/s': total / seconds if seconds else 0.0,
+        'Flow Packets/s': n / seconds if seconds else 0.0,
+        'Flow IAT Mean': flow_iat.mean,
+        'Flow IAT Std': flow_iat.std(),
+        'Flow IAT Max': flow_iat.max,
+        'Flow IAT Min': flow_iat.min,
+        'Fwd IAT Total': fwd_iat.total,
+        'Fwd IAT Mean': fwd_iat.mean,
+        'Fwd IAT Std': fwd_iat.std(),
+        'Fwd IAT Max': fwd_iat.max,
+        'Fwd IAT Min': fwd_iat.min,
+        'Bwd IAT Total': bwd_iat.total,
+        'Bwd IAT Mean': bwd_iat.mean,
+        'Bwd IAT Std': bwd_iat.std(),
+        'Bwd IAT Max': bwd_iat.max,
+        'Bwd IAT Min': bwd_iat.min,
+        'Fwd PSH Flags': flow.fwd_psh,
+        'Bwd PSH Flags': flow.bwd_psh,
+        'Fwd URG Flags': flow.fwd_urg,
+        'Bwd URG Flags': flow.bwd_urg,
+        'Fwd Packets/s': fwd.n / seconds if seconds else 0.0,
+        'Bwd Packets/s': bwd.n / seconds if seconds else 0.0,
+        'Min Packet Length': pkt_min,
+        'Max Packet Length': pkt_max,
+        'Packet Length Mean': total / n if n else 0.0,
+        'Packet Length Std': pkt_var ** 0.5,
+        'Packet Length Variance': pkt_var,
+        'FIN Flag Count': flags[0],
+        'SYN Flag Count': flags[1],
+        'RST Flag Count': flags[2],
+        'PSH Flag Count': flags[3],
+        'ACK Flag Count': flags[4],
+        'URG Flag Count': flags[5],
+        'CWE Flag Count': flags[7],
+        'ECE Flag Count': flags[6],
+        'Down/Up Ratio': bwd.n // fwd.n if fwd.n else 0,
+        'Average Packet Size': total / n if n else 0.0,
+        'Avg Fwd Segment Size': fwd.mean,
+        'Avg Bwd Segment Size': bwd.mean
+    }
@@ -0,0 +1,259 @@
+from collections import OrderedDict
+from math import ceil, sqrt
+from itertools import count
+
+# === Defaults ===
+MAX_FLOWS = 100000        # hard cap on tracked flows
+IDLE_TIMEOUT = 15.0       # seconds without packets before a flow ends
+ACTIVE_TIMEOUT = 120.0    # seconds after which a long-lived flow is reported and starts over
+FIN_LINGER = 1.0          # seconds a flow stays open after FIN/RST, for the closing handshake
+WHEEL_TICK = 0.5          # timer wheel resolution in seconds
+
+
+class RunningStats:
+    """Welford accumulator: count, sum, mean, variance, min and max in O(1) per value."""
+
+    __slots__ = ('n', 'total', 'mean', 'm2', 'min', 'max')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.n = 0
+        self.total = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = 0.0
+        self.max = 0.0
+
+    def add(self, x):
+        n = self.n + 1
+        self.n = n
+        self.total += x
+        delta = x - self.mean
+        self.mean += delta / n
+        self.m2 += delta * (x - self.mean)
+        if n == 1:
+            self.min = self.max = x
+        elif x < self.min:
+            self.min = x
+        elif x > self.max:
+            self.max = x
+
+    def add_weighted(self, x, weight):
+        """Add `x` as if it had been seen `weight` times; stands in for unsampled packets."""
+        n = self.n + weight
+        self.n = n
+        self.total += x * weight
+        delta = x - self.mean
+        self.mean += delta * weight / n
+        self.m2 += weight * delta * (x - self.mean)
+        if n == weight:
+            self.min = self.max = x
+        elif x < self.min:
+            self.min = x
+        elif x > self.max:
+            self.max = x
+
+    def variance(self):
+        # Sample variance, as CICFlowMeter reports it
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    def std(self):
+        return sqrt(self.variance())
+
+
+class FlowRecord:
+    """Running statistics for one flow. Slotted so a table of 100k flows stays small."""
+
+    __slots__ = (
+        'flow_id', 'key', 'src_ip', 'src_port', 'dst_ip',
+        'first_seen', 'last_seen', 'start_time',
+        'fwd_len', 'bwd_len', 'flow_iat', 'fwd_iat', 'bwd_iat',
+        'last_fwd_time', 'last_bwd_time', 'flag_counts',
+        'fwd_psh', 'bwd_psh', 'fwd_urg', 'bwd_urg',
+        'timer', 'closed_at', 'skip',
+    )
+
+    def __init__(self, flow_id, key, src_ip, src_port, dst_ip, timestamp):
+        self.flow_id = flow_id
+        self.key = key
+        # The first packet's sender is the initiator; its packets count as forward
+        self.src_ip = src_ip
+        self.src_port = src_port
+        self.dst_ip = dst_ip
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.start_time = timestamp
+        self.fwd_len = RunningStats()
+        self.bwd_len = RunningStats()
+        self.flow_iat = RunningStats()
+        self.fwd_iat = RunningStats()
+        self.bwd_iat = RunningStats()
+        self.last_fwd_time = None
+        self.last_bwd_time = None
+        self.flag_counts = [0] * 8  # FIN, SYN, RST, PSH, ACK, URG, ECE, CWR
+        self.fwd_psh = 0
+        self.bwd_psh = 0
+        self.fwd_urg = 0
+        self.bwd_urg = 0
+        self.timer = None      # wheel tick this flow's expiry check is due at
+        self.closed_at = None  # time of its first FIN or RST
+        self.skip = 0          # data packets left to skip while overload sampling is on
+
+    # Totals are the counts/sums of the length accumulators
+    @property
+    def fwd_packets(self):
+        return self.fwd_len.n
+
+    @property
+    def bwd_packets(self):
+        return self.bwd_len.n
+
+    @property
+    def fwd_bytes(self):
+        return int(self.fwd_len.total)
+
+    @property
+    def bwd_bytes(self):
+        return int(self.bwd_len.total)
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel: one bucket per `tick` seconds, enough buckets to
+    cover `span` seconds ahead. Scheduling and firing are O(1) per timer.
+    A timer is moved by scheduling it again; the entry left in its old bucket
+    no longer matches the record's `timer` tick and is skipped.
+    """
+
+    def __init__(self, span, tick=WHEEL_TICK):
+        self.tick = tick
+        self.size = int(ceil(span / tick)) + 2
+        self.buckets = [[] for _ in range(self.size)]
+        self.current = None  # last tick processed
+
+    def start(self, now):
+        """Set the wheel's clock on first use; later calls do nothing."""
+        if self.current is None:
+            self.current = int(now // self.tick)
+
+    def schedule(self, record, deadline):
+        tick = ceil(deadline / self.tick)
+        # Never into the past, and never a full turn ahead (it then fires early and is re-armed)
+        tick = min(max(tick, self.current + 1), self.current + self.size - 1)
+        record.timer = tick
+        self.buckets[tick % self.size].append((tick, record))
+
+    def advance(self, now):
+        """Records whose timers are due by `now`, visiting only the buckets passed since the last call."""
+        if self.current is None:
+            return []
+        target = int(now // self.tick)
+        due = []
+        # After a jump longer than the wheel, one turn has seen every bucket
+        for tick in range(self.current + 1, min(target, self.current + self.size) + 1):
+            index = tick % self.size
+            bucket = self.buckets[index]
+            if not bucket:
+                continue
+            self.buckets[index] = keep = []
+            for timer, record in bucket:
+                if record.timer != timer:
+                    continue
+                if timer <= target:
+                    record.timer = None
+                    due.append(record)
+                else:
+                    keep.append((timer, record))
+        self.current = max(self.current, target)
+        return due
+
+
+class FlowTable:
+    """
+    Bounded flow table keyed by canonical 5-tuple, kept in least-recently-seen order.
+
+    A flow ends when it has been idle for `idle_timeout`, has run for
+    `active_timeout`, `fin_linger` seconds after its first FIN or RST, or when
+    it is evicted to make room. Each flow has one timer on the wheel, set for
+    the earliest of those deadlines it could have; packets never touch the
+    wheel, and a timer that fires early is simply re-armed for the real deadline.
+    """
+
+    def __init__(self, max_flows=MAX_FLOWS, idle_timeout=IDLE_TIMEOUT, active_timeout=ACTIVE_TIMEOUT,
+                 fin_linger=FIN_LINGER, tick=WHEEL_TICK):
+        self.max_flows = max_flows
+        self.idle_timeout = idle_timeout
+        self.active_timeout = active_timeout
+        self.fin_linger = fin_linger
+        self.flows = OrderedDict()
+        self.wheel = TimerWheel(max(idle_timeout, active_timeout, fin_linger), tick)
+        self.ended = []  # flows that ended and are waiting to be reported
+        self.evicted = 0
+        self.expired = 0
+        self.closed = 0
+        self._ids = count()
+
+    def __len__(self):
+        return len(self.flows)
+
+    def touch(self, key, src_ip, src_port, dst_ip, timestamp):
+        """
+        Return the record for `key`, creating it (and evicting the LRU flow if full).
+        The caller updates `last_seen` once it has used the previous value.
+        """
+        flows = self.flows
+        record = flows.get(key)
+        if record is None:
+            if len(flows) >= self.max_flows:
+                _, oldest = flows.popitem(last=False)
+                oldest.timer = None
+                self.ended.append(oldest)
+                self.evicted += 1
+            record = FlowRecord(next(self._ids), key, src_ip, src_port, dst_ip, timestamp)
+            flows[key] = record
+            self.wheel.start(timestamp)
+            self.wheel.schedule(record, timestamp + min(self.idle_timeout, self.active_timeout))
+        else:
+            flows.move_to_end(key)
+        return record
+
+    def close(self, record, timestamp):
+        """FIN or RST seen: end the flow once the closing handshake has had `fin_linger` seconds."""
+        if record.closed_at is None:
+            record.closed_at = timestamp
+            self.wheel.schedule(record, timestamp + self.fin_linger)
+
+    def deadline(self, record):
+        deadline = min(record.last_seen + self.idle_timeout, record.first_seen + self.active_timeout)
+        if record.closed_at is not None:
+            deadline = min(deadline, record.closed_at + self.fin_linger)
+        return deadline
+
+    def expire(self, now):
+        """Remove and return every flow that has ended by `now`."""
+        ended, self.ended = self.ended, []
+        flows = self.flows
+        for record in self.wheel.advance(now):
+            deadline = self.deadline(record)
+            if deadline > now:
+                self.wheel.schedule(record, deadline)
+                continue
+            if flows.get(record.key) is record:
+                del flows[record.key]
+            if record.closed_at is not None:
+                self.closed += 1
+            else:
+                self.expired += 1
+            ended.append(record)
+        return ended
+
+    def expire_all(self):
+        """Remove and return every flow, ended or not (capture is stopping)."""
+        ended, self.ended = self.ended, []
+        for record in self.flows.values():
+            record.timer = None
+            ended.append(record)
+        self.flows.clear()
+        return ended
@@ -0,0 +1,328 @@
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from config import MODEL_DIR, MODEL_POLL_INTERVAL
+from services.prediction_cache import PredictionCache, quantize
+from services.Train_ML_Model.flat_forest import FlatForest
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# === Model layout ===
+# MODEL_DIR/versions/<version>/flat/            FlatForest arrays (memory-mapped at load)
+# MODEL_DIR/versions/<version>/classifier.pkl   the sklearn forest, for training and big batches
+# MODEL_DIR/versions/<version>/model.json       version, feature order, labels
+# MODEL_DIR/CURRENT                             name of the active version
+VERSIONS_DIR = os.path.join(MODEL_DIR, 'versions')
+CURRENT_FILE = os.path.join(MODEL_DIR, 'CURRENT')
+LEGACY_MODEL_PATH = os.path.join(MODEL_DIR, 'classifier.pkl')
+# Version names are plain directory names under VERSIONS_DIR, never paths
+VERSION_NAME = re.compile(r'^\w[\w.-]*$')
+
+# Past this many rows sklearn's compiled traversal is faster than the vectorized one
+FLAT_MAX_BATCH = 256
+
+
+class ModelNotReady(RuntimeError):
+    pass
+
+
+class MissingFeatures(ValueError):
+    """Feature rows lack columns the served model was trained on."""
+
+    def __init__(self, version, missing):
+        self.missing = missing
+        super().__init__(f"Model {version} needs features missing from the request: {', '.join(missing)}")
+
+
+# === Versions on disk ===
+
+def version_dir(version):
+    return os.path.join(VERSIONS_DIR, version)
+
+
+def current_version():
+    try:
+        with open(CURRENT_FILE) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def current_model_path():
+    """The active version's sklearn pickle."""
+    version = current_version()
+    if version is None:
+        raise FileNotFoundError("No model version is active; train one with train_model.py")
+    return os.path.join(version_dir(version), 'classifier.pkl')
+
+
+def list_versions():
+    if not os.path.isdir(VERSIONS_DIR):
+        return []
+    return sorted(name for name in os.listdir(VERSIONS_DIR) if not name.startswith('.'))
+
+
+def check_version(version):
+    """Raise ValueError unless `version` names a published version."""
+    if not VERSION_NAME.match(version) or version not in list_versions():
+        raise ValueError(f"Unknown model version: {version}")
+
+
+def set_current(version):
+    """Point CURRENT at `version`; the rename is atomic, so readers see the old or new name."""
+    check_version(version)
+    with open(CURRENT_FILE + '.tmp', 'w') as f:
+        f.write(version)
+    os.replace(CURRENT_FILE + '.tmp', CURRENT_FILE)
+
+
+def publish_model(model, label_encoder, feature_order, version=None, activate=True):
+    """
+    Save a trained forest as a new model version and, by default, make it active.
+    Args:
+        model (RandomForestClassifier): Fitted forest
+        label_encoder (LabelEncoder): Encoder the forest's classes index into
+        feature_order (list[str]): Columns the forest was trained on
+        version (str): Version name; defaults to a timestamp
+        activate (bool): Point CURRENT at the new version
+    Returns:
+        str: The version name
+    """
+    import pickle
+
+    version = version or datetime.now().strftime('%Y%m%d-%H%M%S')
+    if not VERSION_NAME.match(version):
+        raise ValueError(f"Invalid model version name: {version}")
+    final_dir = version_dir(version)
+    if os.path.exists(final_dir):
+        raise ValueError(f"Model version {version} already exists")
+    build_dir = os.path.join(VERSIONS_DIR, f".{version}.tmp")
+    os.makedirs(build_dir, exist_ok=True)
+
+    # Serving predicts small batches, where thread fan-out costs more than it saves
+    model.n_jobs = 1
+    with open(os.path.join(build_dir, 'classifier.pkl'), 'wb') as f:
+        pickle.dump({'model': model, 'label_encoder': label_encoder, 'features': list(feature_order)}, f)
+    FlatForest.from_sklearn(model, labels=label_encoder.classes_, features=feature_order).save(
+        os.path.join(build_dir, 'flat'))
+    with open(os.path.join(build_dir, 'model.json'), 'w') as f:
+        json.dump({
+            'version': version,
+            'created': time.time(),
+            'features': list(feature_order),
+            'labels': label_encoder.classes_.tolist(),
+            'n_estimators': len(model.estimators_),
+        }, f, indent=2)
+
+    # Readers never see a half-written version directory
+    os.replace(build_dir, final_dir)
+    if activate:
+        set_current(version)
+    logger.info(f"Published model version {version}")
+    return version
+
+
+def load_saved(path=None):
+    """The pickled {'model', 'label_encoder', 'features'} at `path` (default: the active version's)."""
+    import pickle
+
+    with open(path or current_model_path(), 'rb') as f:
+        return pickle.load(f)
+
+
+def migrate_legacy_model():
+    """Publish a pre-versioning ml_models/classifier.pkl as the first version."""
+    saved = load_saved(LEGACY_MODEL_PATH)
+    return publish_model(saved['model'], saved['label_encoder'],
+                         saved.get('features') or list(saved['model'].feature_names_in_), version='legacy')
+
+
+# === Serving ===
+
+class LoadedModel:
+    """One model version ready to serve: the flat engine, plus the sklearn forest once loaded."""
+
+    def __init__(self, version, flat, meta):
+        self.version = version
+        self.flat = flat
+        self.features = meta['features']
+        self.labels = np.asarray(meta['labels'])
+        self.loaded_at = time.time()
+        self.forest = None
+
+    def predict(self, X):
+        forest = self.forest
+        if forest is not None and len(X) > FLAT_MAX_BATCH:
+            # Same outputs as the flat engine; the forest was fitted on a DataFrame,
+            # so sklearn's "no feature names" warning is expected here
+            return self.labels[forest.predict(X)]
+        return self.flat.predict_labels(X)
+
+    def classify_batch(self, feature_rows, cache=None):
+        # One float matrix for the whole batch, columns in training order
+        try:
+            X = np.array([[row[col] for col in self.features] for row in feature_rows], dtype=np.float64)
+        except KeyError:
+            raise MissingFeatures(self.version, [col for col in self.features
+                                                 if any(col not in row for row in feature_rows)]) from None
+        if cache is None or not cache.enabled:
+            return self.predict(X).tolist()
+
+        X = quantize(X)
+        keys = [row.tobytes() for row in X]
+        # Each distinct row is looked up, and if need be predicted, once per batch
+        first_row = {}
+        for i, key in enumerate(keys):
+            first_row.setdefault(key, i)
+        labels = dict(zip(first_row, cache.get_many(self.version, first_row)))
+        missing = [key for key, label in labels.items() if label is None]
+        if missing:
+            predicted = self.predict(X[[first_row[key] for key in missing]]).tolist()
+            cache.put_many(self.version, missing, predicted)
+            labels.update(zip(missing, predicted))
+        cache.record(len(keys), len(missing))
+        return [labels[key] for key in keys]
+
+
+class ModelRegistry:
+    """
+    Holds the served model and swaps it when CURRENT changes.
+
+    Loading happens off the request path (a startup task in the API, or an
+    explicit load() elsewhere). The active model is a single reference, so a
+    swap is atomic: requests already running finish on the model they started with.
+    """
+
+    def __init__(self, poll_interval=MODEL_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self.current = None
+        self.error = None
+        self.loading = False
+        self.task = None
+        self.cache = PredictionCache()
+        self.classify_seconds = metrics.histogram(
+            'neura_classify_batch_seconds', 'Time to classify one batch, cache lookups included')
+        self.classified = metrics.counter('neura_classified_flows_total', 'Flows classified')
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self.current is not None
+
+    async def wait_ready(self, poll_interval=0.5):
+        """Return once a model is being served."""
+        while self.current is None:
+            await asyncio.sleep(poll_interval)
+
+    def load(self, version=None):
+        """
+        Load `version` (default: the active one) and make it the served model.
+        The flat engine is memory-mapped and the sklearn forest (for big batches)
+        unpickled; the version is only served once both have loaded.
+        """
+        with self._lock:
+            self.loading = True
+            try:
+                version = version or current_version()
+                if version is None and os.path.exists(LEGACY_MODEL_PATH):
+                    version = migrate_legacy_model()
+                if version is None:
+                    raise ModelNotReady("No trained model found; run train_model.py")
+                check_version(version)
+
+                start = time.perf_counter()
+                with open(os.path.join(version_dir(version), 'model.json')) as f:
+                    meta = json.load(f)
+                model = LoadedModel(version, FlatForest.load(os.path.join(version_dir(version), 'flat')), meta)
+                model.forest = load_saved(os.path.join(version_dir(version), 'classifier.pkl'))['model']
+                self.current = model
+                # Entries are keyed by version too; this just frees the old model's
+                self.cache.invalidate()
+                self.error = None
+                logger.info(f"Model {version} ready in {(time.perf_counter() - start) * 1000:.0f} ms")
+                return model
+            except Exception as e:
+                self.error = str(e)
+                logger.error(f"Failed to load model: {e}")
+                raise
+            finally:
+                self.loading = False
+
+    def refresh(self):
+        """Load the active version if it differs from the one being served."""
+        version = current_version()
+        if version is not None and (self.current is None or self.current.version != version):
+            self.load(version)
+            return True
+        return False
+
+    def classify_batch(self, feature_rows):
+        """
+        Classify many feature dicts with the served model.
+        Returns:
+            list[str]: Predicted labels, in input order
+        """
+        model = self.current
+        if model is None:
+            raise ModelNotReady(self.error or "Model is still loading")
+        if not feature_rows:
+            return []
+        with self.classify_seconds.time():
+            labels = model.classify_batch(feature_rows, self.cache)
+        self.classified.inc(len(labels))
+        return labels
+
+    def classify(self, features):
+        return self.classify_batch([features])[0]
+
+    def status(self):
+        model = self.current
+        return {
+            "ready": model is not None,
+            "loading": self.loading,
+            "version": model.version if model else None,
+            "active_version": current_version(),
+            "loaded_at": model.loaded_at if model else None,
+            "sklearn_loaded": bool(model and model.forest is not None),
+            "error": self.error,
+            "cache": self.cache.stats(),
+        }
+
+    # === API process ===
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def _run(self):
+        try:
+            await asyncio.to_thread(self.load)
+        except Exception:
+            pass  # logged and reported by status(); a newly published version is picked up below
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception:
+                pass
+
+
+registry = ModelRegistry()
+metrics.gauge('neura_model_ready', 'Whether a model is loaded and serving', lambda: registry.ready)
+metrics.counter_from('neura_prediction_cache_hits_total', 'Prediction cache hits', lambda: registry.cache.hits)
+metrics.counter_from('neura_prediction_cache_misses_total', 'Prediction cache misses', lambda: registry.cache.misses)
+metrics.gauge('neura_prediction_cache_entries', 'Labels held in the prediction cache', lambda: len(registry.cache.entries))
@@ -0,0 +1,176 @@
+import time
+import logging
+from collections import OrderedDict
+
+from config import (
+    OVERLOAD_MAX_LAG, OVERLOAD_MAX_BUSY, OVERLOAD_QUEUE_HIGH, OVERLOAD_CALM_SECONDS,
+    OVERLOAD_SAMPLE_EVERY, OVERLOAD_SAMPLE_AFTER, OVERLOAD_MAX_FLOWS, SNIFFER_PREFILTER_PORTS,
+)
+from services.capture import build_prefilter
+
+logger = logging.getLogger(__name__)
+
+# === Shedding stages, in the order they are applied ===
+NORMAL, PREFILTER, SAMPLING, PRIORITIZE = range(4)
+LEVELS = ('normal', 'prefilter', 'sampling', 'prioritize')
+
+# Overload signals, as bits so a process can report them as one number
+SIGNAL_LAG = 1           # packets lag the wall clock
+SIGNAL_BUSY = 2          # hand-offs take too much of the flush interval
+SIGNAL_KERNEL_DROPS = 4  # the capture socket buffer overflowed
+SIGNAL_QUEUE = 8         # shard queues filling up or dropping
+SIGNALS = {SIGNAL_LAG: 'lag', SIGNAL_BUSY: 'busy', SIGNAL_KERNEL_DROPS: 'kernel_drops', SIGNAL_QUEUE: 'queue'}
+
+ESCALATE_HOLD = 5.0      # seconds a stage gets to take effect before the next one
+KNOWN_PAIRS = 50000      # host pairs remembered for telling new flows from familiar ones
+
+
+def signal_names(signals):
+    return [name for bit, name in SIGNALS.items() if int(signals) & bit]
+
+
+def is_suspicious(features):
+    """Unanswered connection attempts and probes: what scans and floods are made of."""
+    return not features['Total Backward Packets'] and bool(
+        features['SYN Flag Count'] or features['Total Fwd Packets'] <= 2)
+
+
+class FlowPrioritizer:
+    """
+    Sink wrapper for the last shedding stage. While active, a hand-off of more
+    than `max_flows` flows is cut to `max_flows`: suspicious flows first, then
+    flows between hosts not seen recently, then the rest. Cut flows are counted
+    in `shed` and never classified.
+    """
+
+    def __init__(self, sink, max_flows=OVERLOAD_MAX_FLOWS, memory=KNOWN_PAIRS):
+        self.sink = sink
+        self.max_flows = max_flows
+        self.memory = memory
+        self.known = OrderedDict()  # (src_ip, dst_ip) -> None, most recent last
+        self.active = False
+        self.shed = 0
+
+    def priority(self, features):
+        if is_suspicious(features):
+            return 0
+        return 2 if (features['src_ip'], features['dst_ip']) in self.known else 1
+
+    def __call__(self, features_list):
+        if self.active and len(features_list) > self.max_flows:
+            ranked = sorted(features_list, key=self.priority)
+            self.shed += len(ranked) - self.max_flows
+            features_list = ranked[:self.max_flows]
+
+        known = self.known
+        for features in features_list:
+            pair = (features['src_ip'], features['dst_ip'])
+            known[pair] = None
+            known.move_to_end(pair)
+        while len(known) > self.memory:
+            known.popitem(last=False)
+
+        self.sink(features_list)
+
+
+class OverloadController:
+    """
+    Watches one sniffer process's pressure at every hand-off and moves through
+    the shedding stages: one stage up when overloaded (at most once per
+    ESCALATE_HOLD seconds), one stage down after `calm_seconds` without
+    pressure. Stages this process can't apply are skipped: the prefilter
+    needs a raw socket capture, and sampling and prioritization need the flow
+    table, which the capture process of a sharded sniffer doesn't have.
+    """
+
+    def __init__(self, name, capture=None, extractor=None, prioritizer=None, metrics=None,
+                 max_lag=OVERLOAD_MAX_LAG, max_busy=OVERLOAD_MAX_BUSY, queue_high=OVERLOAD_QUEUE_HIGH,
+                 calm_seconds=OVERLOAD_CALM_SECONDS, sample_every=OVERLOAD_SAMPLE_EVERY,
+                 sample_after=OVERLOAD_SAMPLE_AFTER, exclude_ports=SNIFFER_PREFILTER_PORTS):
+        self.name = name
+        self.capture = capture if hasattr(capture, 'set_prefilter') else None
+        self.extractor = extractor
+        self.prioritizer = prioritizer
+        self.metrics = metrics
+        self.max_lag = max_lag
+        self.max_busy = max_busy
+        self.queue_high = queue_high
+        self.calm_seconds = calm_seconds
+        self.sample_every = sample_every
+        self.sample_after = sample_after
+        self.exclude_ports = exclude_ports
+        if self.capture is not None:
+            # A port list the kernel filter can't hold fails here, at startup, not under load
+            build_prefilter(exclude_ports)
+        self.stages = [NORMAL] + [stage for stage, available in (
+            (PREFILTER, self.capture is not None),
+            (SAMPLING, extractor is not None),
+            (PRIORITIZE, prioritizer is not None),
+        ) if available]
+        self.level = NORMAL
+        self.signals = 0
+        self.since = time.time()
+        self.calm_since = None
+
+    def observe(self, lag=0.0, busy=0.0, kernel_drops=0, queue_fill=0.0, now=None):
+        """
+        Take one hand-off's measurements and change stage if needed.
+        Args:
+            lag (float): Seconds between the newest packet's capture time and now
+            busy (float): Hand-off duration as a fraction of the flush interval
+            kernel_drops (int): Packets the kernel dropped since the last call
+            queue_fill (float): Fullest shard queue, 0 to 1 (1 also when any dropped)
+        """
+        now = time.time() if now is None else now
+        signals = 0
+        if lag >= self.max_lag:
+            signals |= SIGNAL_LAG
+        if busy >= self.max_busy:
+            signals |= SIGNAL_BUSY
+        if kernel_drops:
+            signals |= SIGNAL_KERNEL_DROPS
+        if queue_fill >= self.queue_high:
+            signals |= SIGNAL_QUEUE
+        self.signals = signals
+
+        position = self.stages.index(self.level)
+        if signals:
+            self.calm_since = None
+            if position + 1 < len(self.stages) and (self.level == NORMAL or now - self.since >= ESCALATE_HOLD):
+                self.set_level(self.stages[position + 1], now)
+        elif self.level != NORMAL:
+            if self.calm_since is None:
+                self.calm_since = now
+            elif now - self.calm_since >= self.calm_seconds:
+                self.set_level(self.stages[position - 1], now)
+                self.calm_since = now
+        self.report()
+
+    def set_level(self, level, now):
+        reason = ', '.join(signal_names(self.signals)) or 'calm'
+        log = logger.warning if level > self.level else logger.info
+        log(f"{self.name} overload: {LEVELS[self.level]} -> {LEVELS[level]} ({reason})")
+        if self.capture is not None and (level >= PREFILTER) != self.capture.prefiltered:
+            try:
+                self.capture.set_prefilter(level >= PREFILTER, self.exclude_ports)
+            except OSError as e:
+                logger.warning(f"{self.name} overload: prefilter unavailable: {e}")
+        if self.extractor is not None:
+            self.extractor.sample_every = self.sample_every if level >= SAMPLING else 1
+            self.extractor.sample_after = self.sample_after
+        if self.prioritizer is not None:
+            self.prioritizer.active = level >= PRIORITIZE
+        self.level = level
+        self.since = now
+
+    def report(self):
+        metrics = self.metrics
+        if metrics is None:
+            return
+        metrics.overload_level = self.level
+        metrics.overload_signals = self.signals
+        metrics.overload_since = self.since
+        if self.extractor is not None:
+            metrics.packets_sampled_out = self.extractor.sampled_out
+        if self.prioritizer is not None:
+            metrics.flows_shed = self.prioritizer.shed
@@ -0,0 +1,100 @@
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from config import PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL, PREDICTION_CACHE_MANTISSA_BITS
+
+
+def quantize(X, mantissa_bits=PREDICTION_CACHE_MANTISSA_BITS):
+    """
+    Rows as the float32 values the forest compares, with the low mantissa bits
+    cleared. At 23 bits this is exact; fewer bits merge near-identical vectors,
+    relative to each value's magnitude.
+    """
+    X32 = np.ascontiguousarray(X, dtype=np.float32)
+    if mantissa_bits < 23:
+        mask = np.uint32(0xFFFFFFFF << (23 - mantissa_bits) & 0xFFFFFFFF)
+        X32 = (X32.view(np.uint32) & mask).view(np.float32)
+    return X32
+
+
+class PredictionCache:
+    """
+    Bounded LRU of labels keyed on (model version, quantized feature row).
+    Entries older than `ttl` seconds are treated as misses. Shared by the
+    executor threads classifying requests, so every access takes the lock.
+    """
+
+    def __init__(self, max_size=PREDICTION_CACHE_SIZE, ttl=PREDICTION_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()  # (version, row bytes) -> (label, stored at)
+        self.hits = 0
+        self.misses = 0
+        self.rows = 0       # rows classified through the cache
+        self.predicted = 0  # rows that actually reached the model
+        self.evictions = 0
+        self.expirations = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def get_many(self, version, keys):
+        """Cached label per key, None for misses."""
+        now = time.monotonic()
+        found = []
+        with self._lock:
+            for key in keys:
+                entry = self.entries.get((version, key))
+                if entry is not None and now - entry[1] > self.ttl:
+                    del self.entries[(version, key)]
+                    self.expirations += 1
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                    found.append(None)
+                else:
+                    self.entries.move_to_end((version, key))
+                    self.hits += 1
+                    found.append(entry[0])
+        return found
+
+    def put_many(self, version, keys, labels):
+        now = time.monotonic()
+        with self._lock:
+            for key, label in zip(keys, labels):
+                self.entries[(version, key)] = (label, now)
+                self.entries.move_to_end((version, key))
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def record(self, rows, predicted):
+        with self._lock:
+            self.rows += rows
+            self.predicted += predicted
+
+    def invalidate(self):
+        """Drop every entry; called when the served model changes."""
+        with self._lock:
+            self.entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "rows": self.rows,
+            "predicted": self.predicted,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
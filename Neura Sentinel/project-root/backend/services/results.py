@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import time
+
+from database.rollups import rollup_writer
+from database.storage import traffic_writer
+from services.alerts import alert_engine
+from services.model_registry import registry
+from utils.logger import LogSampler
+from utils.websocket_manager import broadcaster
+
+logger = logging.getLogger(__name__)
+batch_log = LogSampler(logger)
+
+# Flow metadata carried next to the features; not model inputs
+METADATA_FIELDS = ('src_ip', 'dst_ip', 'timestamp', 'last_seen')
+
+
+def build_record(feature_dict, label, src_ip=None, dst_ip=None, timestamp=None):
+    return {
+        **feature_dict,
+        "src_ip": src_ip,
+        "dst_ip": dst_ip,
+        "label": label,
+        "timestamp": timestamp or time.time()
+    }
+
+
+def to_payload(record):
+    """The compact message dashboards receive for one classified flow."""
+    return {
+        "fwd": record['Total Fwd Packets'],
+        "bwd": record['Total Backward Packets'],
+        "label": record['label'],
+        "src_ip": record.get('src_ip'),
+        "dst_ip": record.get('dst_ip'),
+        "timestamp": record['timestamp']
+    }
+
+
+async def publish_results(records):
+    """Queue classified flow records for storage, rollups and alerting, and broadcast them to dashboards."""
+    broadcaster.publish_many([to_payload(record) for record in records])
+    rollup_writer.add_many(records)
+    alert_engine.observe(records)
+    await traffic_writer.put_many(records)
+
+
+async def classify_and_publish(rows):
+    """
+    Classify sniffer flow rows (features plus src_ip/dst_ip and a millisecond
+    timestamp), then store and broadcast the results.
+    """
+    loop = asyncio.get_running_loop()
+    labels = await loop.run_in_executor(None, registry.classify_batch, rows)
+    await publish_results(rows_to_records(rows, labels))
+    return labels
+
+
+def rows_to_records(rows, labels):
+    """Pair sniffer flow rows with their labels as storable records."""
+    records = []
+    for row, label in zip(rows, labels):
+        features = {k: v for k, v in row.items() if k not in METADATA_FIELDS}
+        records.append(build_record(features, label, row.get('src_ip'), row.get('dst_ip'),
+                                    row['timestamp'] / 1000 if row.get('timestamp') else None))
+    return records
+
+
+async def handle_sniffer_event(kind, payload):
+    if kind == 'features':
+        if not registry.ready:
+            # The model loads in the background after startup. Hold the batch instead of
+            # dropping it; the bus backs up meanwhile and the sniffer spools to disk
+            logger.info("Holding sniffer batches until the model is loaded")
+            await registry.wait_ready()
+        labels = await classify_and_publish(payload)
+        if batch_log.due():
+            logger.debug(f"Classified batch of {len(labels)} flows from the sniffer")
+    elif kind == 'results':
+        # Already classified by a sniffer running embedded inference
+        await publish_results(rows_to_records(payload['rows'], payload['labels']))
+        if batch_log.due():
+            logger.debug(f"Stored batch of {len(payload['labels'])} flows classified in the sniffer")
+    else:
+        logger.warning(f"Unknown sniffer event: {kind}")
@@ -0,0 +1,202 @@
+import os
+import time
+import queue
+import logging
+import multiprocessing
+
+from services.flow_table import MAX_FLOWS
+from services.overload import FlowPrioritizer, OverloadController
+from services.sniffer import (
+    FLUSH_INTERVAL, FeatureExtractor, close_sender, flow_key, make_capture_sink, run_pipeline,
+    read_kernel_drops, set_event_bus, set_metrics, set_running_flag,
+)
+from services import sniffer
+
+logger = logging.getLogger(__name__)
+
+# === Defaults ===
+CHUNK_SIZE = 256          # packets per message to a shard
+CHUNK_MAX_DELAY = 0.05    # capture-time seconds a partial chunk may wait
+SHARD_QUEUE_SIZE = 1024   # chunks buffered per shard before capture drops
+POLL_INTERVAL = 0.5       # seconds a shard waits before re-checking the run flag
+SHARD_JOIN_TIMEOUT = 25.0 # seconds a shard gets to flush, finish a delivery and exit
+
+
+class ShardRouter:
+    """
+    Capture-side half of the sharded pipeline: hash-partitions packets by
+    canonical flow key, so both directions of a connection land in the same
+    shard, and ships them to the shard processes in chunks.
+    """
+
+    def __init__(self, inboxes, chunk_size=CHUNK_SIZE, max_delay=CHUNK_MAX_DELAY):
+        self.inboxes = inboxes
+        self.chunk_size = chunk_size
+        self.max_delay = max_delay
+        self.chunks = [[] for _ in inboxes]
+        self.last_send = None
+        self.dropped = 0
+
+    def route(self, timestamp, packet):
+        # Heartbeats stay here; shards make their own while their inbox is empty
+        if packet is not None:
+            shard = hash(flow_key(packet)) % len(self.chunks)
+            chunk = self.chunks[shard]
+            chunk.append((timestamp, packet))
+            if len(chunk) >= self.chunk_size:
+                self._send(shard)
+
+        # Keep quiet shards moving instead of waiting for a full chunk
+        if self.last_send is None:
+            self.last_send = timestamp
+        elif timestamp - self.last_send >= self.max_delay:
+            self.send_all()
+            self.last_send = timestamp
+
+    def send_all(self):
+        for shard, chunk in enumerate(self.chunks):
+            if chunk:
+                self._send(shard)
+
+    def _send(self, shard):
+        chunk = self.chunks[shard]
+        self.chunks[shard] = []
+        try:
+            # Never block capture on a slow shard; the kernel would drop instead
+            self.inboxes[shard].put_nowait(chunk)
+        except queue.Full:
+            self.dropped += len(chunk)
+
+    def close(self):
+        self.send_all()
+        for inbox in self.inboxes:
+            try:
+                # A shard that already left on the run flag won't drain a full inbox
+                inbox.put(None, timeout=POLL_INTERVAL)
+            except queue.Full:
+                pass
+
+
+def inbox_packets(inbox, flag, parent_pid):
+    """
+    Yield a shard's packets until the capture side closes it or the sniffer
+    stops, with a (now, None) heartbeat whenever the inbox stays empty.
+    """
+    while True:
+        try:
+            chunk = inbox.get(timeout=POLL_INTERVAL)
+        except queue.Empty:
+            # The capture process may have been terminated without closing us
+            if (flag is not None and not flag.value) or os.getppid() != parent_pid:
+                return
+            yield time.time(), None
+            continue
+        if chunk is None:
+            return
+        yield from chunk
+
+
+def shard_worker(shard, inbox, flag, bus, workers, batch_interval, use_batch, inference, parent_pid, shared_metrics=None):
+    """Entry point of one shard process: owns a FeatureExtractor for its slice of flows."""
+    set_running_flag(flag)
+    set_event_bus(bus)
+    # Row 0 belongs to the capture process
+    set_metrics(shared_metrics, shard + 1)
+    extractor = FeatureExtractor(max_flows=max(1, MAX_FLOWS // workers))
+    prioritizer = FlowPrioritizer(make_capture_sink(extractor, use_batch, inference, f"Shard {shard}"))
+    # Packets carry their capture time, so queueing behind the capture shows up as lag here
+    overload = OverloadController(f"Shard {shard}", None, extractor, prioritizer, sniffer.METRICS)
+    logger.info(f"Shard {shard} started (pid {os.getpid()})")
+    try:
+        run_pipeline(inbox_packets(inbox, flag, parent_pid), extractor, prioritizer, batch_interval,
+                     flush_on_exit=True, overload=overload)
+    finally:
+        close_sender()
+    logger.info(f"Shard {shard} stopped")
+
+
+def queue_fill(inboxes):
+    """Fill of the fullest shard inbox, 0 to 1; 0 where the platform can't tell (macOS)."""
+    try:
+        return max(inbox.qsize() for inbox in inboxes) / SHARD_QUEUE_SIZE
+    except NotImplementedError:
+        return 0.0
+
+
+def check_capture(packets, router, overload, metrics, captured, dropped_before):
+    """One interval's overload check and metrics publish for the capture process."""
+    kernel_drops = read_kernel_drops(packets)
+    # Any drop at a shard queue counts as a full queue
+    fill = 1.0 if router.dropped > dropped_before else queue_fill(router.inboxes)
+    overload.observe(kernel_drops=kernel_drops, queue_fill=fill)
+    if metrics is not None:
+        metrics.packets_captured += captured
+        metrics.packets_dropped = router.dropped
+        metrics.kernel_drops += kernel_drops
+        metrics.publish()
+
+
+def run_sharded(packets, workers, flag=None, bus=None, batch_interval=FLUSH_INTERVAL, use_batch=True, inference='api',
+                metrics=None):
+    """
+    Capture in this process and do flow accounting, flushing and classification
+    in `workers` shard processes, so a flush never stalls packet reads.
+    Args:
+        packets (iterable): (timestamp, packet_dict) pairs, e.g. a capture backend
+        workers (int): Number of shard processes
+        flag: Shared run flag; capture and shards stop when it goes false
+        bus (EventBus): Event bus to the API process, if any
+        metrics (PipelineMetrics): This process's metrics row; shards report in the rows after it
+    """
+    inboxes = [multiprocessing.Queue(SHARD_QUEUE_SIZE) for _ in range(workers)]
+    processes = [
+        multiprocessing.Process(
+            target=shard_worker,
+            args=(shard, inboxes[shard], flag, bus, workers, batch_interval, use_batch, inference, os.getpid(),
+                  metrics.shared if metrics is not None else None),
+            daemon=True,
+        )
+        for shard in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    router = ShardRouter(inboxes)
+    # Flow-level shedding happens in the shards; this process can only prefilter
+    overload = OverloadController("Capture", packets, metrics=metrics)
+    captured = 0
+    dropped = 0
+    last_check = None
+    try:
+        for now, pkt_dict in packets:
+            if flag is not None and not flag.value:
+                logger.info("Sniffer stop requested, closing shard inboxes")
+                break
+            router.route(now, pkt_dict)
+            if pkt_dict is not None:
+                captured += 1
+            if last_check is None:
+                last_check = now
+            elif now - last_check >= batch_interval:
+                check_capture(packets, router, overload, metrics, captured, dropped)
+                captured = 0
+                dropped = router.dropped
+                last_check = now
+    finally:
+        router.close()
+        if metrics is not None:
+            metrics.packets_captured += captured
+            metrics.packets_dropped = router.dropped
+            metrics.publish()
+        for process in processes:
+            process.join(SHARD_JOIN_TIMEOUT)
+            if process.is_alive():
+                logger.warning(f"Shard process {process.pid} did not exit in {SHARD_JOIN_TIMEOUT}s, terminating it")
+                process.terminate()
+                process.join()
+        # Chunks queued for shards that are gone would keep this process from exiting
+        for inbox in inboxes:
+            inbox.cancel_join_thread()
+        if router.dropped:
+            logger.warning(f"{router.dropped} packets dropped by full shard queues")
+    return router
@@ -1,19 +1,48 @@
 import os
 import sys
 import time
-import pyshark
-import asyncio
+import logging
 import requests
-from collections import defaultdict
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if PROJECT_ROOT not in sys.path:
     sys.path.append(PROJECT_ROOT)
 
-from utils.websocket_manager import connected_clients
+from services.capture import open_capture
+from services.flow_table import FlowTable, MAX_FLOWS, IDLE_TIMEOUT, ACTIVE_TIMEOUT, FIN_LINGER
+from services.flow_features import FLOW_FEATURES, BASIC_FEATURES, compute_features
+from services.overload import FlowPrioritizer, OverloadController
+from utils.logger import LogSampler
+from utils.spool import SpoolingSender, open_spool
+from config import SPOOL_DIR, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP_RETRIES
+
+logger = logging.getLogger(__name__)
+flow_log = LogSampler(logger)
+batch_log = LogSampler(logger)
 
 BACKEND_URL = "http://127.0.0.1:8000/traffic/classify"
+BACKEND_BATCH_URL = "http://127.0.0.1:8000/traffic/classify/batch"
 RUNNING_FLAG = None
+EVENT_BUS = None
+# This process's pooled HTTP session and SpoolingSender, once created
+HTTP = None
+SENDER = None
+HTTP_TIMEOUT = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+# Longest one POST can take: every attempt timing out, plus urllib3's backoff between them
+HTTP_DELIVER_TIMEOUT = (HTTP_CONNECT_TIMEOUT + HTTP_READ_TIMEOUT) * (HTTP_RETRIES + 1) + 0.2 * 2 ** HTTP_RETRIES
+# This process's PipelineMetrics, when the API collects sniffer metrics
+METRICS = None
+# Seconds of capture time between hand-offs of the flows that ended
+FLUSH_INTERVAL = 1.0
+
+EXTENDED_FEATURES = [name for name in FLOW_FEATURES if name not in BASIC_FEATURES]
+# Set bit positions for every TCP flags byte, so counting flags is one lookup
+FLAG_BITS = [tuple(bit for bit in range(8) if flags & (1 << bit)) for flags in range(256)]
+FIN_OR_RST = 0x01 | 0x04
+# Flags of plain data packets, the only ones overload sampling may skip
+DATA_FLAGS = 0x08 | 0x10  # PSH, ACK
 
 
 def set_running_flag(flag):
@@ -21,162 +50,458 @@ def set_running_flag(flag):
     RUNNING_FLAG = flag
 
 
+def set_event_bus(bus):
+    global EVENT_BUS
+    EVENT_BUS = bus
+
+
+def set_metrics(shared, row=0):
+    """Report this process's pipeline metrics in `row` of the API's SharedMetrics."""
+    global METRICS
+    if shared is not None and row >= shared.rows:
+        logger.warning(f"No metrics row {row} (table has {shared.rows}); not reporting metrics")
+        shared = None
+    METRICS = shared.row(row) if shared is not None else None
+
+
+def flow_key(packet):
+    """Direction-independent 5-tuple: both sides of a connection map to one flow."""
+    src_ip = packet['src_ip']
+    dst_ip = packet['dst_ip']
+    src_port = packet['src_port']
+    dst_port = packet['dst_port']
+    if src_ip < dst_ip or (src_ip == dst_ip and src_port <= dst_port):
+        return (src_ip, src_port, dst_ip, dst_port, packet['protocol'])
+    return (dst_ip, dst_port, src_ip, src_port, packet['protocol'])
+
+
 class FeatureExtractor:
-    def __init__(self):
-        self.flows = defaultdict(lambda: {
-            'start_time': None,
-            'fwd_packets': 0,
-            'bwd_packets': 0,
-            'fwd_bytes': 0,
-            'bwd_bytes': 0
-        })
-        self.last_processed = defaultdict(lambda: 0.0)
-        self.flow_metadata = {}
-
-    def get_flow_key(self, packet):
-        return (packet['src_ip'], packet['dst_ip'], packet['src_port'], packet['dst_port'], packet['protocol'])
+    def __init__(self, max_flows=MAX_FLOWS, idle_timeout=IDLE_TIMEOUT, active_timeout=ACTIVE_TIMEOUT,
+                 fin_linger=FIN_LINGER):
+        self.table = FlowTable(max_flows, idle_timeout, active_timeout, fin_linger)
+        # Set by the overload controller: account 1 in `sample_every` data packets of a
+        # flow once it has `sample_after` packets, weighting each to stand in for the rest
+        self.sample_every = 1
+        self.sample_after = 0
+        self.sampled_out = 0
+
+    get_flow_key = staticmethod(flow_key)
 
     def update_flow(self, packet, timestamp):
-        flow_key = self.get_flow_key(packet)
-        flow = self.flows[flow_key]
+        src_ip = packet['src_ip']
+        src_port = packet['src_port']
+        flow = self.table.touch(self.get_flow_key(packet), src_ip, src_port, packet['dst_ip'], timestamp)
 
-        if flow['start_time'] is None:
-            flow['start_time'] = timestamp
+        if (self.sample_every > 1 and not packet['tcp_flags'] & ~DATA_FLAGS
+                and flow.fwd_len.n + flow.bwd_len.n >= self.sample_after):
+            return self.sample_flow(flow, packet, timestamp)
 
-        self.flow_metadata[flow_key] = {
-            'src_ip': packet['src_ip'],
-            'dst_ip': packet['dst_ip']
-        }
+        if flow.fwd_len.n or flow.bwd_len.n:
+            flow.flow_iat.add((timestamp - flow.last_seen) * 1e6)
+        flow.last_seen = timestamp
 
         size = packet['packet_size']
-        if packet['src_ip'] < packet['dst_ip']:
-            flow['fwd_packets'] += 1
-            flow['fwd_bytes'] += size
+        flags = packet['tcp_flags']
+        if src_ip == flow.src_ip and src_port == flow.src_port:
+            flow.fwd_len.add(size)
+            if flow.last_fwd_time is not None:
+                flow.fwd_iat.add((timestamp - flow.last_fwd_time) * 1e6)
+            flow.last_fwd_time = timestamp
+            if flags & 0x08:
+                flow.fwd_psh += 1
+            if flags & 0x20:
+                flow.fwd_urg += 1
         else:
-            flow['bwd_packets'] += 1
-            flow['bwd_bytes'] += size
-
-        return flow_key
-
-    def extract_features(self, flow_key, timestamp):
-        flow = self.flows[flow_key]
-        duration = timestamp - flow['start_time'] if flow['start_time'] else 0
-
-        features = {
-            'Flow Duration': duration,
-            'Total Fwd Packets': flow['fwd_packets'],
-            'Total Backward Packets': flow['bwd_packets'],
-            'Total Length of Fwd Packets': flow['fwd_bytes'],
-            'Total Length of Bwd Packets': flow['bwd_bytes'],
-            'src_ip': self.flow_metadata[flow_key]['src_ip'],
-            'dst_ip': self.flow_metadata[flow_key]['dst_ip'],
-            'timestamp': int(timestamp * 1000)
-        }
-
-        self.flows[flow_key] = {
-            'start_time': None,
-            'fwd_packets': 0,
-            'bwd_packets': 0,
-            'fwd_bytes': 0,
-            'bwd_bytes': 0
-        }
-
-        self.last_processed[flow_key] = timestamp
-        return features
-
-    def send_to_backend_and_ws(self, features):
-        try:
-            response = requests.post(BACKEND_URL, json={
-                "Flow_Duration": features['Flow Duration'],
-                "Total_Fwd_Packets": features['Total Fwd Packets'],
-                "Total_Backward_Packets": features['Total Backward Packets'],
-                "Total_Length_of_Fwd_Packets": features['Total Length of Fwd Packets'],
-                "Total_Length_of_Bwd_Packets": features['Total Length of Bwd Packets'],
-            })
-
-            if response.status_code == 200:
-                label = response.json().get("label")
-                payload = {
-                    "fwd": features['Total Fwd Packets'],
-                    "bwd": features['Total Backward Packets'],
-                    "label": label,
-                    "src_ip": features['src_ip'],
-                    "dst_ip": features['dst_ip'],
-                    "timestamp": features['timestamp']
-                }
-                asyncio.run(self.broadcast_ws(payload))
+            flow.bwd_len.add(size)
+            if flow.last_bwd_time is not None:
+                flow.bwd_iat.add((timestamp - flow.last_bwd_time) * 1e6)
+            flow.last_bwd_time = timestamp
+            if flags & 0x08:
+                flow.bwd_psh += 1
+            if flags & 0x20:
+                flow.bwd_urg += 1
+
+        if flags:
+            counts = flow.flag_counts
+            for bit in FLAG_BITS[flags]:
+                counts[bit] += 1
+            if flags & FIN_OR_RST:
+                self.table.close(flow, timestamp)
+
+        return flow
+
+    def sample_flow(self, flow, packet, timestamp):
+        """
+        update_flow() while sampling. Skipped packets only move the flow's clocks,
+        so the gap before a sampled packet is one real inter-arrival time.
+        """
+        forward = packet['src_ip'] == flow.src_ip and packet['src_port'] == flow.src_port
+        if flow.skip:
+            flow.skip -= 1
+            self.sampled_out += 1
+            flow.last_seen = timestamp
+            if forward:
+                flow.last_fwd_time = timestamp
             else:
-                print(f"[HTTP ERROR] {response.status_code}: {response.text}")
-        except Exception as e:
-            print("[SEND ERROR]", str(e))
+                flow.last_bwd_time = timestamp
+            return flow
 
-    async def broadcast_ws(self, data):
-        for ws in connected_clients.copy():
-            try:
-                await ws.send_json(data)
-            except Exception:
-                connected_clients.remove(ws)
+        weight = flow.skip = self.sample_every
+        flow.skip -= 1
+        flow.flow_iat.add_weighted((timestamp - flow.last_seen) * 1e6, weight)
+        flow.last_seen = timestamp
 
+        size = packet['packet_size']
+        flags = packet['tcp_flags']
+        if forward:
+            flow.fwd_len.add_weighted(size, weight)
+            if flow.last_fwd_time is not None:
+                flow.fwd_iat.add_weighted((timestamp - flow.last_fwd_time) * 1e6, weight)
+            flow.last_fwd_time = timestamp
+            if flags & 0x08:
+                flow.fwd_psh += weight
+        else:
+            flow.bwd_len.add_weighted(size, weight)
+            if flow.last_bwd_time is not None:
+                flow.bwd_iat.add_weighted((timestamp - flow.last_bwd_time) * 1e6, weight)
+            flow.last_bwd_time = timestamp
+            if flags & 0x08:
+                flow.bwd_psh += weight
+
+        counts = flow.flag_counts
+        for bit in FLAG_BITS[flags]:
+            counts[bit] += weight
+        return flow
+
+    def extract_features(self, flow, timestamp):
+        features = compute_features(flow)
+        features['src_ip'] = flow.src_ip
+        features['dst_ip'] = flow.dst_ip
+        features['timestamp'] = int(timestamp * 1000)
+        features['last_seen'] = flow.last_seen
+        return features
 
-def packet_to_dict(packet):
+    def flush(self, timestamp):
+        """Features for every flow that ended (idle, active timeout, FIN/RST or evicted) by `timestamp`."""
+        return [self.extract_features(flow, timestamp) for flow in self.table.expire(timestamp)]
+
+    def flush_all(self, timestamp):
+        """Features for every tracked flow, ended or not."""
+        return [self.extract_features(flow, timestamp) for flow in self.table.expire_all()]
+
+    def send_to_backend(self, features):
+        """Legacy per-flow request; the API stores and broadcasts the result. Returns True once handled."""
+        return post_flows(BACKEND_URL, to_request(features), 1)
+
+    def send_batch_to_backend(self, features_list):
+        """Classify every flushed flow with one request; the API stores and broadcasts them. Returns True once handled."""
+        if not features_list:
+            return True
+        logger.debug(f"Sending batch of {len(features_list)} flows")
+        return post_flows(BACKEND_BATCH_URL, [to_request(features) for features in features_list], len(features_list))
+
+
+def to_request(features):
+    """A flow as the /traffic/classify endpoints take it."""
+    return {
+        "Flow_Duration": features['Flow Duration'],
+        "Total_Fwd_Packets": features['Total Fwd Packets'],
+        "Total_Backward_Packets": features['Total Backward Packets'],
+        "Total_Length_of_Fwd_Packets": features['Total Length of Fwd Packets'],
+        "Total_Length_of_Bwd_Packets": features['Total Length of Bwd Packets'],
+        "src_ip": features['src_ip'],
+        "dst_ip": features['dst_ip'],
+        "timestamp": features['timestamp'] / 1000,
+        # Remaining CICIDS features travel under their dataset names
+        **{name: features[name] for name in EXTENDED_FEATURES},
+    }
+
+
+def http_session():
+    """This process's pooled keep-alive session to the API, created on first use (after any fork)."""
+    global HTTP
+    if HTTP is None:
+        # Retry what can't have reached the API, never a request that timed out reading
+        # the response: the API may have stored those flows already
+        retry = Retry(total=HTTP_RETRIES, connect=HTTP_RETRIES, read=0, other=0, status=HTTP_RETRIES,
+                      status_forcelist=(502, 503, 504), allowed_methods=frozenset({'POST'}),
+                      backoff_factor=0.2, raise_on_status=False)
+        HTTP = requests.Session()
+        HTTP.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=retry))
+        HTTP.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=retry))
+    return HTTP
+
+
+def post_flows(url, body, count):
+    """
+    POST flows to the API. Returns False if they should be retried (the API is
+    unreachable, slow or unavailable); flows it refused as invalid are dropped.
+    """
     try:
-        if hasattr(packet, 'ip'):
-            src_ip = packet.ip.src
-            dst_ip = packet.ip.dst
-        elif hasattr(packet, 'ipv6'):
-            src_ip = packet.ipv6.src
-            dst_ip = packet.ipv6.dst
+        response = http_session().post(url, json=body, timeout=HTTP_TIMEOUT)
+    except requests.RequestException as e:
+        if batch_log.due():
+            logger.debug(f"Sending {count} flows to {url} failed: {e}")
+        return False
+    if response.status_code == 200:
+        return True
+    if 400 <= response.status_code < 500 and response.status_code != 429:
+        # Sending the same flows again would be refused again
+        logger.warning(f"API refused {count} flows ({response.status_code}): {response.text}")
+        if METRICS is not None:
+            METRICS.flows_dropped += count
+        return True
+    if batch_log.due():
+        logger.debug(f"API answered {response.status_code} for {count} flows: {response.text}")
+    return False
+
+
+# === Delivery ===
+# Sinks hand ('features', features_list) or ('results', {'rows', 'labels'}) batches
+# to this process's SpoolingSender, which delivers them off the capture thread and
+# spools them while the API (over HTTP or the event bus) can't take them.
+
+def deliver_to_bus(batch):
+    kind, payload = batch
+    return EVENT_BUS.publish(kind, payload)
+
+
+def deliver_over_http(send):
+    """Sender delivery through `send(features_list)`, e.g. FeatureExtractor.send_batch_to_backend."""
+    def deliver(batch):
+        kind, payload = batch
+        return send(payload)
+    return deliver
+
+
+def merge_batches(batches):
+    """Combine runs of spooled batches of one kind into one delivery each: (batch, count) pairs."""
+    merged = []
+    for kind, payload in batches:
+        if not merged or merged[-1][0][0] != kind:
+            merged.append(((kind, payload), 1))
+            continue
+        (_, combined), count = merged[-1]
+        if kind == 'results':
+            combined['rows'].extend(payload['rows'])
+            combined['labels'].extend(payload['labels'])
         else:
-            return None
-
-        if packet.transport_layer:
-            proto = packet.transport_layer
-            src_port = packet[proto.lower()].srcport
-            dst_port = packet[proto.lower()].dstport
-        elif hasattr(packet, 'icmp'):
-            proto = 'ICMP'
-            src_port = dst_port = 0
-        else:
-            return None
-
-        return {
-            'src_ip': src_ip,
-            'dst_ip': dst_ip,
-            'src_port': int(src_port),
-            'dst_port': int(dst_port),
-            'protocol': proto,
-            'packet_size': int(packet.length)
-        }
-    except Exception:
-        return None
-
-
-def capture_packets(interface='\\Device\\NPF_{FCF2AC5C-4FCF-4F0F-8B35-DDEAAAF4F4CE}', batch_interval=10):
-    print(f"[Sniffer] Capturing on interface: {interface}")
-    extractor = FeatureExtractor()
-    capture = pyshark.LiveCapture(interface=interface)
-    last_batch = time.time()
-    flows = set()
-
-    for pkt in capture.sniff_continuously():
+            combined.extend(payload)
+        merged[-1] = ((kind, combined), count + 1)
+    return merged
+
+
+def send_features(features_list):
+    """Sink for 'api' inference: the API classifies the flows."""
+    if features_list:
+        SENDER(('features', features_list))
+
+
+def close_sender():
+    """Stop this process's sender; batches it had not delivered stay spooled for the next run."""
+    global SENDER
+    if SENDER is not None:
+        SENDER.close()
+        SENDER = None
+
+
+class EmbeddedClassifier:
+    """
+    Sink that classifies each flush inside the sniffer process and hands the
+    labelled rows to `send`; the API only stores and broadcasts them.
+    """
+
+    def __init__(self, send):
+        # Loads the active model version into this process
+        from services.model_registry import registry
+        registry.load()
+        self.registry = registry
+        self.send = send
+
+    def __call__(self, features_list):
+        if not features_list:
+            return
+        # Pick up a newly published version between flushes
+        try:
+            if self.registry.refresh():
+                logger.info(f"Embedded inference switched to model {self.registry.current.version}")
+        except Exception as e:
+            logger.warning(f"Embedded inference keeping model {self.registry.current.version}: {e}")
+        start = time.perf_counter()
+        labels = self.registry.classify_batch(features_list)
+        now = time.time()
+        classify_seconds = time.perf_counter() - start
+        classify_ms = classify_seconds * 1000
+        if METRICS is not None:
+            METRICS.classify_seconds.observe(classify_seconds)
+
+        if batch_log.due():
+            # Packet-to-label latency: from each flow's last packet to its label
+            latencies = sorted((now - features['last_seen']) * 1000 for features in features_list)
+            p50 = latencies[len(latencies) // 2]
+            logger.debug(f"Classified {len(labels)} flows in {classify_ms:.1f} ms, "
+                         f"packet-to-label p50 {p50:.0f} ms, max {latencies[-1]:.0f} ms, "
+                         f"cache hit rate {self.registry.cache.stats()['hit_rate']:.0%}")
+
+        self.send(('results', {'rows': features_list, 'labels': labels}))
+
+
+def send_each_to_backend(extractor):
+    """
+    Legacy per-flow sink: one /traffic/classify request per flow. Returns False
+    at the first flow the API didn't take, leaving only that flow and the ones
+    after it in the list, so a retry doesn't send the others twice.
+    """
+    def sink(features_list):
+        for i, features in enumerate(features_list):
+            if flow_log.due():
+                logger.debug(f"Sending flow features: {features}")
+            if not extractor.send_to_backend(features):
+                del features_list[:i]
+                return False
+        return True
+    return sink
+
+
+def run_pipeline(packets, extractor, sink, batch_interval=FLUSH_INTERVAL, flush_on_exit=False, overload=None):
+    """
+    Feed (timestamp, packet_dict) pairs through flow accounting and hand the
+    flows that ended to `sink` every `batch_interval` seconds. A None packet
+    is a heartbeat from an idle capture: it only moves the clock, so flows on
+    a quiet link still expire on time. Shared by live capture and pcap replay.
+    With METRICS set, counts and flush timings are published once per hand-off;
+    a live capture's OverloadController sees the same measurements.
+    """
+    last_batch = None
+    now = None
+    table = extractor.table
+    max_pending = table.max_flows
+    metrics = METRICS
+    processed = 0
+
+    for now, pkt_dict in packets:
         if RUNNING_FLAG and not RUNNING_FLAG.value:
-            print("[Sniffer] Graceful stop triggered.")
+            logger.info("Sniffer stop requested, finishing up")
             break
 
-        now = time.time()
-        pkt_dict = packet_to_dict(pkt)
-        if pkt_dict:
-            flow_key = extractor.update_flow(pkt_dict, now)
-            flows.add(flow_key)
-
-        if now - last_batch >= batch_interval:
-            for flow in flows:
-                features = extractor.extract_features(flow, now)
-                print("[FEATURES]", features)
-                extractor.send_to_backend_and_ws(features)
-            flows.clear()
+        if pkt_dict is not None:
+            extractor.update_flow(pkt_dict, now)
+            processed += 1
+
+        # Expire on capture time so pcap replays behave like live traffic;
+        # evicted flows queue in table.ended, so hand off early rather than let it grow
+        if last_batch is None:
+            last_batch = now
+        if now - last_batch >= batch_interval or len(table.ended) >= max_pending:
+            start = time.perf_counter()
+            features_list = extractor.flush(now)
+            if features_list:
+                sink(features_list)
             last_batch = now
+            if metrics is None and overload is None:
+                continue
+            handoff_seconds = time.perf_counter() - start
+            kernel_drops = read_kernel_drops(packets)
+            if overload is not None:
+                # Capture timestamps are wall-clock time for live captures
+                overload.observe(lag=time.time() - now, busy=handoff_seconds / batch_interval,
+                                 kernel_drops=kernel_drops)
+            if metrics is not None:
+                metrics.flush_seconds.observe(handoff_seconds)
+                publish_pipeline_metrics(metrics, table, processed, len(features_list), kernel_drops)
+                processed = 0
+
+    if flush_on_exit and now is not None:
+        features_list = extractor.flush_all(now)
+        if features_list:
+            sink(features_list)
+        if metrics is not None:
+            publish_pipeline_metrics(metrics, table, processed, len(features_list), read_kernel_drops(packets))
+
+
+def read_kernel_drops(capture):
+    """Kernel drops since the last call, for captures that can tell (the raw socket backend)."""
+    return capture.kernel_drops() if hasattr(capture, 'kernel_drops') else 0
+
+
+def publish_pipeline_metrics(metrics, table, processed, emitted, kernel_drops=0):
+    """Add one hand-off's counts to this process's metrics and publish them."""
+    metrics.packets_processed += processed
+    if metrics.is_capture:
+        metrics.packets_captured += processed
+    metrics.kernel_drops += kernel_drops
+    metrics.flows_emitted += emitted
+    metrics.flow_table_flows = len(table.flows)
+    if SENDER is not None:
+        spool = SENDER.spool
+        metrics.batches_spooled = spool.appended
+        metrics.batches_replayed = spool.replayed
+        metrics.batches_lost = spool.dropped
+        metrics.spool_pending = spool.pending
+    metrics.publish()
+
+
+def make_capture_sink(extractor, use_batch=True, inference='api', name='Sniffer'):
+    """
+    Pick where flushed flows go: 'embedded' inference classifies them in this
+    process; 'api' inference leaves that to the API. Either way batches reach
+    the API over the event bus when one is set, else over HTTP (batched, or one
+    request per flow), through a SpoolingSender spooling to SPOOL_DIR/<name>.
+    Call close_sender() when capture ends.
+    """
+    global SENDER
+    if inference not in ('api', 'embedded'):
+        raise ValueError(f"Unknown inference mode: {inference}")
+    deliver_timeout = HTTP_DELIVER_TIMEOUT
+    if EVENT_BUS is not None:
+        deliver = deliver_to_bus
+        deliver_timeout = 0.0
+    elif inference == 'embedded':
+        raise ValueError("Embedded inference needs the event bus to reach the API process")
+    elif use_batch:
+        deliver = deliver_over_http(extractor.send_batch_to_backend)
+    else:
+        deliver = deliver_over_http(send_each_to_backend(extractor))
+
+    spool = open_spool(os.path.join(SPOOL_DIR, name.lower().replace(' ', '')))
+    SENDER = SpoolingSender(name, deliver, spool, merge=merge_batches, deliver_timeout=deliver_timeout)
+    if inference == 'embedded':
+        return EmbeddedClassifier(SENDER)
+    return send_features
+
+
+def capture_packets(interface='\\Device\\NPF_{FCF2AC5C-4FCF-4F0F-8B35-DDEAAAF4F4CE}', batch_interval=FLUSH_INTERVAL, use_batch=True, backend='auto', inference='api', workers=1):
+    """
+    Capture live traffic and ship the flows that ended every `batch_interval` seconds.
+    `inference` is 'api' (the API process classifies) or 'embedded' (this process
+    classifies and publishes results over the event bus). With `workers` > 1 this
+    process only captures and flow accounting runs in that many shard processes.
+    Under overload each process sheds load in stages (see services.overload).
+    """
+    logger.info(f"Capturing on interface {interface} ({backend} backend, {inference} inference, {workers} workers)")
+    if workers > 1:
+        from services.sharding import run_sharded
+        capture = open_capture(backend, interface=interface, metrics=METRICS)
+        try:
+            run_sharded(capture, workers, RUNNING_FLAG, EVENT_BUS, batch_interval, use_batch, inference, METRICS)
+        finally:
+            capture.close()
+        return
+
+    extractor = FeatureExtractor()
+    prioritizer = FlowPrioritizer(make_capture_sink(extractor, use_batch, inference))
+    try:
+        capture = open_capture(backend, interface=interface, metrics=METRICS)
+    except Exception:
+        close_sender()
+        raise
+    overload = OverloadController('Sniffer', capture, extractor, prioritizer, METRICS)
 
+    try:
+        run_pipeline(capture, extractor, prioritizer, batch_interval, flush_on_exit=True, overload=overload)
+    finally:
+        capture.close()
+        close_sender()
 
 if __name__ == "__main__":
     try:
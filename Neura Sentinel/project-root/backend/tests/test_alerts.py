@@ -0,0 +1,87 @@
+# backend/tests/test_alerts.py
+from services.alerts import AlertEngine, incident_key
+
+NOW = 1_700_000_000.0
+
+
+def detections(timestamps, label='DDoS', src_ip='10.0.0.1', dst_ip='10.0.0.2'):
+    return [{'label': label, 'src_ip': src_ip, 'dst_ip': dst_ip, 'timestamp': t} for t in timestamps]
+
+
+def make_engine():
+    return AlertEngine(window=10, threshold=5, quiet_period=30)
+
+
+def test_opens_one_incident_at_the_threshold():
+    engine = make_engine()
+    engine.observe(detections([NOW + i for i in range(4)]))
+    assert not engine.open
+
+    engine.observe(detections([NOW + 4]))
+    assert engine.raised == 1
+    alert = engine.open[incident_key('DDoS', '10.0.0.1', '10.0.0.2')]
+    assert alert['count'] == 5
+    assert alert['status'] == 'detected'
+
+    # Later detections only update the open incident
+    engine.observe(detections([NOW + 5, NOW + 6]))
+    assert engine.raised == 1
+    assert alert['count'] == 7
+    assert alert['timestamp'] == NOW + 6
+
+
+def test_detections_outside_the_window_do_not_add_up():
+    engine = make_engine()
+    engine.observe(detections([NOW + 15 * i for i in range(10)]))
+    assert not engine.open
+
+
+def test_benign_flows_are_ignored():
+    engine = make_engine()
+    engine.observe(detections([NOW + i for i in range(10)], label='BENIGN'))
+    assert not engine.open and not engine.windows
+
+
+def test_quiet_incident_resolves_and_rearms():
+    engine = make_engine()
+    engine.observe(detections([NOW + i for i in range(5)]))
+    (alert,) = engine.open.values()
+
+    engine.expire(NOW + 4 + 29)
+    assert engine.open
+    engine.expire(NOW + 4 + 30)
+    assert not engine.open
+    assert alert['status'] == 'resolved'
+
+    # A new incident needs the threshold again
+    later = NOW + 100
+    engine.observe(detections([later + i for i in range(4)]))
+    assert not engine.open
+    engine.observe(detections([later + 4]))
+    assert engine.raised == 2
+    (new_alert,) = engine.open.values()
+    assert new_alert['_id'] != alert['_id']
+
+
+def test_out_of_order_timestamps_keep_first_seen_before_timestamp():
+    engine = make_engine()
+    # Newest first, as a batch caller may send them
+    engine.observe(detections([NOW + 5 - 0.4 * i for i in range(5)]))
+    (alert,) = engine.open.values()
+    assert alert['first_seen'] == NOW + 5 - 0.4 * 4
+    assert alert['timestamp'] == NOW + 5
+    assert alert['first_seen'] <= alert['timestamp']
+
+    # An older detection joining the open incident widens it
+    engine.observe(detections([NOW - 3]))
+    assert alert['first_seen'] == NOW - 3
+    assert alert['timestamp'] == NOW + 5
+
+
+def test_out_of_order_detections_stay_within_the_window():
+    engine = make_engine()
+    # Four recent detections and one far older arriving last: never five within 10s
+    engine.observe(detections([NOW + 20, NOW + 21, NOW + 22, NOW + 23, NOW]))
+    assert not engine.open
+    engine.observe(detections([NOW + 19.5]))
+    assert engine.raised == 1
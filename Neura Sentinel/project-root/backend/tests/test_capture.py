@@ -0,0 +1,161 @@
+# backend/tests/test_capture.py
+import socket
+import struct
+
+import pytest
+
+from services.capture import (
+    BPF_JA, BPF_JEQ, BPF_JSET, BPF_LDB_ABS, BPF_LDH_ABS, BPF_LDH_IND, BPF_LDX_MSH, BPF_RET,
+    LINKTYPE_ETHERNET, LINKTYPE_LINUX_SLL, LINKTYPE_RAW, build_prefilter, parse_frame,
+)
+
+MAC = b'\x00\x11\x22\x33\x44\x55'
+
+
+def ipv4(proto, payload, src='10.0.0.1', dst='10.0.0.2', fragment=0):
+    header = struct.pack('!BBHHHBBH4s4s', 0x45, 0, 20 + len(payload), 1, fragment, 64, proto, 0,
+                         socket.inet_aton(src), socket.inet_aton(dst))
+    return header + payload
+
+
+def ipv6(next_header, payload, src='2001:db8::1', dst='2001:db8::2'):
+    header = struct.pack('!IHBB16s16s', 6 << 28, len(payload), next_header, 64,
+                         socket.inet_pton(socket.AF_INET6, src), socket.inet_pton(socket.AF_INET6, dst))
+    return header + payload
+
+
+def tcp(src_port=40000, dst_port=443, flags=0x02):
+    return struct.pack('!HHIIBBHHH', src_port, dst_port, 0, 0, 5 << 4, flags, 65535, 0, 0)
+
+
+def udp(src_port=5353, dst_port=53):
+    return struct.pack('!HHHH', src_port, dst_port, 8, 0)
+
+
+def ethernet(ethertype, payload, vlans=()):
+    header = MAC + MAC
+    for tpid in vlans:
+        header += struct.pack('!HH', tpid, 100)
+    return header + struct.pack('!H', ethertype) + payload
+
+
+def parse(frame, linktype=LINKTYPE_ETHERNET, **kwargs):
+    return parse_frame(frame, len(frame), linktype, **kwargs)
+
+
+def test_ethernet_ipv4_tcp():
+    packet = parse(ethernet(0x0800, ipv4(6, tcp(flags=0x12))))
+    assert packet == {'src_ip': '10.0.0.1', 'dst_ip': '10.0.0.2', 'src_port': 40000, 'dst_port': 443,
+                      'protocol': 'TCP', 'packet_size': 14 + 20 + 20, 'tcp_flags': 0x12}
+
+
+def test_vlan_and_qinq_tags_are_skipped():
+    for vlans in [(0x8100,), (0x88A8, 0x8100)]:
+        packet = parse(ethernet(0x0800, ipv4(17, udp()), vlans=vlans))
+        assert (packet['protocol'], packet['src_port'], packet['dst_port']) == ('UDP', 5353, 53)
+
+
+def test_linux_sll():
+    sll = struct.pack('!HHH8sH', 0, 1, 6, MAC + b'\x00\x00', 0x86DD)
+    packet = parse(sll + ipv6(17, udp()), LINKTYPE_LINUX_SLL)
+    assert (packet['src_ip'], packet['dst_ip']) == ('2001:db8::1', '2001:db8::2')
+    assert packet['dst_port'] == 53
+
+
+def test_raw_ip():
+    packet = parse(ipv4(1, b'\x08\x00' + bytes(6)), LINKTYPE_RAW)
+    assert packet['protocol'] == 'ICMP'
+
+
+def test_ipv6_extension_headers_are_walked():
+    # Hop-by-hop options, then a routing header, then TCP
+    routing = struct.pack('!BB6s', 6, 0, bytes(6))
+    hop_by_hop = struct.pack('!BB6s', 43, 0, bytes(6))
+    packet = parse(ethernet(0x86DD, ipv6(0, hop_by_hop + routing + tcp(dst_port=22))))
+    assert (packet['protocol'], packet['dst_port']) == ('TCP', 22)
+
+
+def test_ipv6_non_first_fragment_has_no_ports():
+    fragment = struct.pack('!BBHI', 17, 0, 185 << 3, 1)
+    packet = parse(ethernet(0x86DD, ipv6(44, fragment + udp())))
+    assert (packet['protocol'], packet['src_port'], packet['dst_port']) == ('UDP', 0, 0)
+
+
+def test_ipv4_non_first_fragment_has_no_ports():
+    packet = parse(ethernet(0x0800, ipv4(6, tcp(), fragment=185)))
+    assert (packet['src_port'], packet['dst_port'], packet['tcp_flags']) == (0, 0, 0)
+
+
+def test_truncated_frames():
+    frame = ethernet(0x0800, ipv4(6, tcp(flags=0x18)))
+    # Shorter than the Ethernet or IP header: nothing to parse
+    assert parse_frame(frame, 10) is None
+    assert parse_frame(frame, 14 + 19) is None
+    # Ports captured but not the flags
+    packet = parse_frame(frame, 14 + 20 + 4, wire_len=1514)
+    assert (packet['dst_port'], packet['tcp_flags'], packet['packet_size']) == (443, 0, 1514)
+    # IP header only
+    packet = parse_frame(frame, 14 + 20)
+    assert (packet['src_port'], packet['dst_port']) == (0, 0)
+    # Truncated IPv6 header
+    frame = ethernet(0x86DD, ipv6(6, tcp()))
+    assert parse_frame(frame, 14 + 39) is None
+
+
+def test_non_ip_frames_are_ignored():
+    assert parse(ethernet(0x0806, bytes(28))) is None  # ARP
+    assert parse(ethernet(0x0800, ipv4(47, bytes(8)))) is None  # GRE
+
+
+# === Kernel prefilter ===
+
+def run_bpf(program, frame):
+    """Minimal classic BPF interpreter for the opcodes build_prefilter() emits."""
+    a = x = pc = 0
+    while True:
+        code, jt, jf, k = program[pc]
+        pc += 1
+        if code == BPF_RET:
+            return k
+        if code == BPF_LDH_ABS:
+            a = struct.unpack_from('!H', frame, k)[0]
+        elif code == BPF_LDB_ABS:
+            a = frame[k]
+        elif code == BPF_LDH_IND:
+            a = struct.unpack_from('!H', frame, x + k)[0]
+        elif code == BPF_LDX_MSH:
+            x = 4 * (frame[k] & 0xF)
+        elif code == BPF_JA:
+            pc += k
+        elif code == BPF_JEQ:
+            pc += jt if a == k else jf
+        elif code == BPF_JSET:
+            pc += jt if a & k else jf
+        else:
+            raise AssertionError(f"unexpected opcode {code:#x}")
+
+
+def test_prefilter_keeps_parseable_traffic_and_drops_excluded_ports():
+    program = build_prefilter([8000, 27017])
+    keep = [
+        ethernet(0x0800, ipv4(6, tcp(dst_port=443))),
+        ethernet(0x0800, ipv4(1, bytes(8))),
+        ethernet(0x86DD, ipv6(17, udp())),
+        ethernet(0x0800, ipv4(6, tcp()), vlans=(0x8100,)),
+        ethernet(0x0800, ipv4(6, tcp(dst_port=8000), fragment=185)),
+    ]
+    drop = [
+        ethernet(0x0800, ipv4(6, tcp(dst_port=8000))),
+        ethernet(0x0800, ipv4(6, tcp(src_port=27017))),
+        ethernet(0x86DD, ipv6(6, tcp(dst_port=8000))),
+        ethernet(0x0806, bytes(28)),
+        ethernet(0x0800, ipv4(47, bytes(8))),
+    ]
+    assert all(run_bpf(program, frame) for frame in keep)
+    assert not any(run_bpf(program, frame) for frame in drop)
+
+
+def test_prefilter_rejects_port_lists_its_jumps_cannot_span():
+    assert all(jt <= 255 and jf <= 255 for _, jt, jf, _ in build_prefilter(range(1000, 1040)))
+    with pytest.raises(ValueError):
+        build_prefilter(range(1000, 1100))
@@ -0,0 +1,41 @@
+# backend/tests/test_flat_forest.py
+import numpy as np
+import pytest
+from sklearn.datasets import make_classification
+from sklearn.ensemble import RandomForestClassifier
+
+from services.Train_ML_Model.flat_forest import FlatForest
+
+
+@pytest.fixture(scope='module')
+def data():
+    X, y = make_classification(n_samples=2000, n_features=12, n_informative=8, n_classes=4,
+                               flip_y=0.05, random_state=0)
+    return X.astype(np.float32), y
+
+
+@pytest.mark.parametrize('max_depth', [None, 5, 1])
+def test_matches_sklearn_bit_for_bit(data, max_depth):
+    X, y = data
+    clf = RandomForestClassifier(n_estimators=20, max_depth=max_depth, random_state=0).fit(X, y)
+    flat = FlatForest.from_sklearn(clf)
+    assert np.array_equal(clf.predict_proba(X), flat.predict_proba(X))
+    assert np.array_equal(clf.predict(X), flat.predict(X))
+
+
+def test_matches_sklearn_with_missing_values(data):
+    X, y = data
+    X = X.copy()
+    rng = np.random.default_rng(0)
+    X[rng.random(X.shape) < 0.1] = np.nan
+    clf = RandomForestClassifier(n_estimators=20, max_depth=8, random_state=0).fit(X, y)
+    flat = FlatForest.from_sklearn(clf)
+    assert np.array_equal(clf.predict_proba(X), flat.predict_proba(X))
+
+
+def test_saved_forest_matches(data, tmp_path):
+    X, y = data
+    clf = RandomForestClassifier(n_estimators=5, max_depth=6, random_state=0).fit(X, y)
+    FlatForest.from_sklearn(clf).save(str(tmp_path / 'model.flat'))
+    flat = FlatForest.load(str(tmp_path / 'model.flat'))
+    assert np.array_equal(clf.predict_proba(X), flat.predict_proba(X))
@@ -0,0 +1,95 @@
+# backend/tests/test_flow_table.py
+from types import SimpleNamespace
+
+from services.flow_table import FlowTable, TimerWheel
+
+T0 = 1_700_000_000.0
+
+
+def make_table(**kwargs):
+    options = dict(max_flows=100, idle_timeout=15.0, active_timeout=120.0, fin_linger=1.0, tick=0.5)
+    options.update(kwargs)
+    return FlowTable(**options)
+
+
+def packet(table, key, timestamp):
+    """Account one packet of flow `key` the way FeatureExtractor does."""
+    record = table.touch(key, '10.0.0.1', 1234, '10.0.0.2', timestamp)
+    record.last_seen = timestamp
+    return record
+
+
+def test_idle_flow_expires_after_idle_timeout():
+    table = make_table()
+    packet(table, 'a', T0)
+    packet(table, 'a', T0 + 5)
+    assert table.expire(T0 + 19.5) == []
+    (record,) = table.expire(T0 + 20)
+    assert record.key == 'a'
+    assert len(table) == 0
+    assert table.expired == 1
+
+
+def test_busy_flow_expires_after_active_timeout():
+    table = make_table()
+    ended = []
+    for second in range(0, 130, 5):
+        packet(table, 'a', T0 + second)
+        ended += table.expire(T0 + second)
+        if ended:
+            break
+    (record,) = ended
+    assert record.first_seen == T0
+    assert record.last_seen >= T0 + 115
+    assert table.expired == 1
+
+
+def test_closed_flow_ends_after_fin_linger():
+    table = make_table()
+    record = packet(table, 'a', T0)
+    packet(table, 'a', T0 + 2)
+    table.close(record, T0 + 2)
+    assert table.expire(T0 + 2.5) == []
+    assert table.expire(T0 + 3) == [record]
+    assert table.closed == 1 and table.expired == 0
+
+
+def test_full_table_evicts_least_recently_seen_into_ended():
+    table = make_table(max_flows=2)
+    packet(table, 'a', T0)
+    packet(table, 'b', T0 + 1)
+    packet(table, 'a', T0 + 2)
+    packet(table, 'c', T0 + 3)
+    assert list(table.flows) == ['a', 'c']
+    assert [record.key for record in table.ended] == ['b']
+    assert table.evicted == 1
+
+    # Evicted flows come out with the next expiry, and their stale timer never fires
+    assert [record.key for record in table.expire(T0 + 3)] == ['b']
+    assert {record.key for record in table.expire(T0 + 30)} == {'a', 'c'}
+
+
+def test_schedule_clamps_to_the_wheel():
+    wheel = TimerWheel(span=10.0, tick=0.5)
+    wheel.start(T0)
+    far = SimpleNamespace(timer=None)
+    past = SimpleNamespace(timer=None)
+    wheel.schedule(far, T0 + 1000)
+    wheel.schedule(past, T0 - 50)
+    assert far.timer == wheel.current + wheel.size - 1
+    assert past.timer == wheel.current + 1
+
+    # The far timer fires early, within one turn, for its owner to re-arm
+    assert wheel.advance(T0 + 0.5) == [past]
+    assert wheel.advance(T0 + 10.5) == [far]
+
+
+def test_timer_that_fires_early_is_rearmed():
+    table = make_table(idle_timeout=2.0, active_timeout=60.0)
+    # The timer set at the first packet fires while the flow is still busy
+    for step in range(10):
+        packet(table, 'a', T0 + step * 0.5)
+        assert table.expire(T0 + step * 0.5) == []
+    assert table.expire(T0 + 6.0) == []
+    # Idle since its last packet at T0 + 4.5
+    assert [record.key for record in table.expire(T0 + 6.5)] == ['a']
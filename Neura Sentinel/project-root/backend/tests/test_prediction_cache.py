@@ -0,0 +1,84 @@
+# backend/tests/test_prediction_cache.py
+import numpy as np
+import pytest
+from sklearn.datasets import make_classification
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import LabelEncoder
+
+from services import model_registry
+from services.model_registry import ModelRegistry, publish_model, set_current
+from services.prediction_cache import PredictionCache
+from utils.metrics import MetricsRegistry
+
+FEATURES = [f"f{i}" for i in range(8)]
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    """A registry serving versions published under a temporary MODEL_DIR."""
+    monkeypatch.setattr(model_registry, 'VERSIONS_DIR', str(tmp_path / 'versions'))
+    monkeypatch.setattr(model_registry, 'CURRENT_FILE', str(tmp_path / 'CURRENT'))
+    monkeypatch.setattr(model_registry, 'LEGACY_MODEL_PATH', str(tmp_path / 'classifier.pkl'))
+    monkeypatch.setattr(model_registry, 'metrics', MetricsRegistry())
+    return ModelRegistry()
+
+
+def publish(version, seed):
+    X, y = make_classification(n_samples=500, n_features=len(FEATURES), n_informative=6, n_classes=3,
+                               random_state=seed)
+    encoder = LabelEncoder().fit(['BENIGN', 'DDoS', 'PortScan'])
+    model = RandomForestClassifier(n_estimators=10, max_depth=6, random_state=seed).fit(X, y)
+    return publish_model(model, encoder, FEATURES, version=version), X
+
+
+def rows(X):
+    return [dict(zip(FEATURES, map(float, x))) for x in X]
+
+
+def test_cache_hits_return_the_uncached_prediction(registry):
+    _, X = publish('v1', seed=0)
+    model = registry.load()
+    # Repeated rows within and across batches exercise both the in-batch dedup and the LRU
+    batch = rows(np.concatenate([X[:100], X[:20]]))
+    uncached = model.classify_batch(batch)
+
+    assert registry.classify_batch(batch) == uncached
+    assert registry.cache.stats()['hits'] == 0
+    assert registry.classify_batch(batch) == uncached
+    assert registry.cache.stats()['hits'] == 100
+    assert registry.cache.predicted == 100
+
+
+def test_new_version_invalidates_cached_labels(registry):
+    publish('v1', seed=0)
+    _, X = publish('v2', seed=1)
+    set_current('v1')
+    registry.load()
+    batch = rows(X[:100])
+    old = registry.classify_batch(batch)
+
+    set_current('v2')
+    assert registry.refresh()
+    assert not registry.cache.entries
+    new = registry.classify_batch(batch)
+    assert new == registry.current.classify_batch(batch)
+    assert new != old
+    assert {version for version, _ in registry.cache.entries} == {'v2'}
+
+
+def test_entries_are_keyed_by_version():
+    cache = PredictionCache(max_size=10, ttl=60)
+    cache.put_many('v1', [b'row'], ['DDoS'])
+    assert cache.get_many('v1', [b'row']) == ['DDoS']
+    assert cache.get_many('v2', [b'row']) == [None]
+
+
+def test_rejects_versions_outside_the_registry(registry, tmp_path):
+    publish('v1', seed=0)
+    (tmp_path / 'elsewhere').mkdir()
+    for version in ('../elsewhere', 'missing', 'v1/../../elsewhere'):
+        with pytest.raises(ValueError):
+            set_current(version)
+        with pytest.raises(ValueError):
+            registry.load(version)
+    assert registry.current is None
@@ -0,0 +1,110 @@
+# backend/tests/test_spool.py
+import threading
+
+import pytest
+
+from utils.spool import Spool, SpoolBusy, SpoolingSender
+
+SEGMENT = 4096
+BATCH = b'x' * 900  # four records per segment
+
+
+def make_spool(path):
+    return Spool(str(path), segment_bytes=SEGMENT, max_bytes=2 * SEGMENT)
+
+
+def append(spool, start, count):
+    for i in range(start, start + count):
+        assert spool.append((i, BATCH))
+
+
+def ids(records):
+    return [batch[0] for batch, _ in records]
+
+
+def test_append_read_commit(tmp_path):
+    spool = make_spool(tmp_path)
+    append(spool, 0, 3)
+    records = spool.read(10)
+    assert ids(records) == [0, 1, 2]
+
+    spool.commit(records[1][1])
+    assert spool.pending == 1
+    assert ids(spool.read(10)) == [2]
+    # Committing a position the cursor already passed changes nothing
+    spool.commit(records[0][1])
+    assert spool.pending == 1
+    assert spool.replayed == 2
+
+
+def test_restart_resumes_after_commit(tmp_path):
+    spool = make_spool(tmp_path)
+    append(spool, 0, 6)
+    records = spool.read(10)
+    spool.commit(records[4][1])
+    spool.close()
+
+    spool = make_spool(tmp_path)
+    assert spool.pending == 1
+    assert ids(spool.read(10)) == [5]
+    append(spool, 6, 2)
+    assert ids(spool.read(10)) == [5, 6, 7]
+    spool.close()
+
+
+def test_full_log_drops_oldest_segment(tmp_path):
+    spool = make_spool(tmp_path)
+    append(spool, 0, 12)
+    assert spool.dropped == 4
+    assert spool.pending == 8
+    assert ids(spool.read(20)) == list(range(4, 12))
+
+
+def test_roll_between_read_and_commit(tmp_path):
+    spool = make_spool(tmp_path)
+    append(spool, 0, 5)
+    records = spool.read(5)
+    # The capture side keeps appending while the batches read above are delivered
+    append(spool, 5, 15)
+    spool.commit(records[-1][1])
+
+    remaining = spool.read(20)
+    assert spool.pending == len(remaining) == 8
+    assert ids(remaining) == list(range(12, 20))
+    spool.commit(remaining[-1][1])
+    assert spool.pending == 0
+    spool.close()
+
+    spool = make_spool(tmp_path)
+    assert spool.pending == 0
+    assert spool.read(20) == []
+
+
+def test_directory_is_owned_by_one_spool(tmp_path):
+    spool = make_spool(tmp_path)
+    with pytest.raises(SpoolBusy):
+        make_spool(tmp_path)
+    spool.close()
+
+
+def test_sender_close_waits_for_delivery_in_flight(tmp_path):
+    started, release = threading.Event(), threading.Event()
+
+    def deliver(batch):
+        started.set()
+        release.wait()
+        return False  # the sink went away mid-delivery
+
+    sender = SpoolingSender('test', deliver, make_spool(tmp_path), deliver_timeout=0.1)
+    sender((0, BATCH))
+    assert started.wait(1)
+    sender((1, BATCH))
+    sender.close(timeout=0.1)
+    assert sender.thread.is_alive()
+
+    release.set()
+    sender.thread.join(1)
+    assert not sender.thread.is_alive()
+    spool = make_spool(tmp_path)
+    assert ids(spool.read(10)) == [0, 1]
+    spool.close()
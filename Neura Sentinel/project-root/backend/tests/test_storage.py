@@ -0,0 +1,134 @@
+# backend/tests/test_storage.py
+import asyncio
+import os
+import uuid
+
+import pytest
+from bson import ObjectId
+
+from database import storage
+from database.rollups import RESOLUTIONS
+from database.storage import DAY, FEATURE_ORDER, TrafficStore
+
+# Day partition the records land in, far enough back that retention folds it
+DAY_START = 1_700_006_400  # 2023-11-15 00:00 UTC
+LABELS = {'BENIGN': 1, 'DDoS': 2, 'PortScan': 3}
+
+
+def make_record(i, src_ip, dst_ip, label='BENIGN'):
+    record = {name: float(i + n) for n, name in enumerate(FEATURE_ORDER)}
+    record['Flow Bytes/s'] = 1234.5 + i
+    record['Total Fwd Packets'] = i + 1
+    record['Total Backward Packets'] = 2 * i
+    record['Total Length of Fwd Packets'] = 100.0 * (i + 1)
+    record['Total Length of Bwd Packets'] = 40.0 * i
+    record['not a stored feature'] = 0.25
+    record.update(_id=ObjectId(), src_ip=src_ip, dst_ip=dst_ip, label=label,
+                  timestamp=DAY_START + 37.5 * i)
+    return record
+
+
+def primed_store(**kwargs):
+    """A store whose label ids are already cached, so documents round-trip without a database."""
+    store = TrafficStore(**kwargs)
+    store.labels.ids = dict(LABELS)
+    store.labels.names = {label_id: name for name, label_id in LABELS.items()}
+    return store
+
+
+async def round_trip(store, records):
+    return await store.expand_many([await store.compact(record) for record in records])
+
+
+@pytest.mark.parametrize('src_ip,dst_ip', [
+    ('192.168.1.10', '10.0.0.255'),
+    ('0.0.0.0', '255.255.255.255'),
+    ('2001:db8::1', 'fe80::1ff:fe23:4567:890a'),
+    ('::ffff:192.0.2.1', '192.0.2.1'),
+    (None, None),
+])
+def test_compact_round_trip(src_ip, dst_ip):
+    store = primed_store()
+    records = [make_record(i, src_ip, dst_ip, label) for i, label in enumerate(LABELS)]
+    assert asyncio.run(round_trip(store, records)) == records
+
+
+def test_compact_layout():
+    doc = asyncio.run(primed_store().compact(make_record(3, '10.1.2.3', '2001:db8::2', 'DDoS')))
+    assert doc['s'] == 0x0A010203
+    assert doc['d'] == '2001:db8::2'
+    assert doc['l'] == LABELS['DDoS']
+    assert doc['x'] == {'not a stored feature': 0.25}
+    # Whole-number floats are stored as ints
+    assert type(doc['f'][FEATURE_ORDER.index('Total Length of Fwd Packets')]) is int
+
+
+def test_round_trip_drops_missing_features():
+    record = make_record(0, '10.0.0.1', '10.0.0.2')
+    del record[FEATURE_ORDER[-1]], record[FEATURE_ORDER[0]]
+    assert asyncio.run(round_trip(primed_store(), [record])) == [record]
+
+
+# === Retention (needs a MongoDB server) ===
+
+def with_database(test):
+    """
+    Run `test(db)` against a scratch database on TEST_MONGODB_URI (default: a
+    local server), dropped afterwards. Skips when no server answers.
+    """
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    async def run():
+        client = AsyncIOMotorClient(os.getenv('TEST_MONGODB_URI', 'mongodb://localhost:27017'),
+                                    serverSelectionTimeoutMS=1000)
+        try:
+            await client.admin.command('ping')
+        except Exception as e:
+            client.close()
+            pytest.skip(f"MongoDB not reachable: {e}")
+        db = client[f"neura_test_{uuid.uuid4().hex[:8]}"]
+        try:
+            await test(db)
+        finally:
+            await client.drop_database(db.name)
+            client.close()
+
+    asyncio.run(run())
+
+
+def test_retention_downsampling_keeps_rollup_totals(monkeypatch):
+    records = ([make_record(i, '10.0.0.1', '10.0.0.9') for i in range(40)]
+               + [make_record(i, '2001:db8::7', '10.0.0.9', 'DDoS') for i in range(40, 60)])
+    now = DAY_START + DAY + 7 * DAY + 3600
+
+    async def test(db):
+        monkeypatch.setattr(storage, 'get_database', lambda: db)
+        store = TrafficStore(retention=7 * DAY)
+        await store.insert_many([dict(record) for record in records])
+        assert await store.partitions() == [store.partition_for(DAY_START)]
+
+        await store.enforce_retention(now)
+        assert await store.partitions() == []
+        rollups = await db.rollups.find().to_list(None)
+        # Seconds never outlive a day partition; minutes, hours and days all do
+        assert {doc['resolution'] for doc in rollups} == {'m', 'h', 'd'}
+        for resolution in ('m', 'h', 'd'):
+            buckets = [doc for doc in rollups if doc['resolution'] == resolution]
+            assert all(doc['start'] % RESOLUTIONS[resolution] == 0 for doc in buckets)
+            assert sum(doc['count'] for doc in buckets) == len(records)
+            for counter, feature in storage.COUNTER_FEATURES.items():
+                assert sum(doc[counter] for doc in buckets) == sum(record[feature] for record in records)
+            labels = {}
+            for doc in buckets:
+                for label, count in doc['labels'].items():
+                    labels[label] = labels.get(label, 0) + count
+            assert labels == {'BENIGN': 40, 'DDoS': 20}
+        day = next(doc for doc in rollups if doc['resolution'] == 'd')
+        assert set(day['talkers']) == {'10_0_0_1', '2001:db8::7'}
+
+        # Folding a partition again (e.g. after a crash before the drop) doesn't double count
+        await store.insert_many([dict(record) for record in records])
+        await store.enforce_retention(now)
+        assert await db.rollups.find().sort('_id').to_list(None) == sorted(rollups, key=lambda doc: doc['_id'])
+
+    with_database(test)
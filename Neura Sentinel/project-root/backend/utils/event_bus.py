@@ -0,0 +1,69 @@
+# backend/utils/event_bus.py
+import asyncio
+import logging
+import multiprocessing
+import queue
+
+from config import EVENT_BUS_QUEUE_SIZE
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class EventBus:
+    """
+    Channel from the sniffer process to the API process.
+
+    The sniffer publishes one message per flush (a whole batch of flows), so
+    pickling and pipe overhead is paid per batch, not per flow. The API process
+    consumes messages in a background task and does the classification,
+    storage and WebSocket broadcast itself.
+    """
+
+    def __init__(self, maxsize=EVENT_BUS_QUEUE_SIZE):
+        self.queue = multiprocessing.Queue(maxsize)
+        self.dropped = multiprocessing.Value('L', 0)
+
+    # === Producer side (sniffer process) ===
+    def publish(self, kind, payload):
+        """Queue a message without blocking; returns False if the API is too far behind."""
+        try:
+            self.queue.put_nowait((kind, payload))
+            return True
+        except queue.Full:
+            with self.dropped.get_lock():
+                self.dropped.value += 1
+            return False
+
+    # === Consumer side (API process) ===
+    def qsize(self):
+        """Messages waiting, or None where the platform can't tell (macOS)."""
+        try:
+            return self.queue.qsize()
+        except NotImplementedError:
+            return None
+
+    def _get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    async def consume(self, handler, poll_interval=0.5):
+        """Call `await handler(kind, payload)` for every message until cancelled."""
+        loop = asyncio.get_running_loop()
+        while True:
+            message = await loop.run_in_executor(None, self._get, poll_interval)
+            if message is None:
+                continue
+            kind, payload = message
+            try:
+                await handler(kind, payload)
+            except Exception as e:
+                logger.error(f"Failed to handle sniffer event '{kind}': {e}")
+
+
+event_bus = EventBus()
+metrics.counter_from('neura_event_bus_dropped_batches_total', 'Sniffer batches dropped because the event bus was full',
+                     lambda: event_bus.dropped.value)
+metrics.gauge('neura_event_bus_queue_depth', 'Sniffer batches waiting for the API', event_bus.qsize)
@@ -1,4 +1,25 @@
 import logging
 
+from config import LOG_SAMPLE_EVERY
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("traffic-monitor")
+
+
+class LogSampler:
+    """
+    Rate limit for debug logging on hot paths (per flow, per request): due()
+    is True for 1 call in `every`, and only when DEBUG is enabled, so callers
+    skip building the message otherwise.
+    """
+
+    def __init__(self, logger, every=LOG_SAMPLE_EVERY):
+        self.logger = logger
+        self.every = every
+        self.calls = 0
+
+    def due(self):
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return False
+        self.calls += 1
+        return (self.calls - 1) % self.every == 0
@@ -0,0 +1,297 @@
+# backend/utils/metrics.py
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from multiprocessing.sharedctypes import RawArray
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PARSE_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 1e-3)
+
+
+# === Metric types ===
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Histogram:
+    """Counts of observed values per bucket, plus their sum, like a Prometheus histogram."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot: above the largest bound
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+# === Prometheus text format ===
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    pairs = []
+    for name, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def format_value(value):
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, int):
+        return str(value)
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def histogram_lines(name, labels, buckets, counts, total, count):
+    lines = []
+    cumulative = 0
+    for bound, n in zip(buckets, counts):
+        cumulative += n
+        lines.append(f"{name}_bucket{format_labels({**labels, 'le': format_value(bound)})} {format_value(cumulative)}")
+    lines.append(f"{name}_bucket{format_labels({**labels, 'le': '+Inf'})} {format_value(count)}")
+    lines.append(f"{name}_sum{format_labels(labels)} {format_value(total)}")
+    lines.append(f"{name}_count{format_labels(labels)} {format_value(count)}")
+    return lines
+
+
+def family_header(name, kind, help):
+    return [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+
+
+class MetricsRegistry:
+    """
+    The API process's metrics, rendered for GET /metrics. Counters and
+    histograms are updated where things happen; gauges and counters that
+    already live on an object (queue sizes, written/failed totals) are read
+    through a callback at scrape time, so they cost nothing in between.
+    """
+
+    def __init__(self):
+        self.families = {}  # name -> (kind, help, [(labels, source)])
+        self.collectors = []
+
+    def _register(self, name, kind, help, labels, source):
+        family = self.families.setdefault(name, (kind, help, []))
+        family[2].append((labels, source))
+        return source
+
+    def counter(self, name, help, **labels):
+        return self._register(name, 'counter', help, labels, Counter())
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS, **labels):
+        return self._register(name, 'histogram', help, labels, Histogram(buckets))
+
+    def gauge(self, name, help, read, **labels):
+        """A value read by calling `read()` at scrape time; None leaves it out of that scrape."""
+        self._register(name, 'gauge', help, labels, read)
+
+    def counter_from(self, name, help, read, **labels):
+        """A running total kept elsewhere, read by calling `read()` at scrape time."""
+        self._register(name, 'counter', help, labels, read)
+
+    def collector(self, render):
+        """Add a callable returning extra exposition lines, e.g. SharedMetrics.render."""
+        self.collectors.append(render)
+
+    def render(self):
+        lines = []
+        for name, (kind, help, series) in self.families.items():
+            lines.extend(family_header(name, kind, help))
+            for labels, source in series:
+                if isinstance(source, Histogram):
+                    counts, total, count = source.snapshot()
+                    lines.extend(histogram_lines(name, labels, source.buckets, counts, total, count))
+                    continue
+                try:
+                    value = source.value if isinstance(source, Counter) else source()
+                except Exception as e:
+                    logger.warning(f"Failed to read metric {name}: {e}")
+                    continue
+                if value is None:
+                    continue
+                lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+        for render in self.collectors:
+            try:
+                lines.extend(render())
+            except Exception as e:
+                logger.warning(f"Failed to collect metrics: {e}")
+        return "\n".join(lines) + "\n"
+
+
+# === Sniffer process metrics over shared memory ===
+# Fixed layout: one row of doubles per sniffer process (row 0 reads the capture,
+# row i + 1 is shard i). Each process updates plain Python counters and copies
+# them into its own row once per flush, so packets never touch shared memory
+# and rows need no lock; a scrape sums the rows, except for the per-process
+# state, which is reported per row.
+
+SNIFFER_COUNTERS = {
+    'packets_captured': 'Packets read from the capture',
+    'packets_processed': 'Packets applied to a flow table',
+    'packets_dropped': 'Captured packets dropped because a shard queue was full',
+    'kernel_drops': 'Packets the kernel dropped because the capture socket buffer was full',
+    'flows_emitted': 'Ended flows handed to the sink',
+    'flows_dropped': 'Flows the API refused as invalid, which are not retried',
+    'packets_sampled_out': 'Data packets skipped by overload sampling (counted through their sampled neighbours)',
+    'flows_shed': 'Ended flows left unclassified by overload prioritization',
+    'batches_spooled': 'Flow batches written to the local spool because the API could not take them',
+    'batches_replayed': 'Spooled flow batches delivered to the API',
+    'batches_lost': 'Spooled flow batches dropped because the spool was full',
+}
+SNIFFER_GAUGES = {
+    'flow_table_flows': 'Flows currently tracked',
+    'spool_pending': 'Flow batches in the local spool waiting to be replayed',
+}
+SNIFFER_STATE = {
+    'overload_level': 'Overload shedding stage: 0 normal, 1 prefilter, 2 sampling, 3 prioritize',
+    'overload_signals': 'Overload signals seen at the last hand-off, as a bitmask: 1 lag, 2 busy, 4 kernel drops, 8 queue',
+    'overload_since': 'When the current overload stage began, in epoch seconds',
+    'published_at': 'When the process last published its metrics, in epoch seconds',
+}
+SNIFFER_HISTOGRAMS = {
+    'parse_seconds': (PARSE_BUCKETS, 'Header parse time per packet, sampled'),
+    'flush_seconds': (LATENCY_BUCKETS, 'Time to expire ended flows and hand them to the sink'),
+    'classify_seconds': (LATENCY_BUCKETS, 'Embedded inference time per flushed batch'),
+}
+SCALARS = tuple(SNIFFER_COUNTERS) + tuple(SNIFFER_GAUGES) + tuple(SNIFFER_STATE)
+# Histogram slots: one count per bucket plus +Inf, then sum and count
+ROW_WIDTH = len(SCALARS) + sum(len(buckets) + 3 for buckets, _ in SNIFFER_HISTOGRAMS.values())
+
+
+def process_name(row):
+    return 'capture' if row == 0 else f'shard{row - 1}'
+
+
+class PipelineMetrics:
+    """One sniffer process's metrics; publish() copies them into its row of the shared table."""
+
+    def __init__(self, shared, row):
+        self.shared = shared
+        self.row = row
+        # Row 0 is whichever process reads packets off the capture
+        self.is_capture = row == 0
+        for name in SCALARS:
+            setattr(self, name, 0)
+        for name, (buckets, _) in SNIFFER_HISTOGRAMS.items():
+            setattr(self, name, Histogram(buckets))
+
+    def publish(self):
+        self.published_at = time.time()
+        array = self.shared.array
+        offset = self.row * ROW_WIDTH
+        for name in SCALARS:
+            array[offset] = getattr(self, name)
+            offset += 1
+        for name in SNIFFER_HISTOGRAMS:
+            counts, total, count = getattr(self, name).snapshot()
+            array[offset:offset + len(counts)] = counts
+            offset += len(counts)
+            array[offset] = total
+            array[offset + 1] = count
+            offset += 2
+
+
+class SharedMetrics:
+    """
+    Sniffer metrics in shared memory, created by the API process and handed to
+    the sniffer process like the run flag. A torn read of a row being
+    published is possible and only skews one scrape slightly.
+    """
+
+    def __init__(self, rows, prefix='neura_sniffer_'):
+        self.rows = rows
+        self.prefix = prefix
+        self.array = RawArray('d', rows * ROW_WIDTH)
+
+    def row(self, index):
+        if not 0 <= index < self.rows:
+            raise ValueError(f"Metrics row {index} out of range (0-{self.rows - 1})")
+        return PipelineMetrics(self, index)
+
+    def reset(self):
+        """Zero every row; called before a sniffer (re)start so rows of old shards don't linger."""
+        self.array[:] = [0.0] * len(self.array)
+
+    def totals(self):
+        """Column sums over all rows."""
+        array = self.array
+        return [sum(array[row * ROW_WIDTH + i] for row in range(self.rows)) for i in range(ROW_WIDTH)]
+
+    def processes(self):
+        """Per-process state of every row that has published, e.g. for /sniffer/status."""
+        first = len(SNIFFER_COUNTERS) + len(SNIFFER_GAUGES)
+        processes = []
+        for row in range(self.rows):
+            offset = row * ROW_WIDTH + first
+            state = dict(zip(SNIFFER_STATE, self.array[offset:offset + len(SNIFFER_STATE)]))
+            if state['published_at']:
+                processes.append({'process': process_name(row), **state})
+        return processes
+
+    def render(self):
+        totals = self.totals()
+        lines = []
+        offset = 0
+        for name, help in SNIFFER_COUNTERS.items():
+            full_name = f"{self.prefix}{name}_total"
+            lines.extend(family_header(full_name, 'counter', help))
+            lines.append(f"{full_name} {format_value(totals[offset])}")
+            offset += 1
+        for name, help in SNIFFER_GAUGES.items():
+            full_name = f"{self.prefix}{name}"
+            lines.extend(family_header(full_name, 'gauge', help))
+            lines.append(f"{full_name} {format_value(totals[offset])}")
+            offset += 1
+        processes = self.processes()
+        for name, help in SNIFFER_STATE.items():
+            full_name = f"{self.prefix}{name}"
+            lines.extend(family_header(full_name, 'gauge', help))
+            for process in processes:
+                lines.append(f"{full_name}{format_labels({'process': process['process']})} {format_value(process[name])}")
+            offset += 1
+        for name, (buckets, help) in SNIFFER_HISTOGRAMS.items():
+            full_name = f"{self.prefix}{name}"
+            width = len(buckets) + 1
+            counts = totals[offset:offset + width]
+            lines.extend(family_header(full_name, 'histogram', help))
+            lines.extend(histogram_lines(full_name, {}, buckets, counts,
+                                         totals[offset + width], totals[offset + width + 1]))
+            offset += width + 2
+        return lines
+
+
+metrics = MetricsRegistry()
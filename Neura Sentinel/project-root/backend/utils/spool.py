@@ -0,0 +1,406 @@
+# backend/utils/spool.py
+import os
+import mmap
+import queue
+import pickle
+import struct
+import threading
+import time
+import zlib
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, so one process per spool directory
+    fcntl = None
+
+from config import SPOOL_SEGMENT_BYTES, SPOOL_MAX_BYTES, SPOOL_RETRY_INTERVAL, SPOOL_REPLAY_BATCHES, SENDER_QUEUE_SIZE
+
+logger = logging.getLogger(__name__)
+
+RECORD_HEADER = struct.Struct('<II')  # payload length, CRC32 of the payload
+SEGMENT_SUFFIX = '.seg'
+CURSOR_FILE = 'cursor'
+LOCK_FILE = 'lock'
+# Spool directories open_spool() tries under one base, for processes sharing it (API workers)
+MAX_SLOTS = 16
+
+
+class SpoolBusy(OSError):
+    """Another process holds the spool directory."""
+
+
+class Spool:
+    """
+    Durable, append-only log of batches in one directory, owned by one process
+    at a time. Segments are fixed-size files, memory-mapped and filled front
+    to back with records: a length, a CRC32 and a pickled batch. A zero length
+    (segments are preallocated with zeros) or a bad CRC (a torn write) ends a
+    segment's data.
+
+    The `cursor` file holds the position up to which batches have been
+    replayed and acknowledged, so a restart only replays the rest; segments
+    behind it are deleted. The log keeps at most `max_bytes` of segments:
+    when it is full the oldest segment is deleted and its unreplayed batches
+    are counted in `dropped`.
+    """
+
+    def __init__(self, directory, segment_bytes=SPOOL_SEGMENT_BYTES, max_bytes=SPOOL_MAX_BYTES):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_segments = max(2, max_bytes // segment_bytes)
+        self.appended = 0
+        self.replayed = 0
+        self.dropped = 0
+        self.closed = False
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.lock_file = self._acquire()
+
+        self.segments = sorted(int(name[:-len(SEGMENT_SUFFIX)]) for name in os.listdir(directory)
+                               if name.endswith(SEGMENT_SUFFIX))
+        self.read_segment, self.read_offset = self._load_cursor()
+        # Segments the cursor has passed were fully replayed before a crash
+        for segment in [s for s in self.segments if s < self.read_segment]:
+            self._delete(segment)
+        if not self.segments:
+            self.segments.append(self.read_segment)
+        if self.read_segment < self.segments[0]:
+            self.read_segment, self.read_offset = self.segments[0], 0
+
+        self._open_writer(self.segments[-1])
+        # Records per live segment, and how many of the read segment's are replayed;
+        # pending is derived from these so it always matches what read() can return
+        self.counts = {segment: self._count(segment, 0) for segment in self.segments}
+        self.read_index = self.counts[self.read_segment] - self._count(self.read_segment, self.read_offset)
+        if self.pending:
+            logger.info(f"Spool {directory}: {self.pending} batches left to replay")
+
+    # === Files ===
+
+    def _acquire(self):
+        lock_file = open(os.path.join(self.directory, LOCK_FILE), 'a')
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                raise SpoolBusy(f"Spool {self.directory} is in use by another process")
+        return lock_file
+
+    def _path(self, segment):
+        return os.path.join(self.directory, f"{segment:08d}{SEGMENT_SUFFIX}")
+
+    def _load_cursor(self):
+        try:
+            with open(os.path.join(self.directory, CURSOR_FILE)) as f:
+                segment, offset = f.read().split()
+            return int(segment), int(offset)
+        except (OSError, ValueError):
+            return (self.segments[0] if self.segments else 1), 0
+
+    def _save_cursor(self):
+        path = os.path.join(self.directory, CURSOR_FILE)
+        with open(path + '.tmp', 'w') as f:
+            f.write(f"{self.read_segment} {self.read_offset}")
+        os.replace(path + '.tmp', path)
+
+    def _delete(self, segment):
+        try:
+            os.remove(self._path(segment))
+        except FileNotFoundError:
+            pass
+        self.segments.remove(segment)
+        if hasattr(self, 'counts'):
+            self.counts.pop(segment, None)
+
+    def _open_writer(self, segment):
+        path = self._path(segment)
+        with open(path, 'ab') as f:
+            if f.tell() < self.segment_bytes:
+                f.truncate(self.segment_bytes)
+        self.file = open(path, 'r+b')
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        self.write_segment = segment
+        self.write_offset = self._end_of_data(self.map, 0)
+        # Clear whatever a torn write left behind, so it can't be mistaken for records
+        self.map[self.write_offset:] = bytes(len(self.map) - self.write_offset)
+
+    def _close_writer(self):
+        self.map.flush()
+        self.map.close()
+        self.file.close()
+
+    # === Records ===
+
+    @staticmethod
+    def _record_at(data, offset):
+        """(payload, next offset) of the record at `offset`, or None at the end of the data."""
+        if offset + RECORD_HEADER.size > len(data):
+            return None
+        length, crc = RECORD_HEADER.unpack_from(data, offset)
+        start = offset + RECORD_HEADER.size
+        if not length or start + length > len(data):
+            return None
+        payload = data[start:start + length]
+        if zlib.crc32(payload) != crc:
+            return None
+        return payload, start + length
+
+    def _end_of_data(self, data, offset):
+        while True:
+            record = self._record_at(data, offset)
+            if record is None:
+                return offset
+            offset = record[1]
+
+    def _records(self, segment, offset):
+        """(payload, next offset) of every record in `segment` from `offset` on."""
+        if segment == self.write_segment:
+            data = self.map
+        else:
+            with open(self._path(segment), 'rb') as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            while True:
+                record = self._record_at(data, offset)
+                if record is None:
+                    return
+                yield record
+                offset = record[1]
+        finally:
+            if data is not self.map:
+                data.close()
+
+    def _count(self, segment, offset):
+        return sum(1 for _ in self._records(segment, offset))
+
+    # === Writer side ===
+
+    def append(self, batch):
+        """Write one batch durably. Returns False if it can't be stored (too big for a segment, or closed)."""
+        payload = pickle.dumps(batch, protocol=pickle.HIGHEST_PROTOCOL)
+        size = RECORD_HEADER.size + len(payload)
+        if size > self.segment_bytes:
+            logger.error(f"Batch of {len(payload)} bytes does not fit a {self.segment_bytes} byte spool segment")
+            self.dropped += 1
+            return False
+        with self._lock:
+            if self.closed:
+                self.dropped += 1
+                return False
+            if self.write_offset + size > self.segment_bytes:
+                self._roll()
+            offset = self.write_offset
+            self.map[offset + RECORD_HEADER.size:offset + size] = payload
+            RECORD_HEADER.pack_into(self.map, offset, len(payload), zlib.crc32(payload))
+            # Sync only the pages this record touched; flush() wants a page-aligned start
+            start = offset - offset % mmap.PAGESIZE
+            self.map.flush(start, offset + size - start)
+            self.write_offset = offset + size
+            self.counts[self.write_segment] += 1
+            self.appended += 1
+        return True
+
+    @property
+    def pending(self):
+        """Batches appended but not yet replayed and committed."""
+        return sum(self.counts.values()) - self.read_index
+
+    def _roll(self):
+        """Start the next segment, deleting the oldest if the log is full."""
+        if len(self.segments) >= self.max_segments:
+            oldest = self.segments[0]
+            lost = self.counts[oldest] - (self.read_index if oldest == self.read_segment else 0)
+            self.dropped += lost
+            logger.warning(f"Spool {self.directory} full: dropped {lost} batches")
+            self._delete(oldest)
+            if self.read_segment == oldest:
+                self.read_segment, self.read_offset, self.read_index = self.segments[0], 0, 0
+                self._save_cursor()
+        self._close_writer()
+        segment = self.write_segment + 1
+        self.segments.append(segment)
+        self.counts[segment] = 0
+        self._open_writer(segment)
+
+    # === Reader side ===
+
+    def read(self, limit):
+        """
+        Up to `limit` unacknowledged batches, oldest first.
+        Returns:
+            list[tuple]: (batch, position); commit() a position once its batch is delivered
+        """
+        batches = []
+        with self._lock:
+            for segment in self.segments:
+                if segment < self.read_segment:
+                    continue
+                if segment == self.read_segment:
+                    offset, index = self.read_offset, self.read_index
+                else:
+                    offset, index = 0, 0
+                for payload, offset in self._records(segment, offset):
+                    index += 1
+                    batches.append((pickle.loads(payload), (segment, offset, index)))
+                    if len(batches) >= limit:
+                        return batches
+        return batches
+
+    def commit(self, position):
+        """
+        Acknowledge every batch up to and including the one read at `position`,
+        deleting segments left behind. Positions the cursor has already passed,
+        or in segments a full log has since deleted, are ignored.
+        """
+        segment, offset, index = position
+        with self._lock:
+            if segment not in self.counts or (segment, offset) <= (self.read_segment, self.read_offset):
+                return
+            if segment == self.read_segment:
+                self.replayed += index - self.read_index
+            else:
+                self.replayed += (self.counts[self.read_segment] - self.read_index + index
+                                  + sum(self.counts[s] for s in self.segments if self.read_segment < s < segment))
+            for old in [s for s in self.segments if s < segment]:
+                self._delete(old)
+            self.read_segment, self.read_offset, self.read_index = segment, offset, index
+            self._save_cursor()
+
+    def stats(self):
+        return {
+            "pending": self.pending,
+            "appended": self.appended,
+            "replayed": self.replayed,
+            "dropped": self.dropped,
+            "segments": len(self.segments),
+        }
+
+    def close(self):
+        with self._lock:
+            if not self.closed:
+                self.closed = True
+                self._close_writer()
+                self.lock_file.close()
+
+
+def open_spool(base, **kwargs):
+    """
+    Open the first spool under `base` no other process holds (base/0, base/1, ...),
+    so processes started from one config each get their own, and batches a
+    previous process left behind are replayed by whichever process takes its slot.
+    """
+    for slot in range(MAX_SLOTS):
+        try:
+            return Spool(os.path.join(base, str(slot)), **kwargs)
+        except SpoolBusy:
+            continue
+    raise SpoolBusy(f"All {MAX_SLOTS} spools under {base} are in use")
+
+
+class SpoolingSender:
+    """
+    Sink that never blocks the caller on delivery. Batches go through a
+    bounded queue to a sender thread that calls `deliver(batch)`, which
+    returns True once the batch is taken care of. A batch it can't deliver
+    (False or an exception), or one arriving while the queue is full, goes
+    to the spool. While the spool holds batches, new ones are appended behind
+    them to keep their order, and every `retry_interval` seconds the sender
+    replays up to `replay_batches` of them. `merge(batches)` may combine
+    replayed batches into fewer deliveries; it returns (batch, count) pairs.
+    `deliver_timeout` is the longest one delivery can take; close() waits that
+    long for one in flight, and the sender thread closes the spool itself.
+
+    Delivery is at least once: a batch the sink took but didn't acknowledge
+    (a timeout, a crash before commit) is sent again.
+    """
+
+    def __init__(self, name, deliver, spool, merge=None, queue_size=SENDER_QUEUE_SIZE,
+                 retry_interval=SPOOL_RETRY_INTERVAL, replay_batches=SPOOL_REPLAY_BATCHES, deliver_timeout=0.0):
+        self.name = name
+        self.deliver = deliver
+        self.merge = merge or (lambda batches: [(batch, 1) for batch in batches])
+        self.spool = spool
+        self.queue = queue.Queue(queue_size)
+        self.retry_interval = retry_interval
+        self.replay_batches = replay_batches
+        self.deliver_timeout = deliver_timeout
+        self.retry_at = 0.0
+        self.delivered = 0
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=f"{name}-sender", daemon=True)
+        self.thread.start()
+
+    def __call__(self, batch):
+        try:
+            self.queue.put_nowait(batch)
+        except queue.Full:
+            self.spool.append(batch)
+
+    def _deliver(self, batch):
+        try:
+            return self.deliver(batch)
+        except Exception as e:
+            logger.warning(f"{self.name}: delivery failed: {e}")
+            return False
+
+    def _run(self):
+        try:
+            self._send_loop()
+        finally:
+            # Whatever is still queued waits in the spool for the next run
+            while True:
+                try:
+                    self.spool.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            self.spool.close()
+
+    def _send_loop(self):
+        while not self.stopping.is_set():
+            if self.spool.pending:
+                timeout = max(0.05, self.retry_at - time.monotonic())
+            else:
+                timeout = self.retry_interval
+            try:
+                batch = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                batch = None
+
+            if self.spool.pending:
+                if batch is not None:
+                    self.spool.append(batch)
+                if time.monotonic() >= self.retry_at:
+                    self.replay()
+            elif batch is not None:
+                if self._deliver(batch):
+                    self.delivered += 1
+                else:
+                    logger.warning(f"{self.name}: sink unavailable, spooling to {self.spool.directory}")
+                    self.spool.append(batch)
+                    self.retry_at = time.monotonic() + self.retry_interval
+
+    def replay(self):
+        """Deliver the oldest spooled batches; returns False if the sink is still unavailable."""
+        records = self.spool.read(self.replay_batches)
+        done = 0
+        for batch, count in self.merge([batch for batch, _ in records]):
+            if self.stopping.is_set():
+                return False
+            if not self._deliver(batch):
+                self.retry_at = time.monotonic() + self.retry_interval
+                return False
+            done += count
+            self.spool.commit(records[done - 1][1])
+            self.delivered += count
+        if records and not self.spool.pending:
+            logger.info(f"{self.name}: spool replayed, back to direct delivery")
+        return True
+
+    def close(self, timeout=None):
+        """Stop the sender, which spools whatever it had not delivered for the next run to replay."""
+        self.stopping.set()
+        self.thread.join(self.retry_interval + self.deliver_timeout + 1 if timeout is None else timeout)
+        if self.thread.is_alive():
+            logger.warning(f"{self.name}: a delivery is still in flight; the spool closes once it ends")
@@ -1,9 +1,141 @@
 # backend/utils/websocket_manager.py
-from typing import List
+import asyncio
+import json
+import logging
 from fastapi import WebSocket
 
-connected_clients: List[WebSocket] = []
+from config import WS_COALESCE_MS, WS_CLIENT_QUEUE_SIZE, WS_SLOW_CLIENT_POLICY
+from utils.metrics import metrics
 
-def get_connected_clients() -> List[WebSocket]:
-    return connected_clients
+logger = logging.getLogger(__name__)
 
+class ClientChannel:
+    """One connected dashboard: a bounded queue of serialized frames and the task sending them."""
+
+    def __init__(self, websocket: WebSocket, queue_size: int):
+        self.websocket = websocket
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.task = None
+        self.dropped = 0
+
+
+class Broadcaster:
+    """
+    Fans messages out to every WebSocket client without blocking the publisher.
+
+    publish() only appends to a pending list. Every `coalesce_ms` the pending
+    messages are serialized once into a single JSON array frame and queued on
+    each client; a sender task per client drains its own queue, so a slow
+    client only delays itself.
+    """
+
+    def __init__(self, stream, coalesce_ms=WS_COALESCE_MS, queue_size=WS_CLIENT_QUEUE_SIZE,
+                 slow_client_policy=WS_SLOW_CLIENT_POLICY):
+        self.stream = stream
+        self.coalesce_ms = coalesce_ms
+        self.queue_size = queue_size
+        self.slow_client_policy = slow_client_policy
+        self.clients = set()
+        self.pending = []
+        self.task = None
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.register_metrics()
+
+    def register_metrics(self):
+        stream = self.stream
+        metrics.gauge('neura_ws_clients', 'Connected WebSocket clients',
+                      lambda: len(self.clients), stream=stream)
+        metrics.gauge('neura_ws_pending_messages', 'Messages waiting for the next coalesced frame',
+                      lambda: len(self.pending), stream=stream)
+        metrics.gauge('neura_ws_queue_depth', 'Frames queued across all clients',
+                      lambda: sum(channel.queue.qsize() for channel in self.clients), stream=stream)
+        metrics.counter_from('neura_ws_frames_sent_total', 'Frames sent to clients',
+                             lambda: self.frames_sent, stream=stream)
+        metrics.counter_from('neura_ws_frames_dropped_total', 'Frames dropped for slow clients',
+                             lambda: self.frames_dropped, stream=stream)
+
+    def publish(self, message):
+        self.pending.append(message)
+
+    def publish_many(self, messages):
+        self.pending.extend(messages)
+
+    async def register(self, websocket: WebSocket) -> ClientChannel:
+        channel = ClientChannel(websocket, self.queue_size)
+        channel.task = asyncio.create_task(self._send_loop(channel))
+        self.clients.add(channel)
+        return channel
+
+    def unregister(self, channel: ClientChannel):
+        self.clients.discard(channel)
+        if channel.task is not None and channel.task is not asyncio.current_task():
+            channel.task.cancel()
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._coalesce_loop())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        for channel in list(self.clients):
+            self.unregister(channel)
+
+    def flush(self):
+        """Serialize pending messages once and queue the frame on every client."""
+        if not self.pending or not self.clients:
+            self.pending = []
+            return
+        frame = json.dumps(self.pending, default=str)
+        self.pending = []
+        for channel in list(self.clients):
+            self._enqueue(channel, frame)
+
+    def _enqueue(self, channel: ClientChannel, frame: str):
+        queue = channel.queue
+        if queue.full():
+            channel.dropped += 1
+            self.frames_dropped += 1
+            if self.slow_client_policy == 'drop':
+                logger.warning(f"Dropping slow WebSocket client: {channel.websocket.client}")
+                self.unregister(channel)
+                asyncio.create_task(self._close(channel.websocket))
+                return
+            # 'downsample': the client skips its oldest frame and keeps the newest
+            queue.get_nowait()
+        queue.put_nowait(frame)
+
+    async def _coalesce_loop(self):
+        interval = self.coalesce_ms / 1000
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"WebSocket broadcast error: {e}")
+
+    async def _send_loop(self, channel: ClientChannel):
+        websocket = channel.websocket
+        try:
+            while True:
+                frame = await channel.queue.get()
+                await websocket.send_text(frame)
+                self.frames_sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Failed to send to client: {e}")
+            self.unregister(channel)
+
+    async def _close(self, websocket: WebSocket):
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
+
+broadcaster = Broadcaster("traffic")
+# Alert updates go to their own clients (/ws/alerts), not into the per-flow traffic feed
+alert_broadcaster = Broadcaster("alerts")
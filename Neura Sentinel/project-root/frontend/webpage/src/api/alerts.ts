@@ -1,23 +1,38 @@
 // src/api/alerts.ts
 
+import { Page, toSearchParams } from './traffic';
+
 export interface Alert {
   id: string;
-  type: string;
+  label: string;
   severity: string;
   status: string;
-  source: string;
-  destination: string;
+  src_ip: string | null;
+  dst_ip: string | null;
+  count: number;
   details: string;
-  timestamp: number;
+  first_seen: number; // epoch seconds
+  timestamp: number; // epoch seconds, last update
+}
+
+export interface AlertQuery {
+  start?: number;
+  end?: number;
+  label?: string[];
+  severity?: string[];
+  src_ip?: string;
+  dst_ip?: string;
+  cursor?: string;
+  limit?: number;
 }
 
-export async function getAlertData(): Promise<Alert[]> {
+export async function getAlertData(query: AlertQuery = {}): Promise<Page<Alert>> {
   try {
-    const response = await fetch("http://localhost:8000/alerts/");
+    const response = await fetch(`http://localhost:8000/alerts/${toSearchParams(query)}`);
     if (!response.ok) {
       throw new Error(`HTTP error! status: ${response.status}`);
     }
-    const data: Alert[] = await response.json();
+    const data: Page<Alert> = await response.json();
     return data;
   } catch (error) {
     console.error("Failed to fetch alert data:", error);
@@ -1,26 +1,98 @@
 // src/api/traffic.ts
 
-export interface TrafficData {
+// One classified flow as returned by GET /traffic/ (projected to the fields the tables use)
+export interface TrafficRecord {
   id: string;
-  source: string;
-  destination: string;
-  protocol: string;
-  type: string;
-  size: number;
-  timestamp: number;
-  status: 'normal' | 'suspicious' | 'blocked';
+  timestamp: number; // epoch seconds
+  src_ip: string | null;
+  dst_ip: string | null;
+  label: string;
+  'Total Fwd Packets': number;
+  'Total Backward Packets': number;
+  'Total Length of Fwd Packets': number;
+  'Total Length of Bwd Packets': number;
 }
 
-export async function getTrafficData(): Promise<TrafficData[]> {
+export interface Page<T> {
+  items: T[];
+  next_cursor: string | null; // pass back as `cursor` for the next (older) page
+}
+
+export interface TrafficQuery {
+  start?: number;
+  end?: number;
+  label?: string[];
+  src_ip?: string;
+  dst_ip?: string;
+  cursor?: string;
+  limit?: number;
+}
+
+export function toSearchParams(query: object): string {
+  const params = new URLSearchParams();
+  for (const [key, value] of Object.entries(query)) {
+    if (value === undefined || value === null) continue;
+    for (const item of Array.isArray(value) ? value : [value]) {
+      params.append(key, String(item));
+    }
+  }
+  const encoded = params.toString();
+  return encoded ? `?${encoded}` : '';
+}
+
+export async function getTrafficData(query: TrafficQuery = {}): Promise<Page<TrafficRecord>> {
   try {
-    const response = await fetch("http://localhost:8000/traffic/");
+    const response = await fetch(`http://localhost:8000/traffic/${toSearchParams(query)}`);
     if (!response.ok) {
       throw new Error(`Failed to fetch traffic data: ${response.status}`);
     }
-    const data: TrafficData[] = await response.json();
+    const data: Page<TrafficRecord> = await response.json();
     return data;
   } catch (error) {
     console.error("Error fetching traffic data:", error);
     throw error;
   }
 }
+
+// One rollup bucket from GET /traffic/stats
+export interface StatsPoint {
+  start: number; // epoch seconds
+  count: number;
+  fwd_packets: number;
+  bwd_packets: number;
+  fwd_bytes: number;
+  bwd_bytes: number;
+  labels: Record<string, number>;
+}
+
+export interface TrafficStats {
+  resolution: 's' | 'm' | 'h' | 'd';
+  step: number; // seconds per point
+  start: number;
+  end: number;
+  points: StatsPoint[];
+  totals: Omit<StatsPoint, 'start'>;
+  top_talkers: { ip: string; bytes: number }[];
+}
+
+export interface StatsQuery {
+  start?: number;
+  end?: number;
+  resolution?: 's' | 'm' | 'h' | 'd';
+  top?: number;
+}
+
+export async function getTrafficStats(query: StatsQuery = {}): Promise<TrafficStats> {
+  const response = await fetch(`http://localhost:8000/traffic/stats${toSearchParams(query)}`);
+  if (!response.ok) {
+    throw new Error(`Failed to fetch traffic stats: ${response.status}`);
+  }
+  return response.json();
+}
+
+// The backend coalesces classified flows into one WebSocket frame per batch;
+// older single-record frames are still accepted.
+export function parseTrafficFrame(raw: string): any[] {
+  const parsed = JSON.parse(raw);
+  return Array.isArray(parsed) ? parsed : [parsed];
+}
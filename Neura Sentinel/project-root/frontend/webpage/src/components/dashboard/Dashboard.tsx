@@ -12,6 +12,7 @@ import TimeSeriesChart from './TimeSeriesChart';
 import NetworkSniffer from './NetworkSniffer';
 import ScrollReveal from '../animations/ScrollReveal';
 import { NetworkStat } from '../../types';
+import { parseTrafficFrame } from '../../api/traffic';
 
 interface WSMessage {
   fwd: number;
@@ -48,32 +49,38 @@ const Dashboard: React.FC = () => {
 
     socket.onmessage = (event) => {
       try {
-        const data: WSMessage = JSON.parse(event.data);
-        const fwd = Number(data.fwd || 0);
-        const bwd = Number(data.bwd || 0);
-        const total = fwd + bwd;
-        const label = data.label || 'unknown';
-
-        const newEntry: TrafficEntry = {
-          id: Date.now().toString(),
-          ...data,
-        };
+        const records = parseTrafficFrame(event.data) as WSMessage[];
+        if (!records.length) return;
 
+        // Stat cards show the newest flow of the frame
+        const latest = records[records.length - 1];
+        const fwd = Number(latest.fwd || 0);
+        const bwd = Number(latest.bwd || 0);
+        const total = fwd + bwd;
         setStats([
           { name: 'Forward Packets', value: fwd, unit: 'pkts', delta: randomDelta(), percentage: (fwd / 2000) * 100 },
           { name: 'Backward Packets', value: bwd, unit: 'pkts', delta: randomDelta(), percentage: (bwd / 2000) * 100 },
           { name: 'Total Traffic', value: total, unit: 'bytes', delta: randomDelta(20), percentage: (total / 4000) * 100 },
         ]);
 
-        setTraffic((prev) => [newEntry, ...prev.slice(0, 49)]); // Keep max 50
-        if (label !== 'Normal') {
-          setThreats((prev) => [{ src_ip: data.src_ip!, dst_ip: data.dst_ip!, label, timestamp: Date.now() }, ...prev.slice(0, 19)]);
-        }
+        for (const data of records) {
+          const label = data.label || 'unknown';
 
-        setLabelCounts((prev) => ({
-          ...prev,
-          [label]: (prev[label] || 0) + 1,
-        }));
+          const newEntry: TrafficEntry = {
+            id: crypto.randomUUID(),
+            ...data,
+          };
+
+          setTraffic((prev) => [newEntry, ...prev.slice(0, 49)]); // Keep max 50
+          if (label !== 'Normal') {
+            setThreats((prev) => [{ src_ip: data.src_ip!, dst_ip: data.dst_ip!, label, timestamp: Date.now() }, ...prev.slice(0, 19)]);
+          }
+
+          setLabelCounts((prev) => ({
+            ...prev,
+            [label]: (prev[label] || 0) + 1,
+          }));
+        }
       } catch (err) {
         console.error('WebSocket parsing error:', err);
       }
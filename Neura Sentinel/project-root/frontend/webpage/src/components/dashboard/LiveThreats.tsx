@@ -1,5 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import ThreatsList from './ThreatsList';
+import { Alert, getAlertData } from '../../api/alerts';
 
 interface ThreatData {
   id: string;
@@ -12,39 +13,40 @@ interface ThreatData {
   timestamp: number;
 }
 
-const mapSeverity = (label = ''): string => {
-  const l = label.toUpperCase();
-  if (l === 'BENIGN') return 'low';
-  if (['DOS', 'DDOS'].includes(l)) return 'critical';
-  if (['PORTSCAN', 'BRUTEFORCE'].includes(l)) return 'high';
-  return 'medium';
+const MAX_THREATS = 20;
+
+// Alerts are deduplicated incidents; an update carries the same id as the alert it replaces
+const toThreat = (alert: Alert): ThreatData => ({
+  id: alert.id,
+  type: alert.label,
+  severity: alert.severity,
+  status: alert.status,
+  source: alert.src_ip || 'multiple',
+  destination: alert.dst_ip || 'multiple',
+  details: alert.details,
+  timestamp: alert.timestamp * 1000,
+});
+
+const mergeThreats = (prev: ThreatData[], updates: ThreatData[]): ThreatData[] => {
+  const byId = new Map(prev.map((threat) => [threat.id, threat]));
+  for (const threat of updates) byId.set(threat.id, threat);
+  return [...byId.values()].sort((a, b) => b.timestamp - a.timestamp).slice(0, MAX_THREATS);
 };
 
 const LiveThreats: React.FC = () => {
   const [threats, setThreats] = useState<ThreatData[]>([]);
 
   useEffect(() => {
-    const socket = new WebSocket('ws://127.0.0.1:8000/ws/traffic');
+    getAlertData({ limit: MAX_THREATS })
+      .then((page) => setThreats((prev) => mergeThreats(prev, page.items.map(toThreat))))
+      .catch((err) => console.error('[Alerts Error]', err));
+
+    const socket = new WebSocket('ws://127.0.0.1:8000/ws/alerts');
 
     socket.onmessage = (event) => {
       try {
-        const data = JSON.parse(event.data);
-        const label = data.label?.toUpperCase();
-
-        if (!label || label === 'BENIGN') return;
-
-        const newThreat: ThreatData = {
-          id: `${Date.now()}-${Math.random().toString(36).slice(2, 6)}`,
-          type: label,
-          severity: mapSeverity(label),
-          status: 'detected',
-          source: data.src_ip || 'unknown',
-          destination: data.dst_ip || 'unknown',
-          details: `Detected ${label} traffic. Fwd=${data.fwd}, Bwd=${data.bwd}`,
-          timestamp: data.timestamp || Date.now(),
-        };
-
-        setThreats((prev) => [newThreat, ...prev].slice(0, 20));
+        const alerts: Alert[] = JSON.parse(event.data);
+        setThreats((prev) => mergeThreats(prev, alerts.map(toThreat)));
       } catch (err) {
         console.error('[WebSocket Threat Error]', err);
       }
@@ -1,6 +1,7 @@
 import React, { useEffect, useRef, useState } from 'react';
 import { motion, AnimatePresence } from 'framer-motion';
 import { Wifi, WifiOff, Activity, Shield, AlertTriangle } from 'lucide-react';
+import { parseTrafficFrame } from '../../api/traffic';
 
 const WS_URL = 'ws://127.0.0.1:8000/ws/traffic';
 
@@ -51,18 +52,19 @@ const NetworkSniffer: React.FC = () => {
 
     ws.onmessage = (event) => {
       try {
-        const data = JSON.parse(event.data);
-        const newPacket: Packet = {
-          id: crypto.randomUUID(),
-          src_ip: data.src_ip ?? '0.0.0.0',
-          dst_ip: data.dst_ip ?? '0.0.0.0',
-          protocol: data.protocol ?? 'TCP',
-          length: data.length ?? data.total ?? 0,
-          timestamp: data.timestamp ?? new Date().toISOString(),
-          label: (data.label ?? 'normal').toLowerCase(),
-        };
-
-        setPackets((prev) => [newPacket, ...prev].slice(0, 50));
+        for (const data of parseTrafficFrame(event.data)) {
+          const newPacket: Packet = {
+            id: crypto.randomUUID(),
+            src_ip: data.src_ip ?? '0.0.0.0',
+            dst_ip: data.dst_ip ?? '0.0.0.0',
+            protocol: data.protocol ?? 'TCP',
+            length: data.length ?? data.total ?? 0,
+            timestamp: data.timestamp ?? new Date().toISOString(),
+            label: (data.label ?? 'normal').toLowerCase(),
+          };
+
+          setPackets((prev) => [newPacket, ...prev].slice(0, 50));
+        }
       } catch (err) {
         console.error('[WS Parse Error]', err);
       }
@@ -1,5 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import { motion } from 'framer-motion';
+import { getTrafficStats, TrafficStats } from '../../api/traffic';
 import {
   LineChart, Line, AreaChart, Area,
   XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer,
@@ -13,6 +14,30 @@ interface TimeSeriesPoint {
   total: number;
 }
 
+// Last minute of per-second rollups, refreshed every POLL_MS
+const WINDOW_SECONDS = 60;
+const POLL_MS = 2000;
+
+// /traffic/stats only returns non-empty buckets; quiet seconds are drawn as zero
+const toSeries = (stats: TrafficStats): TimeSeriesPoint[] => {
+  if (!stats.points.length) return [];
+  const byStart = new Map(stats.points.map((point) => [point.start, point]));
+  const series: TimeSeriesPoint[] = [];
+  for (let start = Math.floor(stats.start / stats.step) * stats.step; start < stats.end; start += stats.step) {
+    const fwd = byStart.get(start)?.fwd_packets ?? 0;
+    const bwd = byStart.get(start)?.bwd_packets ?? 0;
+    const time = start * 1000;
+    series.push({
+      time,
+      displayTime: new Date(time).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit', second: '2-digit' }),
+      fwd,
+      bwd,
+      total: fwd + bwd,
+    });
+  }
+  return series;
+};
+
 interface TimeSeriesChartProps {
   title: string;
   type?: 'line' | 'area';
@@ -33,28 +58,24 @@ const TimeSeriesChart: React.FC<TimeSeriesChartProps> = ({
   const [data, setData] = useState<TimeSeriesPoint[]>([]);
 
   useEffect(() => {
-    const socket = new WebSocket('ws://localhost:8000/ws/traffic');
-    
-    socket.onmessage = (event) => {
-      try {
-        const { fwd = 0, bwd = 0, timestamp = Date.now() } = JSON.parse(event.data);
-        const time = String(timestamp).length > 12 ? timestamp : timestamp * 1000;
+    let cancelled = false;
 
-        const point: TimeSeriesPoint = {
-          time,
-          displayTime: new Date(time).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit', second: '2-digit' }),
-          fwd: Number(fwd),
-          bwd: Number(bwd),
-          total: Number(fwd) + Number(bwd),
-        };
-
-        setData((prev) => [...prev.slice(-29), point]);
+    const refresh = async () => {
+      const end = Date.now() / 1000;
+      try {
+        const stats = await getTrafficStats({ start: end - WINDOW_SECONDS, end, resolution: 's', top: 0 });
+        if (!cancelled) setData(toSeries(stats));
       } catch (err) {
-        console.error('WebSocket parse error:', err);
+        console.error('Traffic stats error:', err);
       }
     };
 
-    return () => socket.close();
+    refresh();
+    const timer = setInterval(refresh, POLL_MS);
+    return () => {
+      cancelled = true;
+      clearInterval(timer);
+    };
   }, []);
 
   const CustomTooltip = ({ active, payload, label }: any) => (
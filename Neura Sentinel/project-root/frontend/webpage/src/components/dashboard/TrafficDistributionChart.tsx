@@ -1,5 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import { motion } from 'framer-motion';
+import { getTrafficStats, parseTrafficFrame } from '../../api/traffic';
 import {
   PieChart,
   Pie,
@@ -19,6 +20,14 @@ interface LabelCounter {
 
 const COLORS = ['#00A6FB', '#FF8A47', '#FF445A']; // normal, suspicious, malicious
 
+const mapLabel = (label: string): keyof LabelCounter | null => {
+  const rawLabel = (label || '').toUpperCase();
+  if (rawLabel === 'BENIGN') return 'normal';
+  if (rawLabel === 'DOS' || rawLabel === 'MALICIOUS') return 'malicious';
+  if (rawLabel === 'SUSPICIOUS') return 'suspicious';
+  return null;
+};
+
 const TrafficDistributionChart: React.FC<TrafficDistributionChartProps> = ({ title }) => {
   const [labelCounts, setLabelCounts] = useState<LabelCounter>({
     normal: 0,
@@ -27,23 +36,34 @@ const TrafficDistributionChart: React.FC<TrafficDistributionChartProps> = ({ tit
   });
 
   useEffect(() => {
+    // Start from the last 24h of rollups instead of an empty chart
+    const now = Date.now() / 1000;
+    getTrafficStats({ start: now - 86400, end: now, top: 0 })
+      .then((stats) => {
+        setLabelCounts((prev) => {
+          const next = { ...prev };
+          for (const [label, count] of Object.entries(stats.totals.labels)) {
+            const mapped = mapLabel(label);
+            if (mapped) next[mapped] += count;
+          }
+          return next;
+        });
+      })
+      .catch((error) => console.error('Traffic stats error:', error));
+
     const socket = new WebSocket('ws://localhost:8000/ws/traffic');
 
     socket.onmessage = (event) => {
       try {
-        const payload = JSON.parse(event.data);
-        const rawLabel = (payload.label || '').toUpperCase();
-
-        let mappedLabel: keyof LabelCounter | null = null;
-        if (rawLabel === 'BENIGN') mappedLabel = 'normal';
-        else if (rawLabel === 'DOS' || rawLabel === 'MALICIOUS') mappedLabel = 'malicious';
-        else if (rawLabel === 'SUSPICIOUS') mappedLabel = 'suspicious';
-
-        if (mappedLabel) {
-          setLabelCounts((prev) => ({
-            ...prev,
-            [mappedLabel!]: prev[mappedLabel!] + 1,
-          }));
+        for (const payload of parseTrafficFrame(event.data)) {
+          const mappedLabel = mapLabel(payload.label);
+
+          if (mappedLabel) {
+            setLabelCounts((prev) => ({
+              ...prev,
+              [mappedLabel!]: prev[mappedLabel!] + 1,
+            }));
+          }
         }
       } catch (error) {
         console.error('WebSocket parse error:', error);
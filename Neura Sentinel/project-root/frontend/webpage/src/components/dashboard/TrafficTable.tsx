@@ -2,6 +2,7 @@ import React, { useEffect, useState, useMemo } from 'react';
 import { motion } from 'framer-motion';
 import { AlertTriangle, Shield, ArrowDown, ArrowUp, Search } from 'lucide-react';
 import { TrafficData } from '../../types';
+import { parseTrafficFrame } from '../../api/traffic';
 
 interface TrafficTableProps {
   data: TrafficData[];
@@ -16,27 +17,28 @@ const TrafficTable: React.FC<TrafficTableProps> = ({ data }) => {
   useEffect(() => {
     const socket = new WebSocket('ws://localhost:8000/ws/traffic');
     socket.onmessage = (event) => {
-      const msg = JSON.parse(event.data);
-      const ts = msg.timestamp || Date.now();
-      const timestamp = ts.toString().length < 13 ? ts * 1000 : ts;
+      for (const msg of parseTrafficFrame(event.data)) {
+        const ts = msg.timestamp || Date.now();
+        const timestamp = ts.toString().length < 13 ? ts * 1000 : ts;
 
-      const newTraffic: TrafficData = {
-        id: Date.now().toString(),
-        source: 'Live',
-        destination: 'System',
-        protocol: 'LIVE',
-        type: msg.label,
-        size: msg.fwd + msg.bwd,
-        timestamp,
-        status:
-          msg.label === 'BENIGN'
-            ? 'normal'
-            : msg.label === 'DoS'
-            ? 'blocked'
-            : 'suspicious',
-      };
+        const newTraffic: TrafficData = {
+          id: crypto.randomUUID(),
+          source: 'Live',
+          destination: 'System',
+          protocol: 'LIVE',
+          type: msg.label,
+          size: msg.fwd + msg.bwd,
+          timestamp,
+          status:
+            msg.label === 'BENIGN'
+              ? 'normal'
+              : msg.label === 'DoS'
+              ? 'blocked'
+              : 'suspicious',
+        };
 
-      setLiveTraffic((prev) => [newTraffic, ...prev.slice(0, 99)]);
+        setLiveTraffic((prev) => [newTraffic, ...prev.slice(0, 99)]);
+      }
     };
     return () => socket.close();
   }, []);